@@ -4,4 +4,34 @@ DB_CONFIG = {
     'password': 'admin',   
     'database': 'gestion_medica',
     'port': 3306
-}
\ No newline at end of file
+}
+
+# Parámetros del pool de conexiones usado por models.database.Database
+POOL_CONFIG = {
+    'max_conexiones': 5,         # Conexiones simultáneas como máximo
+    'timeout_espera': 10,        # Segundos que se espera por una conexión libre
+    'tiempo_inactividad': 300    # Segundos antes de cerrar una conexión ociosa
+}
+
+# Caché de pacientes y médicos buscados por id (models.cache)
+CACHE_CONFIG = {
+    'max_entradas': 1000,        # Entidades por caché antes de descartar las menos usadas
+    'ttl': 300                   # Segundos que una entidad se considera vigente
+}
+
+# Búsquedas de pacientes y médicos (models.busqueda)
+BUSQUEDA_CONFIG = {
+    'contactos_en_memoria': False  # True: email/teléfono se resuelven con diccionarios en memoria
+}
+
+# Réplica en memoria de contadores_citas (models.contadores)
+CONTADORES_CONFIG = {
+    'ttl': 60                    # Segundos antes de releer la tabla (recoge cambios de otras instancias)
+}
+
+# Recordatorios de citas (services.recordatorio_service)
+RECORDATORIOS_CONFIG = {
+    'activo': False,             # True: main.py inicia el despachador en segundo plano
+    'anticipacion_horas': 24,    # Se avisa de las citas que empiezan dentro de estas horas
+    'intervalo': 60              # Segundos entre revisiones
+}
@@ -34,6 +34,10 @@ CREATE TABLE citas (
     FOREIGN KEY (medico_id) REFERENCES medicos(id) ON DELETE CASCADE
 );
 
+-- Los índices de 'citas' y demás cambios de esquema se aplican con el
+-- ejecutor de migraciones (models/migraciones.py) al iniciar main.py,
+-- o manualmente con: python -m models.migraciones
+
 -- Se muestra la tabla completa con sus datos
 SELECT * FROM pacientes;
 SELECT * FROM medicos;
@@ -1,23 +1,39 @@
 import tkinter as tk
+from tkinter import messagebox
 from models.database import Database
+from models.migraciones import aplicar_migraciones, ErrorMigracion
 from services.paciente_service import PacienteService
 from services.medico_service import MedicoService
 from services.cita_service import CitaService
 from services.reportes_service import ReportesService
+from services.recordatorio_service import RecordatorioService
+from config.database_config import RECORDATORIOS_CONFIG
 from ui_desktop.main_window import MainWindow
 
 def inicializar_sistema():
     db = Database()
+    aplicar_migraciones(db)
     return {
         'db': db,
         'paciente_service': PacienteService(db),
         'medico_service': MedicoService(db),
         'cita_service': CitaService(db),
-        'reportes_service': ReportesService(db)
+        'reportes_service': ReportesService(db),
+        'recordatorio_service': RecordatorioService(db)
     }
 
 if __name__ == "__main__":
     root = tk.Tk()
-    servicios = inicializar_sistema()
+    try:
+        servicios = inicializar_sistema()
+    except ErrorMigracion as e:
+        # Sin el esquema completo la aplicación no puede guardar citas: no se inicia
+        print(f"❌ {e}")
+        messagebox.showerror("Error de base de datos", str(e))
+        root.destroy()
+        raise SystemExit(1)
     app = MainWindow(root, servicios)
+    if RECORDATORIOS_CONFIG['activo']:
+        servicios['recordatorio_service'].iniciar()
     root.mainloop()
+    servicios['recordatorio_service'].detener()
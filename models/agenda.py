@@ -0,0 +1,192 @@
+import threading
+import weakref
+from bisect import bisect_left, insort
+from datetime import datetime, date, time, timedelta
+from typing import Dict, List, Optional, Tuple
+from models.database import Database
+
+DURACION_PREDETERMINADA = 60  # minutos
+
+def a_datetime(valor) -> Optional[datetime]:
+    """Convierte datetime, date o texto (YYYY-MM-DD[ HH:MM[:SS]]) a datetime"""
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime.combine(valor, time.min)
+    for formato in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(str(valor), formato)
+        except ValueError:
+            continue
+    raise ValueError(f"Fecha/hora inválida: {valor}")
+
+
+class HorarioOcupado(Exception):
+    """Una cita programada se cruza con otra cita activa del mismo médico"""
+
+    def __init__(self, medico_id: int, fecha_hora: datetime):
+        super().__init__(f"El médico {medico_id} ya tiene una cita que se cruza con {fecha_hora}")
+        self.medico_id = medico_id
+        self.fecha_hora = fecha_hora
+
+
+def hay_solapamiento(cursor, medico_id: int, inicio: datetime, duracion: int, excluir_id: int = None) -> bool:
+    """¿Otra cita activa del médico se cruza con [inicio, inicio + duración)? (dentro de una transacción)
+
+    Consulta la tabla, no el índice en memoria, y bloquea con FOR UPDATE el
+    tramo del médico en idx_citas_medico_fecha: dos reservas simultáneas del
+    mismo médico (aunque vengan de otra instancia) se verifican de a una.
+    """
+    fin = inicio + timedelta(minutes=duracion)
+    cursor.execute(
+        """SELECT id FROM citas
+           WHERE medico_id = %s AND estado <> 'cancelada' AND id <> %s
+             AND fecha_hora >= %s AND fecha_hora < %s
+             AND fecha_hora + INTERVAL duracion MINUTE > %s
+           FOR UPDATE""",
+        # Ninguna cita dura más de un día: el límite inferior mantiene acotado el rango del índice
+        (medico_id, excluir_id or 0, inicio - timedelta(days=1), fin, inicio)
+    )
+    return bool(cursor.fetchall())
+
+
+class AgendaMedico:
+    """Intervalos ocupados de un médico, ordenados por inicio (consultas en O(log n))"""
+
+    def __init__(self):
+        self._intervalos: List[Tuple[datetime, int, datetime]] = []  # (inicio, cita_id, fin)
+        self._por_cita: Dict[int, Tuple[datetime, int, datetime]] = {}
+        self._duracion_maxima = timedelta(0)
+
+    def agregar(self, cita_id: int, inicio: datetime, fin: datetime):
+        intervalo = (inicio, cita_id, fin)
+        insort(self._intervalos, intervalo)
+        self._por_cita[cita_id] = intervalo
+        self._duracion_maxima = max(self._duracion_maxima, fin - inicio)
+
+    def quitar(self, cita_id: int):
+        intervalo = self._por_cita.pop(cita_id, None)
+        if intervalo is None:
+            return
+        posicion = bisect_left(self._intervalos, intervalo)
+        if posicion < len(self._intervalos) and self._intervalos[posicion] == intervalo:
+            del self._intervalos[posicion]
+
+    def solapadas(self, inicio: datetime, fin: datetime) -> List[Tuple[datetime, int, datetime]]:
+        """Intervalos que se cruzan con [inicio, fin)"""
+        # Ningún intervalo que empiece antes de inicio - duración máxima puede llegar a inicio
+        desde = bisect_left(self._intervalos, (inicio - self._duracion_maxima,))
+        hasta = bisect_left(self._intervalos, (fin,))
+        return [i for i in self._intervalos[desde:hasta] if i[2] > inicio]
+
+    def huecos(self, inicio: datetime, fin: datetime) -> List[Tuple[datetime, datetime]]:
+        """Tramos libres dentro de [inicio, fin)"""
+        libres = []
+        cursor = inicio
+        for ocupado_inicio, _, ocupado_fin in self.solapadas(inicio, fin):
+            if ocupado_inicio > cursor:
+                libres.append((cursor, ocupado_inicio))
+            cursor = max(cursor, ocupado_fin)
+        if cursor < fin:
+            libres.append((cursor, fin))
+        return libres
+
+
+class AgendaMedicos:
+    """Índice de intervalos por médico para verificar disponibilidad sin recorrer todas las citas.
+
+    La agenda de cada médico se carga una sola vez desde la base (citas no
+    canceladas) y luego se mantiene al día desde Cita.guardar y Cita.eliminar.
+    Las citas completadas se conservan: el tiempo ya estuvo ocupado.
+
+    Es un índice por proceso: si otra instancia de la aplicación (o una
+    escritura externa) modifica citas, puede desfasarse y `invalidar` lo
+    recarga. Por eso solo orienta las búsquedas de horarios; la reserva en
+    sí se verifica contra la tabla con `hay_solapamiento` dentro de la
+    transacción de Cita.guardar.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._agendas: Dict[int, AgendaMedico] = {}
+        self._lock = threading.RLock()
+
+    def _agenda(self, medico_id: int) -> AgendaMedico:
+        """Retorna la agenda del médico, cargándola la primera vez.
+
+        Si la consulta falla la agenda vacía que se retorna no se guarda: la
+        próxima consulta vuelve a intentar la carga en lugar de dar al médico
+        por libre hasta que alguien invalide el índice.
+        """
+        with self._lock:
+            agenda = self._agendas.get(medico_id)
+            if agenda is None:
+                agenda = AgendaMedico()
+                query = """SELECT id, fecha_hora, duracion FROM citas
+                           WHERE medico_id = %s AND estado <> 'cancelada' AND fecha_hora IS NOT NULL"""
+                filas = self.db.execute_query(query, (medico_id,), fetch=True)
+                if filas is None:
+                    return agenda
+                for fila in filas:
+                    inicio = a_datetime(fila['fecha_hora'])
+                    agenda.agregar(fila['id'], inicio, inicio + timedelta(minutes=fila['duracion']))
+                self._agendas[medico_id] = agenda
+            return agenda
+
+    # === MANTENIMIENTO ===
+
+    def registrar(self, cita):
+        """Refleja en el índice el estado actual de una cita guardada"""
+        with self._lock:
+            for agenda in self._agendas.values():
+                agenda.quitar(cita.id)
+            agenda = self._agendas.get(cita.medico_id)
+            if agenda is None or cita.estado == "cancelada" or not cita.fecha_hora:
+                return
+            inicio = a_datetime(cita.fecha_hora)
+            duracion = getattr(cita, 'duracion', None) or DURACION_PREDETERMINADA
+            agenda.agregar(cita.id, inicio, inicio + timedelta(minutes=duracion))
+
+    def quitar(self, cita_id: int):
+        """Elimina una cita del índice"""
+        with self._lock:
+            for agenda in self._agendas.values():
+                agenda.quitar(cita_id)
+
+    def invalidar(self, medico_id: int = None):
+        """Descarta la agenda de un médico (o todas) para recargarla en la próxima consulta"""
+        with self._lock:
+            if medico_id is None:
+                self._agendas.clear()
+            else:
+                self._agendas.pop(medico_id, None)
+
+    # === CONSULTAS ===
+
+    def esta_libre(self, medico_id: int, inicio: datetime, duracion: int = DURACION_PREDETERMINADA) -> bool:
+        """¿El médico está libre en [inicio, inicio + duración)?"""
+        with self._lock:
+            return not self._agenda(medico_id).solapadas(inicio, inicio + timedelta(minutes=duracion))
+
+    def citas_solapadas(self, medico_id: int, inicio: datetime, fin: datetime) -> List[Dict]:
+        """Citas del médico que se cruzan con el rango indicado"""
+        with self._lock:
+            return [
+                {'cita_id': cita_id, 'inicio': ocupado_inicio, 'fin': ocupado_fin}
+                for ocupado_inicio, cita_id, ocupado_fin in self._agenda(medico_id).solapadas(inicio, fin)
+            ]
+
+    def huecos_libres(self, medico_id: int, inicio: datetime, fin: datetime) -> List[Tuple[datetime, datetime]]:
+        """Tramos libres del médico dentro del rango indicado"""
+        with self._lock:
+            return self._agenda(medico_id).huecos(inicio, fin)
+
+
+_agendas_por_db = weakref.WeakKeyDictionary()
+
+def obtener_agenda(db: Database) -> AgendaMedicos:
+    """Índice de disponibilidad compartido por todos los servicios que usan la misma base"""
+    agenda = _agendas_por_db.get(db)
+    if agenda is None:
+        agenda = _agendas_por_db.setdefault(db, AgendaMedicos(db))
+    return agenda
@@ -0,0 +1,273 @@
+import heapq
+import threading
+import unicodedata
+import weakref
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set
+import mysql.connector
+from models.database import Database
+
+# Caracteres que se ignoran al comparar teléfonos ("(011) 555-12.34" == "0115551234")
+_SEPARADORES_TELEFONO = str.maketrans("", "", " -().")
+
+def normalizar(texto: Optional[str]) -> str:
+    """Minúsculas, sin acentos y con los espacios colapsados ('  José  Pérez' -> 'jose perez')"""
+    if not texto:
+        return ""
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    sin_acentos = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return " ".join(sin_acentos.casefold().split())
+
+def normalizar_email(email: Optional[str]) -> str:
+    return (email or "").strip().lower()
+
+def normalizar_telefono(telefono: Optional[str]) -> str:
+    return (telefono or "").strip().translate(_SEPARADORES_TELEFONO)
+
+# Misma normalización que las columnas generadas email_normalizado / telefono_normalizado
+NORMALIZADORES = {'email': normalizar_email, 'telefono': normalizar_telefono}
+
+def normalizar_contactos(campo: str, valores: Iterable[str]) -> List[str]:
+    """Valores únicos y normalizados de un campo de contacto, sin vacíos"""
+    normalizar_valor = NORMALIZADORES[campo]
+    return list({normalizar_valor(valor) for valor in valores} - {""})
+
+def filas_por_contacto(db: Database, tabla: str, campo: str, valores: List[str], tamano_lote: int = 1000):
+    """Filas de la tabla cuyo contacto normalizado está en `valores` (igualdad sobre columna indexada).
+
+    Cada fila trae además la clave 'contacto' con el valor normalizado que coincidió.
+    """
+    for inicio in range(0, len(valores), tamano_lote):
+        lote = valores[inicio:inicio + tamano_lote]
+        marcadores = ", ".join(["%s"] * len(lote))
+        query = f"""SELECT *, {campo}_normalizado AS contacto FROM {tabla}
+                    WHERE {campo}_normalizado IN ({marcadores})"""
+        yield from db.execute_query(query, tuple(lote), fetch=True) or []
+
+def trigramas(texto: str) -> Set[str]:
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceNombres:
+    """Índice en memoria para buscar por nombre sin recorrer la tabla.
+
+    Guarda los nombres normalizados y ordenados, las palabras ordenadas (para
+    buscar por prefijo con bisect) y un índice invertido de trigramas (para
+    buscar subcadenas de 3 o más letras). Se carga una vez y se mantiene al
+    día desde guardar y eliminar de cada modelo.
+    """
+
+    def __init__(self, db: Database, tabla: str):
+        self.db = db
+        self.tabla = tabla
+        self._lock = threading.RLock()
+        self._cargado = False
+        self._nombres: Dict[int, str] = {}
+        self._trigramas: Dict[str, Set[int]] = {}
+        self._completos: List[tuple] = []  # (nombre, id) ordenados
+        self._palabras: List[tuple] = []  # (palabra, id) ordenadas
+
+    # === MANTENIMIENTO ===
+
+    def _cargar(self) -> bool:
+        """Carga el índice si hace falta; si la lectura se corta lo deja vacío y retorna False"""
+        with self._lock:
+            if self._cargado:
+                return True
+            try:
+                for fila in self.db.iter_query(f"SELECT id, nombre FROM {self.tabla}"):
+                    self._agregar(fila['id'], fila['nombre'], ordenar=False)
+            except mysql.connector.Error:
+                # Un índice parcial daría búsquedas incompletas: se reintenta en la próxima
+                self.invalidar()
+                return False
+            self._completos.sort()
+            self._palabras.sort()
+            self._cargado = True
+            return True
+
+    def _agregar(self, id: int, nombre: str, ordenar: bool = True):
+        normalizado = normalizar(nombre)
+        self._nombres[id] = normalizado
+        for trigrama in trigramas(normalizado):
+            self._trigramas.setdefault(trigrama, set()).add(id)
+        entradas = [(self._completos, (normalizado, id))]
+        entradas += [(self._palabras, (palabra, id)) for palabra in set(normalizado.split())]
+        for lista, entrada in entradas:
+            if ordenar:
+                insort(lista, entrada)
+            else:
+                lista.append(entrada)
+
+    def _quitar(self, id: int):
+        normalizado = self._nombres.pop(id, None)
+        if normalizado is None:
+            return
+        for trigrama in trigramas(normalizado):
+            ids = self._trigramas.get(trigrama)
+            if ids is not None:
+                ids.discard(id)
+                if not ids:
+                    del self._trigramas[trigrama]
+        entradas = [(self._completos, (normalizado, id))]
+        entradas += [(self._palabras, (palabra, id)) for palabra in set(normalizado.split())]
+        for lista, entrada in entradas:
+            posicion = bisect_left(lista, entrada)
+            if posicion < len(lista) and lista[posicion] == entrada:
+                del lista[posicion]
+
+    def registrar(self, id: int, nombre: str):
+        """Agrega o actualiza el nombre de una entidad (si el índice ya está cargado)"""
+        with self._lock:
+            if self._cargado:
+                self._quitar(id)
+                self._agregar(id, nombre)
+
+    def quitar(self, id: int):
+        """Elimina una entidad del índice"""
+        with self._lock:
+            if self._cargado:
+                self._quitar(id)
+
+    def invalidar(self):
+        """Descarta el índice para reconstruirlo en la próxima búsqueda"""
+        with self._lock:
+            self._cargado = False
+            self._nombres, self._trigramas, self._completos, self._palabras = {}, {}, [], []
+
+    # === BÚSQUEDA ===
+
+    @staticmethod
+    def _por_prefijo(lista: List[tuple], prefijo: str):
+        """Ids de las entradas (texto, id) ordenadas cuyo texto empieza con el prefijo, en orden"""
+        posicion = bisect_left(lista, (prefijo,))
+        while posicion < len(lista) and lista[posicion][0].startswith(prefijo):
+            yield lista[posicion][1]
+            posicion += 1
+
+    def _por_subcadena(self, texto: str) -> Set[int]:
+        """Ids cuyo nombre contiene el texto (intersección de trigramas y verificación final)"""
+        listas = sorted((self._trigramas.get(t, set()) for t in trigramas(texto)), key=len)
+        if not listas or not listas[0]:
+            return set()
+        candidatos = set(listas[0])
+        for ids in listas[1:]:
+            candidatos &= ids
+            if not candidatos:
+                return set()
+        return {id for id in candidatos if texto in self._nombres[id]}
+
+    def buscar(self, texto: str, limite: int = 50) -> List[int]:
+        """Ids que coinciden con el texto, los mejores primero.
+
+        Orden: nombres que empiezan con el texto (el exacto primero), nombres con
+        alguna palabra que empieza con el texto y, por último (3 o más letras),
+        el texto en cualquier parte del nombre. Cada grupo se recorre ya ordenado
+        y la búsqueda se corta al llegar al límite.
+        """
+        consulta = normalizar(texto)
+        if not consulta or limite <= 0:
+            return []
+        with self._lock:
+            if not self._cargar():
+                return []
+            resultados, vistos = [], set()
+            grupos = (self._por_prefijo(self._completos, consulta),
+                      self._por_prefijo(self._palabras, consulta))
+            for grupo in grupos:
+                for id in grupo:
+                    if id not in vistos:
+                        vistos.add(id)
+                        resultados.append(id)
+                        if len(resultados) == limite:
+                            return resultados
+
+            if len(consulta) >= 3:
+                restantes = self._por_subcadena(consulta) - vistos
+                mejores = heapq.nsmallest(limite - len(resultados),
+                                          ((self._nombres[id], id) for id in restantes))
+                resultados.extend(id for _, id in mejores)
+            return resultados
+
+
+class IndiceContactos:
+    """Diccionarios en memoria email -> id y teléfono -> id (valores normalizados).
+
+    Se carga la primera vez que se consulta y después se mantiene desde
+    guardar y eliminar; mientras no se use, mantenerlo no cuesta nada.
+    """
+
+    def __init__(self, db: Database, tabla: str):
+        self.db = db
+        self.tabla = tabla
+        self._lock = threading.RLock()
+        self._cargado = False
+        self._por_campo: Dict[str, Dict[str, int]] = {campo: {} for campo in NORMALIZADORES}
+        self._por_id: Dict[int, Dict[str, str]] = {}
+
+    def _cargar(self) -> bool:
+        """Carga los diccionarios si hace falta; si la lectura se corta los deja vacíos y retorna False"""
+        with self._lock:
+            if self._cargado:
+                return True
+            try:
+                for fila in self.db.iter_query(f"SELECT id, email, telefono FROM {self.tabla}"):
+                    self._agregar(fila['id'], fila['email'], fila['telefono'])
+            except mysql.connector.Error:
+                self._por_campo = {campo: {} for campo in NORMALIZADORES}
+                self._por_id = {}
+                return False
+            self._cargado = True
+            return True
+
+    def _agregar(self, id: int, email: Optional[str], telefono: Optional[str]):
+        valores = {'email': normalizar_email(email), 'telefono': normalizar_telefono(telefono)}
+        self._por_id[id] = valores
+        for campo, valor in valores.items():
+            if valor:
+                self._por_campo[campo][valor] = id
+
+    def _quitar(self, id: int):
+        for campo, valor in self._por_id.pop(id, {}).items():
+            if self._por_campo[campo].get(valor) == id:
+                del self._por_campo[campo][valor]
+
+    def registrar(self, id: int, email: Optional[str], telefono: Optional[str]):
+        """Agrega o actualiza los contactos de una entidad (si el índice ya está cargado)"""
+        with self._lock:
+            if self._cargado:
+                self._quitar(id)
+                self._agregar(id, email, telefono)
+
+    def quitar(self, id: int):
+        with self._lock:
+            if self._cargado:
+                self._quitar(id)
+
+    def buscar(self, campo: str, valores: List[str]) -> Dict[str, int]:
+        """{valor normalizado: id} de los valores encontrados"""
+        with self._lock:
+            if not self._cargar():
+                return {}
+            indice = self._por_campo[campo]
+            return {valor: indice[valor] for valor in valores if valor in indice}
+
+
+_indices_por_db = weakref.WeakKeyDictionary()
+_indices_lock = threading.Lock()
+
+def _obtener(db: Database, clase, tabla: str):
+    with _indices_lock:
+        indices = _indices_por_db.setdefault(db, {})
+        indice = indices.get((clase, tabla))
+        if indice is None:
+            indice = indices[(clase, tabla)] = clase(db, tabla)
+        return indice
+
+def obtener_indice(db: Database, tabla: str) -> IndiceNombres:
+    """Índice de nombres de una tabla ('pacientes' o 'medicos') compartido por todos los servicios"""
+    return _obtener(db, IndiceNombres, tabla)
+
+def obtener_indice_contactos(db: Database, tabla: str) -> IndiceContactos:
+    """Índice de emails y teléfonos de una tabla compartido por todos los servicios"""
+    return _obtener(db, IndiceContactos, tabla)
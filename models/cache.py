@@ -0,0 +1,100 @@
+import copy
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+from config.database_config import CACHE_CONFIG
+from models.database import Database
+
+
+class CacheEntidades:
+    """Caché LRU con vencimiento para entidades buscadas por id.
+
+    Guarda una copia de cada entidad y entrega copias, así los cambios que un
+    llamador haga sobre el objeto (antes de guardarlo) no alteran lo cacheado.
+    Las entradas salen por antigüedad de uso cuando se supera `max_entradas`
+    o cuando pasan `ttl` segundos desde que se cargaron.
+    """
+
+    def __init__(self, max_entradas: int = 1000, ttl: float = 300):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas = OrderedDict()  # id -> (entidad, instante de vencimiento)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, id: int):
+        """Retorna una copia de la entidad cacheada, o None si no está o venció"""
+        with self._lock:
+            entrada = self._entradas.get(id)
+            if entrada is None or entrada[1] < time.monotonic():
+                if entrada is not None:
+                    del self._entradas[id]
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(id)
+            self.aciertos += 1
+            return copy.copy(entrada[0])
+
+    def obtener_varios(self, ids: Iterable[int]) -> Tuple[Dict[int, object], list]:
+        """Separa los ids en ({id: entidad} cacheadas, ids que hay que buscar)"""
+        encontrados, faltantes = {}, []
+        for id in ids:
+            entidad = self.obtener(id)
+            if entidad is None:
+                faltantes.append(id)
+            else:
+                encontrados[id] = entidad
+        return encontrados, faltantes
+
+    def guardar(self, id: int, entidad):
+        """Agrega o reemplaza una entidad en la caché"""
+        if id is None or entidad is None:
+            return
+        with self._lock:
+            self._entradas[id] = (copy.copy(entidad), time.monotonic() + self.ttl)
+            self._entradas.move_to_end(id)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, id: int = None):
+        """Descarta una entidad (o todas) para que se relea de la base"""
+        with self._lock:
+            if id is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(id, None)
+
+    def estadisticas(self) -> dict:
+        """Aciertos, fallos y ocupación de la caché"""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0
+            }
+
+
+_caches_por_db = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+def obtener_cache(db: Database, entidad: str) -> CacheEntidades:
+    """Caché de una entidad ('pacientes', 'medicos', ...) compartida por todos los que usan la misma base"""
+    with _caches_lock:
+        caches = _caches_por_db.setdefault(db, {})
+        cache = caches.get(entidad)
+        if cache is None:
+            cache = caches[entidad] = CacheEntidades(**CACHE_CONFIG)
+        return cache
+
+
+def estadisticas_caches(db: Database) -> Dict[str, dict]:
+    """Estadísticas de todas las cachés de entidades de una base"""
+    with _caches_lock:
+        caches = dict(_caches_por_db.get(db, {}))
+    return {nombre: cache.estadisticas() for nombre, cache in caches.items()}
@@ -0,0 +1,188 @@
+import threading
+import weakref
+from datetime import datetime, date, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from models.database import Database
+
+# Horario usado para los médicos sin horario registrado: lunes a viernes, 8 horas, turnos de 1 hora
+HORARIO_PREDETERMINADO = {dia: (time(8, 0), time(16, 0), 60) for dia in range(5)}
+
+# Jornada vacía (inicio = fin): marca un día no laborable de un médico con horario propio
+NO_LABORABLE = ("00:00", "00:00")
+
+def _a_time(valor) -> time:
+    """MySQL devuelve las columnas TIME como timedelta"""
+    if isinstance(valor, timedelta):
+        return (datetime.min + valor).time()
+    if isinstance(valor, str):
+        return datetime.strptime(valor, "%H:%M").time()
+    return valor
+
+def turnos_por_dia(hora_inicio: time, hora_fin: time, duracion_turno: int) -> int:
+    """Cantidad de turnos completos que caben en una jornada"""
+    minutos = int((datetime.combine(date.min, hora_fin) - datetime.combine(date.min, hora_inicio)).total_seconds()) // 60
+    return max(minutos, 0) // duracion_turno if duracion_turno > 0 else 0
+
+
+class CalendarioLaboral:
+    """Horarios semanales, feriados y duración de turno de cada médico (tablas horarios_medico y feriados).
+
+    La capacidad de cualquier rango se calcula con np.busday_count (una llamada
+    por día de la semana) y un producto matricial, sin recorrer los días en Python.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._lock = threading.RLock()
+        self._horarios: Optional[Dict[int, Dict[int, Tuple[time, time, int]]]] = None
+        self._feriados_generales: set = set()
+        self._feriados_medico: Dict[int, set] = {}
+
+    # === CARGA Y MANTENIMIENTO ===
+
+    def _cargar(self):
+        """Carga horarios y feriados (dos consultas) si todavía no están en memoria.
+
+        Si alguna de las consultas falla no se guarda nada: la consulta en curso
+        usa lo que haya en memoria y la siguiente vuelve a intentar la carga.
+        """
+        with self._lock:
+            if self._horarios is not None:
+                return
+            filas = self.db.execute_query(
+                "SELECT medico_id, dia_semana, hora_inicio, hora_fin, duracion_turno FROM horarios_medico",
+                fetch=True
+            )
+            feriados = self.db.execute_query("SELECT fecha, medico_id FROM feriados", fetch=True)
+            if filas is None or feriados is None:
+                return
+            horarios = {}
+            for fila in filas:
+                # Toda fila marca al médico como configurado; las jornadas vacías no agregan el día
+                dias = horarios.setdefault(fila['medico_id'], {})
+                hora_inicio, hora_fin = _a_time(fila['hora_inicio']), _a_time(fila['hora_fin'])
+                if hora_fin > hora_inicio:
+                    dias[fila['dia_semana']] = (hora_inicio, hora_fin, fila['duracion_turno'])
+
+            generales, por_medico = set(), {}
+            for fila in feriados:
+                if fila['medico_id'] is None:
+                    generales.add(fila['fecha'])
+                else:
+                    por_medico.setdefault(fila['medico_id'], set()).add(fila['fecha'])
+
+            self._horarios = horarios
+            self._feriados_generales = generales
+            self._feriados_medico = por_medico
+
+    def invalidar(self):
+        """Descarta lo cargado para releerlo en la próxima consulta"""
+        with self._lock:
+            self._horarios = None
+
+    def guardar_horario(self, medico_id: int, dia_semana: int, hora_inicio: str, hora_fin: str,
+                        duracion_turno: int = 60) -> bool:
+        """Registra o reemplaza la jornada de un médico para un día de la semana (0 = lunes)"""
+        query = """INSERT INTO horarios_medico (medico_id, dia_semana, hora_inicio, hora_fin, duracion_turno)
+                   VALUES (%s, %s, %s, %s, %s)
+                   ON DUPLICATE KEY UPDATE hora_inicio = VALUES(hora_inicio), hora_fin = VALUES(hora_fin),
+                                           duracion_turno = VALUES(duracion_turno)"""
+        resultado = self.db.execute_query(query, (medico_id, dia_semana, hora_inicio, hora_fin, duracion_turno))
+        self.invalidar()
+        return resultado is not None
+
+    def quitar_horario(self, medico_id: int, dia_semana: int) -> bool:
+        """Marca un día de la semana como no laborable para el médico.
+
+        Se guarda una jornada vacía en lugar de borrar la fila: un médico al que
+        se le quitan todos los días queda sin días laborables, no con el horario
+        predeterminado (que solo corresponde a quien nunca se configuró).
+        """
+        return self.guardar_horario(medico_id, dia_semana, *NO_LABORABLE)
+
+    def agregar_feriado(self, fecha: str, medico_id: int = None, descripcion: str = "") -> bool:
+        """Registra un feriado de toda la clínica (medico_id None) o de un médico"""
+        query = "INSERT INTO feriados (fecha, medico_id, descripcion) VALUES (%s, %s, %s)"
+        resultado = self.db.execute_query(query, (fecha, medico_id, descripcion))
+        self.invalidar()
+        return resultado is not None
+
+    # === CONSULTAS ===
+
+    def horario_semanal(self, medico_id: int) -> Dict[int, Tuple[time, time, int]]:
+        """Jornada por día de la semana: {dia: (hora_inicio, hora_fin, duracion_turno)}.
+
+        Los médicos sin ninguna fila en horarios_medico usan HORARIO_PREDETERMINADO.
+        """
+        self._cargar()
+        return (self._horarios or {}).get(medico_id, HORARIO_PREDETERMINADO)
+
+    def es_feriado(self, medico_id: int, fecha: date) -> bool:
+        self._cargar()
+        return fecha in self._feriados_generales or fecha in self._feriados_medico.get(medico_id, ())
+
+    def jornada(self, medico_id: int, fecha: date) -> Optional[Tuple[datetime, datetime, int]]:
+        """Inicio, fin y duración de turno del médico en un día, o None si no atiende"""
+        if self.es_feriado(medico_id, fecha):
+            return None
+        horario = self.horario_semanal(medico_id).get(fecha.weekday())
+        if horario is None:
+            return None
+        hora_inicio, hora_fin, duracion_turno = horario
+        return datetime.combine(fecha, hora_inicio), datetime.combine(fecha, hora_fin), duracion_turno
+
+    def _matriz_turnos(self, medico_ids: List[int]) -> np.ndarray:
+        """Turnos por día de la semana de cada médico (n_medicos x 7)"""
+        matriz = np.zeros((len(medico_ids), 7), dtype=np.int64)
+        for fila, medico_id in enumerate(medico_ids):
+            for dia, (hora_inicio, hora_fin, duracion) in self.horario_semanal(medico_id).items():
+                matriz[fila, dia] = turnos_por_dia(hora_inicio, hora_fin, duracion)
+        return matriz
+
+    def capacidad(self, medico_ids: Iterable[int], fecha_inicio: date, fecha_fin: date) -> np.ndarray:
+        """Turnos disponibles de cada médico entre dos días (incluidos)"""
+        medico_ids = list(medico_ids)
+        if not medico_ids or fecha_fin < fecha_inicio:
+            return np.zeros(len(medico_ids), dtype=np.int64)
+
+        self._cargar()
+        inicio = np.datetime64(fecha_inicio, 'D')
+        fin = np.datetime64(fecha_fin, 'D') + 1
+        generales = np.array(sorted(self._feriados_generales), dtype='datetime64[D]')
+
+        # Cantidad de lunes, martes, ... laborables del rango (sin feriados generales)
+        dias = np.array([
+            np.busday_count(inicio, fin, weekmask="".join("1" if d == dia else "0" for d in range(7)),
+                            holidays=generales)
+            for dia in range(7)
+        ])
+        turnos = self._matriz_turnos(medico_ids)
+        capacidad = turnos @ dias
+
+        # Feriados particulares de cada médico dentro del rango
+        indices, fechas = [], []
+        for fila, medico_id in enumerate(medico_ids):
+            for fecha in self._feriados_medico.get(medico_id, ()):
+                if fecha not in self._feriados_generales:
+                    indices.append(fila)
+                    fechas.append(fecha)
+        if fechas:
+            indices = np.array(indices)
+            fechas = np.array(fechas, dtype='datetime64[D]')
+            en_rango = (fechas >= inicio) & (fechas < fin)
+            indices, fechas = indices[en_rango], fechas[en_rango]
+            dias_semana = (fechas.astype(np.int64) + 3) % 7  # 1970-01-01 fue jueves
+            np.subtract.at(capacidad, indices, turnos[indices, dias_semana])
+
+        return capacidad
+
+
+_calendarios_por_db = weakref.WeakKeyDictionary()
+
+def obtener_calendario(db: Database) -> CalendarioLaboral:
+    """Calendario laboral compartido por todos los servicios que usan la misma base"""
+    calendario = _calendarios_por_db.get(db)
+    if calendario is None:
+        calendario = _calendarios_por_db.setdefault(db, CalendarioLaboral(db))
+    return calendario
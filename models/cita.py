@@ -1,20 +1,33 @@
-from typing import List, Optional
-from datetime import datetime
+import sys
+from collections import Counter
+from typing import Iterator, List, Optional, Tuple
+from datetime import datetime, date, time, timedelta
+import mysql.connector
 from models.database import Database
+from models.agenda import (obtener_agenda, hay_solapamiento, a_datetime, HorarioOcupado,
+                           DURACION_PREDETERMINADA)
+from models.contadores import obtener_contadores, clave_cita, leer_clave, aplicar_deltas
+from models.proximas import obtener_proximas
 from models.paciente import Paciente
 from models.medico import Medico
 
 class Cita:
     """Clase para representar una cita médica"""
     
+    # Sin __dict__ por instancia: menos memoria en listados grandes
+    __slots__ = ('id', 'paciente_id', 'medico_id', 'fecha_hora', 'estado', 'motivo', 'duracion',
+                 'paciente', 'medico')
+    
     def __init__(self, id: int = None, paciente_id: int = None, medico_id: int = None,
-                 fecha_hora: str = None, estado: str = "programada", motivo: str = ""):
+                 fecha_hora: str = None, estado: str = "programada", motivo: str = "",
+                 duracion: int = DURACION_PREDETERMINADA):
         self.id = id
         self.paciente_id = paciente_id
         self.medico_id = medico_id
         self.fecha_hora = fecha_hora
         self.estado = estado
         self.motivo = motivo
+        self.duracion = duracion  # minutos
         self.paciente = None
         self.medico = None
     
@@ -22,22 +35,104 @@ class Cita:
         fecha_str = self.fecha_hora.strftime("%Y-%m-%d %H:%M") if isinstance(self.fecha_hora, datetime) else str(self.fecha_hora)
         return f"Cita {self.id}: {fecha_str} - {self.estado}"
     
+    def _choca(self, cursor) -> bool:
+        """¿La cita programada se cruza con otra cita activa de su médico? (verificado en la tabla)"""
+        inicio = a_datetime(self.fecha_hora)
+        if self.estado != "programada" or not self.medico_id or inicio is None:
+            return False
+        return hay_solapamiento(cursor, self.medico_id, inicio, self.duracion or DURACION_PREDETERMINADA, self.id)
+    
     def guardar(self, db: Database) -> bool:
-        """Guarda la cita en la base de datos"""
-        if self.id is None:
-            query = """INSERT INTO citas (paciente_id, medico_id, fecha_hora, estado, motivo) 
-                       VALUES (%s, %s, %s, %s, %s)"""
-            params = (self.paciente_id, self.medico_id, self.fecha_hora, self.estado, self.motivo)
-            result = db.execute_query(query, params)
-            if result:
-                self.id = result
-                return True
-        else:
-            query = """UPDATE citas SET paciente_id=%s, medico_id=%s, fecha_hora=%s, 
-                       estado=%s, motivo=%s WHERE id=%s"""
-            params = (self.paciente_id, self.medico_id, self.fecha_hora, self.estado, self.motivo, self.id)
-            return db.execute_query(query, params) is not None
-        return False
+        """Guarda la cita en la base de datos y actualiza los contadores en la misma transacción.
+
+        Una cita programada no se guarda si se cruza con otra cita activa del
+        médico; la verificación se hace contra la tabla dentro de la misma
+        transacción, así no depende de que la agenda en memoria esté al día.
+        """
+        deltas = Counter()
+        nuevo_id = self.id
+        ocupado = False
+        try:
+            with db.transaccion() as cursor:
+                if self.id is not None:
+                    anterior = leer_clave(cursor, self.id)
+                    if anterior is None:
+                        return False  # La cita ya no existe
+                    deltas[anterior] -= 1
+                if self._choca(cursor):
+                    ocupado = True
+                elif self.id is None:
+                    query = """INSERT INTO citas (paciente_id, medico_id, fecha_hora, estado, motivo, duracion) 
+                               VALUES (%s, %s, %s, %s, %s, %s)"""
+                    params = (self.paciente_id, self.medico_id, self.fecha_hora, self.estado, self.motivo,
+                              self.duracion)
+                    cursor.execute(query, params)
+                    nuevo_id = cursor.lastrowid
+                else:
+                    query = """UPDATE citas SET paciente_id=%s, medico_id=%s, fecha_hora=%s, 
+                               estado=%s, motivo=%s, duracion=%s WHERE id=%s"""
+                    params = (self.paciente_id, self.medico_id, self.fecha_hora, self.estado, self.motivo,
+                              self.duracion, self.id)
+                    cursor.execute(query, params)
+                if not ocupado:
+                    deltas[clave_cita(self.medico_id, self.estado, self.fecha_hora)] += 1
+                    aplicar_deltas(cursor, deltas)
+        except mysql.connector.Error as e:
+            print(f"❌ Error en la consulta: {e}")
+            return False
+        
+        if ocupado:
+            print("❌ El médico ya tiene una cita en ese horario")
+            # La agenda en memoria no lo sabía: está desfasada respecto de la tabla
+            obtener_agenda(db).invalidar(self.medico_id)
+            return False
+        
+        self.id = nuevo_id
+        obtener_contadores(db).aplicar(deltas)
+        obtener_agenda(db).registrar(self)
+        obtener_proximas(db).registrar(self)
+        return True
+    
+    @classmethod
+    def guardar_lote(cls, db: Database, citas: List['Cita'], tamano_lote: int = 500) -> List[int]:
+        """Inserta muchas citas nuevas en una sola transacción y retorna sus ids.
+
+        Igual que en `guardar`, cada cita programada se verifica contra la tabla
+        antes del commit: ya insertado el lote, la verificación ve tanto las
+        citas existentes como las demás del mismo lote. Si alguna se cruza no se
+        guarda ninguna y se retorna una lista vacía.
+        """
+        nuevas = [c for c in citas if c.id is None]
+        query = """INSERT INTO citas (paciente_id, medico_id, fecha_hora, estado, motivo, duracion) 
+                   VALUES (%s, %s, %s, %s, %s, %s)"""
+        params = [(c.paciente_id, c.medico_id, c.fecha_hora, c.estado, c.motivo, c.duracion) for c in nuevas]
+        deltas = Counter(clave_cita(c.medico_id, c.estado, c.fecha_hora) for c in nuevas)
+        
+        def verificar_y_contar(cursor, ids):
+            for cita, nuevo_id in zip(nuevas, ids):
+                cita.id = nuevo_id
+                try:
+                    if cita._choca(cursor):
+                        raise HorarioOcupado(cita.medico_id, cita.fecha_hora)
+                finally:
+                    cita.id = None
+            aplicar_deltas(cursor, deltas)
+        
+        try:
+            ids = db.execute_many(query, params, tamano_lote, al_final=verificar_y_contar)
+        except HorarioOcupado as e:
+            print(f"❌ No se guardó el lote: {e}")
+            obtener_agenda(db).invalidar(e.medico_id)
+            return []
+        if not ids:
+            return []
+        obtener_contadores(db).aplicar(deltas)
+        agenda, proximas = obtener_agenda(db), obtener_proximas(db)
+        for cita, nuevo_id in zip(nuevas, ids):
+            cita.id = nuevo_id
+            agenda.registrar(cita)
+            proximas.registrar(cita)
+        return ids
     
     def cargar_detalles(self, db: Database):
         """Carga los detalles del paciente y médico"""
@@ -47,46 +142,135 @@ class Cita:
             self.medico = Medico.buscar_por_id(db, self.medico_id)
     
     @staticmethod
-    def obtener_todas(db: Database) -> List['Cita']:
-        """Obtiene todas las citas con detalles de paciente y médico"""
-        query = """SELECT c.*, p.nombre as paciente_nombre, m.nombre as medico_nombre, 
-                          m.especialidad as medico_especialidad
-                   FROM citas c
-                   LEFT JOIN pacientes p ON c.paciente_id = p.id
-                   LEFT JOIN medicos m ON c.medico_id = m.id
-                   ORDER BY c.fecha_hora DESC"""
-        resultados = db.execute_query(query, fetch=True)
-        citas = []
+    def cargar_detalles_lote(db: Database, citas: List['Cita']) -> List['Cita']:
+        """Carga pacientes y médicos de muchas citas con una consulta por entidad (sin N+1)"""
+        sin_paciente = [c for c in citas if c.paciente_id and not c.paciente]
+        sin_medico = [c for c in citas if c.medico_id and not c.medico]
         
-        if not resultados:
-            return citas
-            
-        for resultado in resultados:
-            cita = Cita(
-                id=resultado['id'],
-                paciente_id=resultado['paciente_id'],
-                medico_id=resultado['medico_id'],
-                fecha_hora=resultado['fecha_hora'],
-                estado=resultado['estado'],
-                motivo=resultado['motivo']
-            )
-            # ✅ CORREGIDO: Manejo seguro de valores nulos
-            cita.paciente = Paciente(
+        if sin_paciente:
+            pacientes = Paciente.buscar_por_ids(db, (c.paciente_id for c in sin_paciente))
+            for cita in sin_paciente:
+                cita.paciente = pacientes.get(cita.paciente_id)
+        if sin_medico:
+            medicos = Medico.buscar_por_ids(db, (c.medico_id for c in sin_medico))
+            for cita in sin_medico:
+                cita.medico = medicos.get(cita.medico_id)
+        return citas
+    
+    @staticmethod
+    def _desde_fila(resultado: dict, pacientes: dict = None, medicos: dict = None) -> 'Cita':
+        """Construye una cita (con paciente y médico resumidos) a partir de una fila del JOIN.
+
+        Si se pasan los diccionarios `pacientes` y `medicos`, las citas de un mismo
+        resultado comparten una única instancia por paciente y por médico.
+        """
+        cita = Cita(
+            id=resultado['id'],
+            paciente_id=resultado['paciente_id'],
+            medico_id=resultado['medico_id'],
+            fecha_hora=resultado['fecha_hora'],
+            # El estado se repite en todas las filas: se comparte una sola cadena
+            estado=sys.intern(resultado['estado']) if resultado['estado'] else resultado['estado'],
+            motivo=resultado['motivo'],
+            duracion=resultado.get('duracion', DURACION_PREDETERMINADA)
+        )
+        # ✅ CORREGIDO: Manejo seguro de valores nulos
+        paciente = pacientes.get(cita.paciente_id) if pacientes is not None else None
+        if paciente is None:
+            paciente = Paciente(
                 id=resultado['paciente_id'],
                 nombre=resultado.get('paciente_nombre', 'N/A')
             )
-            cita.medico = Medico(
+            if pacientes is not None:
+                pacientes[cita.paciente_id] = paciente
+        medico = medicos.get(cita.medico_id) if medicos is not None else None
+        if medico is None:
+            medico = Medico(
                 id=resultado['medico_id'],
                 nombre=resultado.get('medico_nombre', 'N/A'),
                 especialidad=resultado.get('medico_especialidad', 'N/A')
             )
-            citas.append(cita)
-        return citas
+            if medicos is not None:
+                medicos[cita.medico_id] = medico
+        cita.paciente = paciente
+        cita.medico = medico
+        return cita
+    
+    @staticmethod
+    def consulta() -> 'ConsultaCitas':
+        """Crea una consulta componible de citas (se traduce a un único WHERE parametrizado)"""
+        return ConsultaCitas()
+    
+    @staticmethod
+    def obtener_todas(db: Database) -> List['Cita']:
+        """Obtiene todas las citas con detalles de paciente y médico"""
+        return Cita.consulta().obtener(db)
+    
+    @staticmethod
+    def iter_todas(db: Database, tamano_lote: int = 1000) -> Iterator['Cita']:
+        """Recorre todas las citas (más recientes primero) sin cargarlas todas en memoria"""
+        return Cita.consulta().iterar(db, tamano_lote)
+    
+    @staticmethod
+    def obtener_pagina(db: Database, token: Optional[Tuple[datetime, int]] = None,
+                       cantidad: int = 200) -> Tuple[List['Cita'], Optional[Tuple[datetime, int]]]:
+        """Obtiene una página de citas (más recientes primero) y el token (fecha_hora, id) de la siguiente"""
+        return Cita.consulta().despues_de(token).obtener_pagina(db, cantidad)
+    
+    # Agregados del historial de un paciente; todos salen del índice (paciente_id, fecha_hora)
+    RESUMEN_HISTORIAL = """SELECT COUNT(*) AS historial_total,
+                                  COALESCE(SUM(c.estado = 'completada'), 0) AS historial_visitas,
+                                  MAX(CASE WHEN c.estado = 'completada' THEN c.fecha_hora END) AS historial_ultima_visita,
+                                  GROUP_CONCAT(DISTINCT CASE WHEN c.estado = 'completada' THEN m.nombre END
+                                               SEPARATOR '\\n') AS historial_medicos
+                           FROM citas c
+                           LEFT JOIN medicos m ON c.medico_id = m.id
+                           WHERE c.paciente_id = %s"""
+    
+    @staticmethod
+    def historial_paciente(db: Database, paciente_id: int, token: Optional[Tuple[datetime, int]] = None,
+                           cantidad: int = 100, con_resumen: bool = True
+                           ) -> Tuple[List['Cita'], Optional[Tuple[datetime, int]], Optional[dict]]:
+        """Una página del historial de un paciente (más recientes primero).
+
+        Retorna (citas, token de la siguiente página o None, resumen). Con
+        `con_resumen` el resumen (total de citas, visitas, última visita y
+        médicos que lo atendieron) llega en la misma consulta que la página;
+        si no, es None.
+        """
+        consulta = Cita.consulta().paciente(paciente_id).despues_de(token)
+        if not con_resumen:
+            citas, siguiente = consulta.obtener_pagina(db, cantidad)
+            return citas, siguiente, None
+        
+        pagina, params = consulta.limite(cantidad).compilar()
+        # La fila de agregados siempre existe; el LEFT JOIN le agrega una cita por fila
+        query = f"""SELECT r.*, h.* FROM ({Cita.RESUMEN_HISTORIAL}) r
+                    LEFT JOIN ({pagina}) h ON TRUE
+                    ORDER BY h.fecha_hora DESC, h.id DESC"""
+        filas = db.execute_query(query, (paciente_id,) + params, fetch=True) or []
+        if not filas:
+            return [], None, None
+        
+        primera = filas[0]
+        medicos = primera['historial_medicos']
+        resumen = {
+            'total_citas': int(primera['historial_total']),
+            'visitas': int(primera['historial_visitas']),
+            'ultima_visita': primera['historial_ultima_visita'],
+            'medicos': sorted(medicos.split("\n")) if medicos else []
+        }
+        pacientes, medicos_vistos = {}, {}
+        citas = [Cita._desde_fila(fila, pacientes, medicos_vistos) for fila in filas if fila['id'] is not None]
+        if len(citas) < cantidad:
+            return citas, None, resumen
+        return citas, (citas[-1].fecha_hora, citas[-1].id), resumen
     
     @staticmethod
     def buscar_por_id(db: Database, id: int) -> Optional['Cita']:
         """Busca una cita por ID"""
-        query = "SELECT * FROM citas WHERE id = %s"
+        query = """SELECT id, paciente_id, medico_id, fecha_hora, estado, motivo, duracion
+                   FROM citas WHERE id = %s"""
         resultado = db.execute_query(query, (id,), fetch=True)
         if resultado and len(resultado) > 0:
             return Cita(**resultado[0])
@@ -94,9 +278,22 @@ class Cita:
     
     @staticmethod
     def eliminar(db: Database, id: int) -> bool:
-        """Elimina una cita por ID"""
-        query = "DELETE FROM citas WHERE id = %s"
-        return db.execute_query(query, (id,)) is not None
+        """Elimina una cita por ID y la descuenta de los contadores en la misma transacción"""
+        deltas = Counter()
+        try:
+            with db.transaccion() as cursor:
+                anterior = leer_clave(cursor, id)
+                cursor.execute("DELETE FROM citas WHERE id = %s", (id,))
+                if anterior is not None:
+                    deltas[anterior] -= 1
+                    aplicar_deltas(cursor, deltas)
+        except mysql.connector.Error as e:
+            print(f"❌ Error en la consulta: {e}")
+            return False
+        obtener_contadores(db).aplicar(deltas)
+        obtener_agenda(db).quitar(id)
+        obtener_proximas(db).quitar(id)
+        return True
     
     def cancelar(self, db: Database) -> bool:
         """Cancela la cita"""
@@ -108,50 +305,176 @@ class Cita:
         self.estado = "completada"
         return self.guardar(db)
     
+    @staticmethod
+    def contar_por_medico(db: Database, fecha_inicio: date, fecha_fin: date) -> List[dict]:
+        """Cuenta las citas de cada médico entre dos días (incluidos) con una sola consulta agregada"""
+        query = """SELECT m.id AS medico_id, m.nombre AS medico, COUNT(c.id) AS citas
+                   FROM medicos m
+                   LEFT JOIN citas c ON c.medico_id = m.id
+                                    AND c.fecha_hora >= %s AND c.fecha_hora < %s
+                   GROUP BY m.id, m.nombre
+                   ORDER BY m.nombre"""
+        inicio = datetime.combine(fecha_inicio, time.min)
+        fin = datetime.combine(fecha_fin, time.min) + timedelta(days=1)
+        return db.execute_query(query, (inicio, fin), fetch=True) or []
+    
     @staticmethod
     def obtener_por_medico(db: Database, medico_id: int) -> List['Cita']:
         """Obtiene todas las citas asignadas a un médico usando su ID"""
+        return Cita.consulta().medico(medico_id).ordenar_por_fecha(descendente=False).obtener(db)
 
-        query = """
-            SELECT c.*, p.nombre as paciente_nombre, m.nombre as medico_nombre, 
-                m.especialidad as medico_especialidad
-            FROM citas c
-            LEFT JOIN pacientes p ON c.paciente_id = p.id
-            LEFT JOIN medicos m ON c.medico_id = m.id
-            WHERE c.medico_id = %s
-            ORDER BY c.fecha_hora ASC
-        """
-        
-        resultados = db.execute_query(query, (medico_id,), fetch=True)
-
-        citas = []
-        if not resultados:
-            return citas
-
-        for resultado in resultados:
-            cita = Cita(
-                id=resultado['id'],
-                paciente_id=resultado['paciente_id'],
-                medico_id=resultado['medico_id'],
-                fecha_hora=resultado['fecha_hora'],
-                estado=resultado['estado'],
-                motivo=resultado['motivo']
-            )
-
-            # Cargar datos del paciente y médico (si existen)
-            cita.paciente = Paciente(
-                id=resultado['paciente_id'],
-                nombre=resultado.get('paciente_nombre', 'N/A')
-            )
 
-            cita.medico = Medico(
-                id=resultado['medico_id'],
-                nombre=resultado.get('medico_nombre', 'N/A'),
-                especialidad=resultado.get('medico_especialidad', 'N/A')
-            )
+class ConsultaCitas:
+    """Constructor de consultas de citas: cada criterio agrega una condición al WHERE"""
+    
+    SELECT_BASE = """SELECT c.*, p.nombre as paciente_nombre, m.nombre as medico_nombre, 
+                            m.especialidad as medico_especialidad
+                     FROM citas c
+                     LEFT JOIN pacientes p ON c.paciente_id = p.id
+                     LEFT JOIN medicos m ON c.medico_id = m.id"""
+    
+    def __init__(self):
+        self._condiciones = []
+        self._params = []
+        self._orden = "c.fecha_hora DESC, c.id DESC"
+        self._limite = None
+        self._descendente = True
+        self._cursor = None
+    
+    def _agregar(self, condicion: str, *params) -> 'ConsultaCitas':
+        self._condiciones.append(condicion)
+        self._params.extend(params)
+        return self
+    
+    def estado(self, estado: str) -> 'ConsultaCitas':
+        """Filtra por estado de la cita"""
+        return self._agregar("c.estado = %s", estado)
+    
+    def excluir_estado(self, estado: str) -> 'ConsultaCitas':
+        """Excluye un estado de la cita"""
+        return self._agregar("c.estado <> %s", estado)
+    
+    def medico(self, medico_id: int) -> 'ConsultaCitas':
+        """Filtra por médico"""
+        return self._agregar("c.medico_id = %s", medico_id)
+    
+    def paciente(self, paciente_id: int) -> 'ConsultaCitas':
+        """Filtra por paciente"""
+        return self._agregar("c.paciente_id = %s", paciente_id)
+    
+    def ids(self, ids: List[int]) -> 'ConsultaCitas':
+        """Solo las citas indicadas (búsqueda por clave primaria)"""
+        ids = list(ids)
+        if not ids:
+            return self._agregar("FALSE")
+        return self._agregar(f"c.id IN ({', '.join(['%s'] * len(ids))})", *ids)
+    
+    def desde(self, fecha_hora: datetime) -> 'ConsultaCitas':
+        """Citas con fecha_hora >= fecha_hora indicada"""
+        return self._agregar("c.fecha_hora >= %s", fecha_hora)
+    
+    def hasta(self, fecha_hora: datetime) -> 'ConsultaCitas':
+        """Citas con fecha_hora < fecha_hora indicada (límite exclusivo)"""
+        return self._agregar("c.fecha_hora < %s", fecha_hora)
+    
+    def en_fecha(self, fecha: date) -> 'ConsultaCitas':
+        """Citas de un día completo"""
+        inicio = datetime.combine(fecha, time.min)
+        return self.desde(inicio).hasta(inicio + timedelta(days=1))
+    
+    def entre_fechas(self, fecha_inicio: date, fecha_fin: date) -> 'ConsultaCitas':
+        """Citas entre dos días, ambos incluidos"""
+        inicio = datetime.combine(fecha_inicio, time.min)
+        fin = datetime.combine(fecha_fin, time.min) + timedelta(days=1)
+        return self.desde(inicio).hasta(fin)
+    
+    def ordenar_por_fecha(self, descendente: bool = True) -> 'ConsultaCitas':
+        """Ordena por fecha_hora (y por id para desempatar), con las citas sin fecha al final.
 
-            citas.append(cita)
+        MySQL ya deja los NULL al final en orden descendente (el del listado,
+        que así sigue recorriendo el índice); en ascendente los pondría primero.
+        """
+        if descendente:
+            self._orden = "c.fecha_hora DESC, c.id DESC"
+        else:
+            self._orden = "c.fecha_hora IS NULL, c.fecha_hora ASC, c.id ASC"
+        self._descendente = descendente
+        return self
+    
+    def limite(self, cantidad: int) -> 'ConsultaCitas':
+        """Limita la cantidad de filas devueltas"""
+        self._limite = int(cantidad)
+        return self
+    
+    def despues_de(self, token: Optional[Tuple[datetime, int]]) -> 'ConsultaCitas':
+        """Continúa después de la cita (fecha_hora, id) indicada, en el orden de la consulta.
 
-        return citas
+        Paginación por clave: el índice por fecha_hora lleva directo a la página,
+        sin leer y descartar las filas anteriores como haría un OFFSET. El token
+        admite fecha_hora None (las citas sin fecha van al final).
+        """
+        self._cursor = token
+        return self
+    
+    def compilar(self) -> Tuple[str, tuple]:
+        """Traduce la consulta a SQL parametrizado"""
+        condiciones, params = list(self._condiciones), list(self._params)
+        if self._cursor is not None:
+            fecha_hora, id = self._cursor
+            op = "<" if self._descendente else ">"
+            if fecha_hora is None:
+                # Ya se está en el tramo final de citas sin fecha: solo desempata el id
+                condiciones.append(f"(c.fecha_hora IS NULL AND c.id {op} %s)")
+                params.append(id)
+            else:
+                # Las citas sin fecha (que van al final) siempre quedan después del token
+                condiciones.append(f"(c.fecha_hora {op} %s OR (c.fecha_hora = %s AND c.id {op} %s)"
+                                   f" OR c.fecha_hora IS NULL)")
+                params.extend((fecha_hora, fecha_hora, id))
+        
+        query = self.SELECT_BASE
+        if condiciones:
+            query += "\n                     WHERE " + " AND ".join(condiciones)
+        query += f"\n                     ORDER BY {self._orden}"
+        if self._limite is not None:
+            query += f" LIMIT {self._limite}"
+        return query, tuple(params)
+    
+    def contar(self, db: Database) -> int:
+        """Cuenta las citas que cumplen los criterios sin traer las filas"""
+        query = "SELECT COUNT(*) AS total FROM citas c"
+        if self._condiciones:
+            query += " WHERE " + " AND ".join(self._condiciones)
+        resultado = db.execute_query(query, tuple(self._params), fetch=True)
+        return resultado[0]['total'] if resultado else 0
+    
+    def obtener(self, db: Database) -> List[Cita]:
+        """Ejecuta la consulta y retorna las citas con sus detalles"""
+        query, params = self.compilar()
+        resultados = db.execute_query(query, params, fetch=True)
+        if not resultados:
+            return []
+        pacientes, medicos = {}, {}
+        return [Cita._desde_fila(resultado, pacientes, medicos) for resultado in resultados]
+    
+    def iterar(self, db: Database, tamano_lote: int = 1000) -> Iterator[Cita]:
+        """Ejecuta la consulta y va entregando las citas a medida que llegan del servidor.
 
+        Las instancias de paciente y médico se comparten solo dentro de cada lote
+        de `tamano_lote` filas: en un recorrido largo los diccionarios no crecen
+        con todos los pacientes de la tabla.
+        """
+        query, params = self.compilar()
+        pacientes, medicos = {}, {}
+        for numero, resultado in enumerate(db.iter_query(query, params, tamano_lote), 1):
+            yield Cita._desde_fila(resultado, pacientes, medicos)
+            if numero % tamano_lote == 0:
+                pacientes, medicos = {}, {}
     
+    def obtener_pagina(self, db: Database, cantidad: int = 200) -> Tuple[List[Cita], Optional[Tuple[datetime, int]]]:
+        """Ejecuta la consulta de a una página y retorna (citas, token de la siguiente o None)"""
+        citas = self.limite(cantidad).obtener(db)
+        if len(citas) < cantidad:
+            return citas, None
+        ultima = citas[-1]
+        return citas, (ultima.fecha_hora, ultima.id)
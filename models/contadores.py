@@ -0,0 +1,193 @@
+import threading
+import time
+import weakref
+from collections import Counter
+from datetime import date
+from typing import Dict, Optional, Tuple
+import mysql.connector
+from config.database_config import CONTADORES_CONFIG
+from models.database import Database
+from models.agenda import a_datetime
+
+# Estados posibles de una cita (columna ENUM de la tabla citas)
+ESTADOS = ('programada', 'completada', 'cancelada')
+
+# Claves de la tabla contadores_citas para citas sin médico o sin fecha
+SIN_MEDICO = 0
+SIN_FECHA = date(1000, 1, 1)
+
+Clave = Tuple[int, str, date]  # (medico_id, estado, dia)
+
+UPSERT = """INSERT INTO contadores_citas (medico_id, estado, dia, cantidad) VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad)"""
+
+RECONSTRUIR = """INSERT INTO contadores_citas (medico_id, estado, dia, cantidad)
+                 SELECT COALESCE(medico_id, 0), estado, COALESCE(DATE(fecha_hora), '1000-01-01'), COUNT(*)
+                 FROM citas
+                 WHERE estado IS NOT NULL
+                 GROUP BY 1, 2, 3"""
+
+# === DELTAS (se aplican dentro de la transacción que modifica citas) ===
+
+def clave_cita(medico_id: Optional[int], estado: str, fecha_hora) -> Optional[Clave]:
+    """Clave del contador al que suma una cita"""
+    if not estado:
+        return None
+    fecha = a_datetime(fecha_hora)
+    return (medico_id or SIN_MEDICO, estado, fecha.date() if fecha else SIN_FECHA)
+
+def leer_clave(cursor, cita_id: int) -> Optional[Clave]:
+    """Clave actual de una cita guardada, bloqueando su fila hasta el fin de la transacción"""
+    cursor.execute("SELECT medico_id, estado, fecha_hora FROM citas WHERE id = %s FOR UPDATE", (cita_id,))
+    filas = cursor.fetchall()
+    if not filas:
+        return None
+    return clave_cita(filas[0]['medico_id'], filas[0]['estado'], filas[0]['fecha_hora'])
+
+def descontar_citas(cursor, condicion: str, params: tuple) -> Counter:
+    """Resta de los contadores las citas que cumplen la condición (antes de borrarlas en cascada)"""
+    cursor.execute(
+        f"""SELECT COALESCE(medico_id, 0) AS medico_id, estado,
+                   COALESCE(DATE(fecha_hora), '1000-01-01') AS dia, COUNT(*) AS cantidad
+            FROM citas
+            WHERE {condicion} AND estado IS NOT NULL
+            GROUP BY 1, 2, 3""",
+        params
+    )
+    deltas = Counter()
+    for fila in cursor.fetchall():
+        deltas[(fila['medico_id'], fila['estado'], fila['dia'])] -= fila['cantidad']
+    aplicar_deltas(cursor, deltas)
+    return deltas
+
+def aplicar_deltas(cursor, deltas: Counter):
+    """Suma los deltas a la tabla contadores_citas"""
+    filas = [(*clave, cantidad) for clave, cantidad in deltas.items() if clave is not None and cantidad]
+    if filas:
+        cursor.executemany(UPSERT, filas)
+
+
+class ContadoresCitas:
+    """Réplica en memoria de contadores_citas con totales precalculados.
+
+    Se carga una vez desde la tabla y después recibe los mismos deltas que se
+    confirmaron en la base, así los conteos del tablero son lecturas de un
+    diccionario. Otras instancias de la aplicación también mantienen la tabla
+    dentro de sus transacciones, así que la réplica se relee cada `ttl`
+    segundos para recoger sus cambios; `invalidar` fuerza la relectura y
+    `reconstruir_contadores` recalcula la tabla desde citas. Si la lectura
+    falla no se guarda nada y los conteos dan cero hasta el próximo intento.
+    """
+
+    def __init__(self, db: Database, ttl: float = CONTADORES_CONFIG['ttl']):
+        self.db = db
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._por_dia: Optional[Dict[Clave, int]] = None
+        self._por_estado: Counter = Counter()
+        self._por_medico_estado: Counter = Counter()
+        self._cargado_en = 0.0
+
+    def _sumar(self, clave: Clave, cantidad: int):
+        medico_id, estado, _ = clave
+        self._por_dia[clave] = self._por_dia.get(clave, 0) + cantidad
+        self._por_estado[estado] += cantidad
+        self._por_medico_estado[(medico_id, estado)] += cantidad
+
+    def _cargar(self) -> bool:
+        """Lee la tabla si la réplica no está cargada o venció; retorna si hay datos vigentes"""
+        with self._lock:
+            if self._por_dia is not None and time.monotonic() - self._cargado_en < self.ttl:
+                return True
+            filas = self.db.execute_query(
+                "SELECT medico_id, estado, dia, cantidad FROM contadores_citas WHERE cantidad <> 0",
+                fetch=True
+            )
+            if filas is None:
+                self._por_dia = None
+                return False
+            self._por_dia = {}
+            self._por_estado = Counter()
+            self._por_medico_estado = Counter()
+            for fila in filas:
+                self._sumar((fila['medico_id'], fila['estado'], fila['dia']), fila['cantidad'])
+            self._cargado_en = time.monotonic()
+            return True
+
+    def aplicar(self, deltas: Counter):
+        """Refleja deltas ya confirmados en la base (si la réplica está cargada)"""
+        with self._lock:
+            if self._por_dia is None:
+                return
+            for clave, cantidad in deltas.items():
+                if clave is not None and cantidad:
+                    self._sumar(clave, cantidad)
+
+    def invalidar(self):
+        """Descarta la réplica para releerla de la tabla en la próxima consulta"""
+        with self._lock:
+            self._por_dia = None
+
+    # === CONSULTAS ===
+
+    def por_estado(self) -> Dict[str, int]:
+        """{estado: cantidad} de todas las citas"""
+        with self._lock:
+            if not self._cargar():
+                return {}
+            return {estado: cantidad for estado, cantidad in self._por_estado.items() if cantidad > 0}
+
+    def por_medico(self, estado: str) -> Dict[int, int]:
+        """{medico_id: cantidad} de las citas en un estado"""
+        with self._lock:
+            if not self._cargar():
+                return {}
+            return {
+                medico_id: cantidad
+                for (medico_id, estado_clave), cantidad in self._por_medico_estado.items()
+                if estado_clave == estado and medico_id != SIN_MEDICO and cantidad > 0
+            }
+
+    def del_dia(self, medico_id: int, estado: str, dia: date) -> int:
+        """Citas de un médico en un estado y un día"""
+        with self._lock:
+            if not self._cargar():
+                return 0
+            return self._por_dia.get((medico_id, estado, dia), 0)
+
+    def total(self) -> int:
+        """Cantidad total de citas"""
+        with self._lock:
+            if not self._cargar():
+                return 0
+            return sum(self._por_estado.values())
+
+
+_contadores_por_db = weakref.WeakKeyDictionary()
+
+def obtener_contadores(db: Database) -> ContadoresCitas:
+    """Contadores compartidos por todos los servicios que usan la misma base"""
+    contadores = _contadores_por_db.get(db)
+    if contadores is None:
+        contadores = _contadores_por_db.setdefault(db, ContadoresCitas(db))
+    return contadores
+
+def reconstruir_contadores(db: Database) -> bool:
+    """Recalcula contadores_citas desde la tabla citas (corrige cualquier desfase)"""
+    try:
+        with db.transaccion() as cursor:
+            cursor.execute("DELETE FROM contadores_citas")
+            cursor.execute(RECONSTRUIR)
+    except mysql.connector.Error as e:
+        print(f"❌ Error reconstruyendo contadores: {e}")
+        return False
+    obtener_contadores(db).invalidar()
+    return True
+
+
+if __name__ == "__main__":
+    # Uso: python -m models.contadores
+    db = Database()
+    if reconstruir_contadores(db):
+        print("✅ Contadores de citas reconstruidos")
+    db.close()
@@ -1,41 +1,325 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
 import mysql.connector
-from config.database_config import DB_CONFIG
+from mysql.connector.errors import PoolError
+from config.database_config import DB_CONFIG, POOL_CONFIG
+
+class PoolConexiones:
+    """Pool acotado y seguro entre hilos de conexiones MySQL"""
+
+    def __init__(self, config: dict, max_conexiones: int = 5, timeout_espera: float = 10,
+                 tiempo_inactividad: float = 300):
+        self.config = config
+        self.max_conexiones = max_conexiones
+        self.timeout_espera = timeout_espera
+        self.tiempo_inactividad = tiempo_inactividad
+        self._libres = deque()  # (conexion, instante de devolución)
+        self._condicion = threading.Condition()
+        self._creadas = 0
+        self._en_uso = 0
+        self._total_creadas = 0
+        self._total_prestamos = 0
+        self._total_descartadas = 0
+        self._tiempo_espera_total = 0.0
+        self._tiempo_espera_max = 0.0
+
+    def _crear_conexion(self):
+        """Abre una nueva conexión física"""
+        conexion = mysql.connector.connect(**self.config)
+        with self._condicion:
+            self._total_creadas += 1
+        return conexion
+
+    def _descartar(self, conexion):
+        """Cierra una conexión y libera su lugar en el pool"""
+        try:
+            conexion.close()
+        except mysql.connector.Error:
+            pass
+        with self._condicion:
+            self._creadas -= 1
+            self._total_descartadas += 1
+            self._condicion.notify()
+
+    @staticmethod
+    def _esta_viva(conexion) -> bool:
+        """Verifica la conexión antes de prestarla"""
+        try:
+            conexion.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def _purgar_inactivas(self) -> list:
+        """Saca del pool las conexiones ociosas vencidas (llamar con el lock tomado)"""
+        limite = time.monotonic() - self.tiempo_inactividad
+        vencidas = []
+        while self._libres and self._libres[0][1] < limite:
+            vencidas.append(self._libres.popleft()[0])
+        return vencidas
+
+    def obtener(self):
+        """Presta una conexión, esperando como máximo timeout_espera segundos"""
+        inicio = time.monotonic()
+        while True:
+            conexion = None
+            crear = False
+            with self._condicion:
+                vencidas = self._purgar_inactivas()
+                while True:
+                    if self._libres:
+                        conexion = self._libres.pop()[0]
+                        break
+                    if self._creadas < self.max_conexiones:
+                        self._creadas += 1
+                        crear = True
+                        break
+                    restante = self.timeout_espera - (time.monotonic() - inicio)
+                    if restante <= 0:
+                        raise PoolError("Tiempo de espera agotado: no hay conexiones libres en el pool")
+                    self._condicion.wait(restante)
+
+            for vencida in vencidas:
+                self._descartar(vencida)
+
+            if crear:
+                try:
+                    conexion = self._crear_conexion()
+                except mysql.connector.Error:
+                    with self._condicion:
+                        self._creadas -= 1
+                        self._condicion.notify()
+                    raise
+            elif not self._esta_viva(conexion):
+                self._descartar(conexion)
+                continue
+
+            espera = time.monotonic() - inicio
+            with self._condicion:
+                self._en_uso += 1
+                self._total_prestamos += 1
+                self._tiempo_espera_total += espera
+                self._tiempo_espera_max = max(self._tiempo_espera_max, espera)
+            return conexion
+
+    def devolver(self, conexion):
+        """Devuelve una conexión prestada al pool"""
+        try:
+            if conexion.in_transaction:
+                conexion.rollback()
+        except mysql.connector.Error:
+            with self._condicion:
+                self._en_uso -= 1
+            self._descartar(conexion)
+            return
+
+        with self._condicion:
+            self._en_uso -= 1
+            self._libres.append((conexion, time.monotonic()))
+            self._condicion.notify()
+
+    def estadisticas(self) -> dict:
+        """Devuelve métricas del pool para dimensionarlo bajo carga"""
+        with self._condicion:
+            prestamos = self._total_prestamos
+            return {
+                'max_conexiones': self.max_conexiones,
+                'abiertas': self._creadas,
+                'en_uso': self._en_uso,
+                'libres': len(self._libres),
+                'total_creadas': self._total_creadas,
+                'total_descartadas': self._total_descartadas,
+                'total_prestamos': prestamos,
+                'espera_promedio': self._tiempo_espera_total / prestamos if prestamos else 0.0,
+                'espera_maxima': self._tiempo_espera_max
+            }
+
+    def cerrar(self):
+        """Cierra todas las conexiones libres del pool"""
+        with self._condicion:
+            libres = [conexion for conexion, _ in self._libres]
+            self._libres.clear()
+        for conexion in libres:
+            self._descartar(conexion)
+
 
 class Database:
-    """Clase para manejar la conexión a la base de datos"""
-    
+    """Clase para manejar las conexiones a la base de datos"""
+
     def __init__(self):
-        self.connection = None
+        self.pool = PoolConexiones(DB_CONFIG, **POOL_CONFIG)
+        self._local = threading.local()
         self.connect()
-    
+
     def connect(self):
-        """Establece conexión con la base de datos"""
+        """Verifica que se pueda establecer conexión con la base de datos"""
         try:
-            self.connection = mysql.connector.connect(**DB_CONFIG)
+            conexion = self.pool.obtener()
+            self.pool.devolver(conexion)
             return True
         except mysql.connector.Error as e:
             print(f"❌ Error conectando a la base de datos: {e}")
             return False
-    
+
+    def _registrar_consulta(self):
+        """Incrementa el contador de consultas del hilo actual"""
+        self._local.consultas = getattr(self._local, 'consultas', 0) + 1
+
+    @property
+    def consultas_ejecutadas(self) -> int:
+        """Cantidad de consultas ejecutadas por el hilo actual"""
+        return getattr(self._local, 'consultas', 0)
+
+    @contextmanager
+    def limite_consultas(self, maximo: int, estricto: bool = False):
+        """Vigila que el bloque no ejecute más de `maximo` consultas (patrones N+1).
+
+        En la aplicación solo avisa por consola, para que una consulta de más no
+        corte un reporte; las pruebas usan `estricto=True` y fallan con AssertionError.
+        """
+        inicio = self.consultas_ejecutadas
+        yield
+        ejecutadas = self.consultas_ejecutadas - inicio
+        if ejecutadas > maximo:
+            mensaje = f"Se ejecutaron {ejecutadas} consultas (máximo esperado: {maximo})"
+            if estricto:
+                raise AssertionError(mensaje)
+            print(f"⚠️ {mensaje}")
+
+    @contextmanager
+    def conexion(self):
+        """Presta una conexión del pool y la devuelve al terminar"""
+        conexion = self.pool.obtener()
+        try:
+            yield conexion
+        finally:
+            self.pool.devolver(conexion)
+
     def execute_query(self, query: str, params: tuple = None, fetch: bool = False):
         """Ejecuta una consulta en la base de datos"""
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute(query, params or ())
-            
-            if fetch:
-                result = cursor.fetchall()
-            else:
-                self.connection.commit()
-                result = cursor.lastrowid
-            
-            cursor.close()
+            with self.conexion() as conexion:
+                cursor = conexion.cursor(dictionary=True)
+                try:
+                    self._registrar_consulta()
+                    cursor.execute(query, params or ())
+
+                    if fetch:
+                        result = cursor.fetchall()
+                    else:
+                        conexion.commit()
+                        result = cursor.lastrowid
+                finally:
+                    cursor.close()
             return result
         except mysql.connector.Error as e:
             print(f"❌ Error en la consulta: {e}")
             return None
-    
+
+    def iter_query(self, query: str, params: tuple = None, tamano_lote: int = 1000):
+        """Recorre el resultado de una consulta fila por fila sin cargarlo entero en memoria.
+
+        Usa un cursor sin buffer: el servidor envía las filas a medida que se
+        leen de a `tamano_lote`. La conexión queda prestada hasta que se agota
+        (o se cierra) el generador, así que no conviene dejarlo a medio recorrer.
+
+        A diferencia de execute_query, un error se informa y se vuelve a lanzar:
+        un recorrido cortado a la mitad no debe confundirse con uno completo.
+        """
+        try:
+            with self.conexion() as conexion:
+                cursor = conexion.cursor(dictionary=True, buffered=False)
+                try:
+                    self._registrar_consulta()
+                    cursor.execute(query, params or ())
+                    while True:
+                        filas = cursor.fetchmany(tamano_lote)
+                        if not filas:
+                            break
+                        yield from filas
+                finally:
+                    # Si el recorrido se cortó antes, quedan filas pendientes en la conexión
+                    if conexion.unread_result:
+                        conexion.consume_results()
+                    cursor.close()
+        except mysql.connector.Error as e:
+            print(f"❌ Error en la consulta: {e}")
+            raise
+
+    @contextmanager
+    def transaccion(self):
+        """Ejecuta un bloque en una sola transacción: commit al final, rollback si falla"""
+        with self.conexion() as conexion:
+            cursor = conexion.cursor(dictionary=True)
+            try:
+                yield cursor
+                conexion.commit()
+            except Exception:
+                conexion.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def _paso_autoincremento(self, cursor) -> Optional[int]:
+        """Paso entre los ids de un INSERT multi-fila, o None si MySQL no los garantiza consecutivos.
+
+        Con innodb_autoinc_lock_mode 0 ("tradicional") o 1 ("consecutivo") un
+        INSERT de varias filas recibe ids seguidos (de a auto_increment_increment);
+        con 2 ("intercalado", el predeterminado de MySQL 8) pueden mezclarse con
+        los de otras sesiones y no se pueden deducir de lastrowid.
+        """
+        self._registrar_consulta()
+        cursor.execute("SELECT @@SESSION.auto_increment_increment AS paso, "
+                       "@@GLOBAL.innodb_autoinc_lock_mode AS modo")
+        fila = cursor.fetchone()
+        if fila is None or int(fila['modo']) not in (0, 1):
+            return None
+        return int(fila['paso'])
+
+    def execute_many(self, query: str, lista_params: list, tamano_lote: int = 500, al_final=None):
+        """Ejecuta una sentencia para muchas filas en lotes, dentro de una sola transacción.
+
+        Para un INSERT retorna los ids generados, en el orden de `lista_params`.
+        Si el servidor garantiza ids consecutivos cada lote viaja como un INSERT
+        multi-fila; si no, las filas se insertan de a una dentro de la misma
+        transacción para leer el id real de cada una. Retorna None si ocurre un
+        error, en cuyo caso no se guarda ninguna fila.
+        `al_final(cursor, ids)`, si se indica, corre antes del commit en la misma
+        transacción; si lanza una excepción se deshace todo y la excepción sigue.
+        """
+        ids = []
+        if not lista_params:
+            return ids
+        es_insert = query.lstrip().upper().startswith("INSERT")
+        try:
+            with self.transaccion() as cursor:
+                paso = self._paso_autoincremento(cursor) if es_insert else None
+                for inicio in range(0, len(lista_params), tamano_lote):
+                    lote = lista_params[inicio:inicio + tamano_lote]
+                    if es_insert and paso is None:
+                        for params in lote:
+                            self._registrar_consulta()
+                            cursor.execute(query, params)
+                            ids.append(cursor.lastrowid)
+                        continue
+                    self._registrar_consulta()
+                    cursor.executemany(query, lote)
+                    if es_insert:
+                        ids.extend(range(cursor.lastrowid, cursor.lastrowid + paso * len(lote), paso))
+                if al_final is not None:
+                    al_final(cursor, ids)
+            return ids
+        except mysql.connector.Error as e:
+            print(f"❌ Error en la consulta por lotes: {e}")
+            return None
+
+    def estadisticas_pool(self) -> dict:
+        """Estadísticas del pool de conexiones"""
+        return self.pool.estadisticas()
+
     def close(self):
-        """Cierra la conexión a la base de datos"""
-        if self.connection:
-            self.connection.close()
\ No newline at end of file
+        """Cierra las conexiones del pool"""
+        self.pool.cerrar()
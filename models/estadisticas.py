@@ -0,0 +1,182 @@
+import heapq
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from models.database import Database
+from models.medico import Medico
+from models.contadores import ESTADOS, obtener_contadores
+
+
+def consulta_medicos_ocupados(limite: int, estado: Optional[str] = 'programada', desde: datetime = None,
+                              hasta: datetime = None, especialidad: str = None) -> Tuple[str, list]:
+    """SQL parametrizado de los `limite` médicos con más citas (GROUP BY ... ORDER BY ... LIMIT).
+
+    Cuenta las citas en `estado` (todas si es None) con fecha_hora en [desde, hasta);
+    los médicos sin citas cuentan 0 y los empates se ordenan por nombre.
+    """
+    condiciones, params = ["c.medico_id = m.id"], []
+    if estado is not None:
+        condiciones.append("c.estado = %s")
+        params.append(estado)
+    if desde is not None:
+        condiciones.append("c.fecha_hora >= %s")
+        params.append(desde)
+    if hasta is not None:
+        condiciones.append("c.fecha_hora < %s")
+        params.append(hasta)
+    filtro_medicos = ""
+    if especialidad is not None:
+        filtro_medicos = "WHERE m.especialidad = %s"
+        params.append(especialidad)
+    params.append(limite)
+    query = f"""SELECT m.id, m.nombre, m.especialidad, m.telefono, m.email, COUNT(c.id) AS citas_pendientes
+        FROM medicos m
+        LEFT JOIN citas c ON {" AND ".join(condiciones)}
+        {filtro_medicos}
+        GROUP BY m.id
+        ORDER BY citas_pendientes DESC, m.nombre
+        LIMIT %s"""
+    return query, params
+
+
+def _medico_ocupado(fila: dict) -> Dict[str, Any]:
+    return {
+        'medico': Medico(id=fila['id'], nombre=fila['nombre'], especialidad=fila['especialidad'],
+                         telefono=fila['telefono'], email=fila['email']),
+        'citas_pendientes': int(fila['citas_pendientes'])
+    }
+
+
+def _top_de_conteo(db: Database, conteo: Dict[int, int], limite: int) -> Optional[List[Dict[str, Any]]]:
+    """Top desde un conteo {medico_id: cantidad} ya agregado, o None si no alcanza para resolverlo.
+
+    heapq.nlargest encuentra la cantidad del puesto `limite`; solo se buscan los
+    médicos que llegan a ella, para desempatar por nombre igual que en SQL.
+    """
+    if limite <= 0:
+        return []
+    mayores = heapq.nlargest(limite, conteo.values())
+    if len(mayores) < limite:
+        return None  # faltan médicos sin citas: los trae la consulta SQL
+    candidatos = [id for id, cantidad in conteo.items() if cantidad >= mayores[-1]]
+    medicos = Medico.buscar_por_ids(db, candidatos)
+    if len(medicos) < len(candidatos):
+        return None  # contadores desfasados (médico eliminado por otra instancia)
+    ordenados = sorted(candidatos, key=lambda id: (-conteo[id], medicos[id].nombre))
+    return [{'medico': medicos[id], 'citas_pendientes': conteo[id]} for id in ordenados[:limite]]
+
+
+def medicos_mas_ocupados(db: Database, limite: int = 5, estado: Optional[str] = 'programada',
+                         desde: datetime = None, hasta: datetime = None,
+                         especialidad: str = None) -> List[Dict[str, Any]]:
+    """Los `limite` médicos con más citas: [{'medico', 'citas_pendientes'}], mayor primero.
+
+    Sin ventana de fechas ni especialidad se resuelve sobre los contadores en
+    memoria; con filtros, con una consulta agregada que devuelve solo `limite` filas.
+    """
+    if estado is not None and desde is None and hasta is None and especialidad is None:
+        top = _top_de_conteo(db, obtener_contadores(db).por_medico(estado), limite)
+        if top is not None:
+            return top
+    query, params = consulta_medicos_ocupados(limite, estado, desde, hasta, especialidad)
+    return [_medico_ocupado(fila) for fila in db.execute_query(query, tuple(params), fetch=True) or []]
+
+
+# Cada médico con sus citas por estado (agregados condicionales sobre idx_citas_medico_fecha)
+CONSULTA_DISPONIBILIDAD = """
+    SELECT m.id, m.nombre, m.especialidad, m.telefono, m.email, COUNT(c.id) AS total_citas,
+           {conteos_estado}
+    FROM medicos m
+    LEFT JOIN citas c ON c.medico_id = m.id
+    {filtro}
+    GROUP BY m.id
+    ORDER BY m.nombre
+""".replace("{conteos_estado}", ",\n           ".join(
+    f"COALESCE(SUM(c.estado = '{estado}'), 0) AS citas_{estado}" for estado in ESTADOS
+))
+
+# Claves del resultado de disponibilidad para cada estado
+_CLAVES_DISPONIBILIDAD = {'programada': 'citas_pendientes', 'completada': 'citas_completadas',
+                          'cancelada': 'citas_canceladas'}
+
+
+def _disponibilidad(fila: dict) -> Dict[str, Any]:
+    disponibilidad = {
+        'medico': Medico(id=fila['id'], nombre=fila['nombre'], especialidad=fila['especialidad'],
+                         telefono=fila['telefono'], email=fila['email']),
+        'total_citas': int(fila['total_citas'])
+    }
+    for estado in ESTADOS:
+        disponibilidad[_CLAVES_DISPONIBILIDAD.get(estado, f'citas_{estado}')] = int(fila[f'citas_{estado}'])
+    return disponibilidad
+
+
+def disponibilidad_medicos(db: Database, ids: Iterable[int] = None,
+                           tamano_lote: int = 1000) -> Dict[int, Dict[str, Any]]:
+    """{medico_id: disponibilidad} con el médico y sus citas por estado, de a una consulta por lote.
+
+    Sin `ids` trae todos los médicos en una sola consulta. Los ids que no
+    existen no aparecen en el resultado.
+    """
+    if ids is None:
+        query = CONSULTA_DISPONIBILIDAD.replace("{filtro}", "")
+        return {fila['id']: _disponibilidad(fila) for fila in db.execute_query(query, fetch=True) or []}
+
+    ids = list(dict.fromkeys(id for id in ids if id is not None))
+    resultado = {}
+    for inicio in range(0, len(ids), tamano_lote):
+        lote = ids[inicio:inicio + tamano_lote]
+        marcadores = ", ".join(["%s"] * len(lote))
+        query = CONSULTA_DISPONIBILIDAD.replace("{filtro}", f"WHERE m.id IN ({marcadores})")
+        for fila in db.execute_query(query, tuple(lote), fetch=True) or []:
+            resultado[fila['id']] = _disponibilidad(fila)
+    return resultado
+
+
+# Totales del sistema y médicos con más citas programadas en una sola consulta.
+# La fila de totales siempre existe; el LEFT JOIN le agrega un médico por fila
+# (o ninguno si no hay médicos), así una sola ida y vuelta trae todo el tablero.
+CONSULTA_RESUMEN = """
+    SELECT t.*, top.id, top.nombre, top.especialidad, top.telefono, top.email, top.citas_pendientes
+    FROM (
+        SELECT (SELECT COUNT(*) FROM pacientes) AS total_pacientes,
+               (SELECT COUNT(*) FROM medicos) AS total_medicos,
+               (SELECT COUNT(DISTINCT especialidad) FROM medicos) AS total_especialidades,
+               COUNT(*) AS total_citas,
+               {conteos_estado}
+        FROM citas
+    ) t
+    LEFT JOIN (
+        {top_medicos}
+    ) top ON TRUE
+    ORDER BY top.citas_pendientes DESC, top.nombre
+""".replace("{conteos_estado}", ",\n               ".join(
+    f"COALESCE(SUM(estado = '{estado}'), 0) AS citas_{estado}" for estado in ESTADOS
+))
+
+
+def obtener_resumen(db: Database, top_medicos: int = 3) -> Dict[str, Any]:
+    """Cifras del tablero (totales, citas por estado, especialidades y médicos más ocupados)"""
+    consulta_top, params = consulta_medicos_ocupados(top_medicos)
+    query = CONSULTA_RESUMEN.replace("{top_medicos}", consulta_top)
+    filas = db.execute_query(query, tuple(params), fetch=True) or []
+    if not filas:
+        return {
+            'total_pacientes': 0, 'total_medicos': 0, 'total_citas': 0,
+            'total_especialidades': 0, 'conteo_estados': {}, 'medicos_ocupados': []
+        }
+
+    totales = filas[0]
+    conteo_estados = {
+        estado: int(totales[f'citas_{estado}'])
+        for estado in ESTADOS
+        if totales[f'citas_{estado}']
+    }
+    medicos_ocupados = [_medico_ocupado(fila) for fila in filas if fila['id'] is not None]
+    return {
+        'total_pacientes': int(totales['total_pacientes']),
+        'total_medicos': int(totales['total_medicos']),
+        'total_citas': int(totales['total_citas']),
+        'total_especialidades': int(totales['total_especialidades']),
+        'conteo_estados': conteo_estados,
+        'medicos_ocupados': medicos_ocupados
+    }
@@ -4,6 +4,9 @@ from models.database import Database
 from models.cita import Cita
 from models.paciente import Paciente
 from models.medico import Medico
+from models.agenda import obtener_agenda
+from models.calendario import obtener_calendario
+from models.contadores import obtener_contadores
 
 class GestorCitas:
     """Clase para gestionar operaciones avanzadas de citas"""
@@ -14,29 +17,18 @@ class GestorCitas:
     # === PROGRAMACIÓN FUNCIONAL ===
     
     def filtrar_citas_por_estado(self, estado: str) -> List[Cita]:
-        """Filtra citas por estado usando filter()"""
-        todas_citas = Cita.obtener_todas(self.db)
-        return list(filter(lambda cita: cita.estado == estado, todas_citas))
+        """Filtra citas por estado (filtro resuelto en SQL)"""
+        return Cita.consulta().estado(estado).obtener(self.db)
     
     def filtrar_citas_por_medico(self, medico_id: int) -> List[Cita]:
-        """Filtra citas por médico usando filter()"""
-        todas_citas = Cita.obtener_todas(self.db)
-        return list(filter(lambda cita: cita.medico_id == medico_id, todas_citas))
+        """Filtra citas por médico (filtro resuelto en SQL)"""
+        return Cita.consulta().medico(medico_id).obtener(self.db)
     
     def filtrar_citas_por_fecha(self, fecha: str) -> List[Cita]:
         """Filtra citas por fecha específica"""
         try:
-            todas_citas = Cita.obtener_todas(self.db)
             fecha_target = datetime.strptime(fecha, "%Y-%m-%d").date()
-            
-            return list(filter(
-                lambda cita: (
-                    cita.fecha_hora and 
-                    isinstance(cita.fecha_hora, datetime) and
-                    cita.fecha_hora.date() == fecha_target
-                ),
-                todas_citas
-            ))
+            return Cita.consulta().en_fecha(fecha_target).obtener(self.db)
         except ValueError:
             print("❌ Formato de fecha inválido. Use YYYY-MM-DD")
             return []
@@ -46,31 +38,15 @@ class GestorCitas:
         return self.filtrar_citas_por_estado("programada")
     
     def calcular_porcentaje_ocupacion(self, medico_id: int, fecha_inicio: str, fecha_fin: str) -> float:
-        """Calcula porcentaje de ocupación de un médico"""
+        """Calcula porcentaje de ocupación de un médico según su horario laboral"""
         try:
-            todas_citas = Cita.obtener_todas(self.db)
-            fecha_inicio_dt = datetime.strptime(fecha_inicio, "%Y-%m-%d")
-            fecha_fin_dt = datetime.strptime(fecha_fin, "%Y-%m-%d")
-            
-            # Filtrar citas del médico en el rango de fechas
-            citas_medico = list(filter(
-                lambda c: (
-                    c.medico_id == medico_id and 
-                    c.fecha_hora and
-                    fecha_inicio_dt <= c.fecha_hora <= fecha_fin_dt
-                ),
-                todas_citas
-            ))
-            
-            # Calcular horas ocupadas (suponiendo 1 hora por cita)
-            horas_ocupadas = len(citas_medico)
+            fecha_inicio_dt = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
+            fecha_fin_dt = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
             
-            # Suponiendo 8 horas de trabajo por día, 5 días por semana
-            dias_laborales = (fecha_fin_dt - fecha_inicio_dt).days + 1
-            dias_laborales_efectivos = dias_laborales * 5 / 7  # Aprox días laborables
-            horas_totales = dias_laborales_efectivos * 8
+            citas_medico = Cita.consulta().medico(medico_id).entre_fechas(fecha_inicio_dt, fecha_fin_dt).contar(self.db)
+            capacidad = int(obtener_calendario(self.db).capacidad([medico_id], fecha_inicio_dt, fecha_fin_dt)[0])
             
-            return (horas_ocupadas / horas_totales * 100) if horas_totales > 0 else 0
+            return (citas_medico / capacidad * 100) if capacidad > 0 else 0
             
         except ValueError as e:
             print(f"❌ Error en formato de fecha: {e}")
@@ -88,26 +64,11 @@ class GestorCitas:
         return list(set(especialidades))
     
     def contar_citas_por_estado(self) -> dict:
-        """Cuenta citas por estado usando programación funcional"""
-        todas_citas = Cita.obtener_todas(self.db)
-        
-        estados = list(map(lambda c: c.estado, todas_citas))
-        conteo = {}
-        
-        for estado in estados:
-            conteo[estado] = conteo.get(estado, 0) + 1
-        
-        return conteo
+        """Cuenta citas por estado (contadores mantenidos al guardar y eliminar citas)"""
+        return obtener_contadores(self.db).por_estado()
     
     def verificar_disponibilidad_medico(self, medico_id: int, fecha_hora: str) -> bool:
         """Verifica si un médico está disponible en una fecha/hora específica"""
-        citas_medico = self.filtrar_citas_por_medico(medico_id)
         fecha_consulta = datetime.strptime(fecha_hora, "%Y-%m-%d %H:%M")
-        
-        # Buscar conflictos de horario
-        conflictos = list(filter(
-            lambda c: (c.fecha_hora == fecha_consulta and c.estado != "cancelada"),
-            citas_medico
-        ))
-        
-        return len(conflictos) == 0
\ No newline at end of file
+        # Índice de intervalos: detecta también solapamientos con citas de otra duración
+        return obtener_agenda(self.db).esta_libre(medico_id, fecha_consulta)
\ No newline at end of file
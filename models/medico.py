@@ -1,10 +1,20 @@
 import mysql.connector
-from typing import List, Optional
+from typing import Iterator, List, Optional, Dict, Tuple
 from models.database import Database
+from models.agenda import obtener_agenda
+from models.proximas import obtener_proximas
+from models.cache import obtener_cache
+from config.database_config import BUSQUEDA_CONFIG
+from models.busqueda import (obtener_indice, obtener_indice_contactos, normalizar_contactos,
+                             filas_por_contacto)
+from models.contadores import obtener_contadores, descontar_citas
 
 class Medico:
     """Clase para representar un médico"""
     
+    # Sin __dict__ por instancia: menos memoria en listados grandes
+    __slots__ = ('id', 'nombre', 'especialidad', 'telefono', 'email')
+    
     def __init__(self, id: int = None, nombre: str = "", especialidad: str = "", 
                  telefono: str = "", email: str = ""):
         self.id = id
@@ -27,6 +37,8 @@ class Medico:
                 result = db.execute_query(query, params)
                 if result:
                     self.id = result
+                    obtener_indice(db, 'medicos').registrar(self.id, self.nombre)
+                    obtener_indice_contactos(db, 'medicos').registrar(self.id, self.email, self.telefono)
                     print("✅ Médico registrado exitosamente!")
                     return True
                 return False
@@ -36,7 +48,10 @@ class Medico:
                            email=%s WHERE id=%s"""
                 params = (self.nombre, self.especialidad, self.telefono, self.email, self.id)
                 result = db.execute_query(query, params)
+                obtener_cache(db, 'medicos').invalidar(self.id)
                 if result is not None:
+                    obtener_indice(db, 'medicos').registrar(self.id, self.nombre)
+                    obtener_indice_contactos(db, 'medicos').registrar(self.id, self.email, self.telefono)
                     print("✅ Médico actualizado exitosamente!")
                     return True
                 return False
@@ -61,6 +76,24 @@ class Medico:
             print(f"❌ Error inesperado: {e}")
             return False
 
+    @classmethod
+    def guardar_lote(cls, db: Database, medicos: List['Medico'], tamano_lote: int = 500) -> List[int]:
+        """Inserta muchos médicos nuevos en una sola transacción y retorna sus ids"""
+        nuevos = [m for m in medicos if m.id is None]
+        query = """INSERT INTO medicos (nombre, especialidad, telefono, email) 
+                   VALUES (%s, %s, %s, %s)"""
+        params = [(m.nombre, m.especialidad, m.telefono, m.email) for m in nuevos]
+        ids = db.execute_many(query, params, tamano_lote)
+        if not ids:
+            return []
+        indice = obtener_indice(db, 'medicos')
+        contactos = obtener_indice_contactos(db, 'medicos')
+        for medico, nuevo_id in zip(nuevos, ids):
+            medico.id = nuevo_id
+            indice.registrar(nuevo_id, medico.nombre)
+            contactos.registrar(nuevo_id, medico.email, medico.telefono)
+        return ids
+
     @staticmethod
     def obtener_todos(db: Database) -> List['Medico']:
         """Obtiene todos los médicos"""
@@ -68,25 +101,128 @@ class Medico:
         resultados = db.execute_query(query, fetch=True)
         return [Medico(**medico) for medico in resultados] if resultados else []
     
+    @staticmethod
+    def iter_todos(db: Database, tamano_lote: int = 1000) -> Iterator['Medico']:
+        """Recorre todos los medicos sin cargarlos todos en memoria"""
+        for fila in db.iter_query("SELECT * FROM medicos ORDER BY nombre, id", tamano_lote=tamano_lote):
+            yield Medico(**fila)
+    
+    @staticmethod
+    def obtener_pagina(db: Database, token: Optional[Tuple[str, int]] = None,
+                       cantidad: int = 100) -> Tuple[List['Medico'], Optional[Tuple[str, int]]]:
+        """Obtiene una página de medicos ordenados por nombre y el token (nombre, id) de la siguiente"""
+        if token is None:
+            query = "SELECT * FROM medicos ORDER BY nombre, id LIMIT %s"
+            params = (cantidad,)
+        else:
+            # Paginación por clave: se continúa desde el último (nombre, id) sin usar OFFSET
+            query = """SELECT * FROM medicos
+                       WHERE nombre > %s OR (nombre = %s AND id > %s)
+                       ORDER BY nombre, id LIMIT %s"""
+            params = (token[0], token[0], token[1], cantidad)
+        resultados = db.execute_query(query, params, fetch=True) or []
+        medicos = [Medico(**fila) for fila in resultados]
+        if len(medicos) < cantidad:
+            return medicos, None
+        return medicos, (medicos[-1].nombre, medicos[-1].id)
+    
+    @staticmethod
+    def contar(db: Database) -> int:
+        """Cuenta los médicos registrados"""
+        resultado = db.execute_query("SELECT COUNT(*) AS total FROM medicos", fetch=True)
+        return resultado[0]['total'] if resultado else 0
+    
     @staticmethod
     def buscar_por_id(db: Database, id: int) -> Optional['Medico']:
-        """Busca un médico por ID"""
+        """Busca un medico por ID (primero en la caché de medicos)"""
+        cache = obtener_cache(db, 'medicos')
+        medico = cache.obtener(id)
+        if medico is not None:
+            return medico
         query = "SELECT * FROM medicos WHERE id = %s"
         resultado = db.execute_query(query, (id,), fetch=True)
-        return Medico(**resultado[0]) if resultado else None
+        if not resultado:
+            return None
+        medico = Medico(**resultado[0])
+        cache.guardar(id, medico)
+        return medico
     
     @staticmethod
-    def buscar_por_especialidad(db: Database, especialidad: str) -> List['Medico']:
-        """Busca médicos por especialidad"""
-        query = "SELECT * FROM medicos WHERE especialidad LIKE %s ORDER BY nombre"
-        resultados = db.execute_query(query, (f"%{especialidad}%",), fetch=True)
-        return [Medico(**medico) for medico in resultados] if resultados else []
+    def buscar_por_ids(db: Database, ids) -> Dict[int, 'Medico']:
+        """Busca varios medicos (los que no están en caché, con una sola consulta); retorna {id: medico}"""
+        cache = obtener_cache(db, 'medicos')
+        encontrados, ids = cache.obtener_varios({i for i in ids if i is not None})
+        if not ids:
+            return encontrados
+        marcadores = ", ".join(["%s"] * len(ids))
+        query = f"SELECT * FROM medicos WHERE id IN ({marcadores})"
+        for fila in db.execute_query(query, tuple(ids), fetch=True) or []:
+            medico = Medico(**fila)
+            cache.guardar(medico.id, medico)
+            encontrados[medico.id] = medico
+        return encontrados
+    
+    @staticmethod
+    def buscar_por_nombre(db: Database, texto: str, limite: int = 50) -> List['Medico']:
+        """Busca médicos por nombre (parcial, sin distinguir acentos ni mayúsculas), mejores primero"""
+        ids = obtener_indice(db, 'medicos').buscar(texto, limite)
+        encontrados = Medico.buscar_por_ids(db, ids)
+        return [encontrados[id] for id in ids if id in encontrados]
+    
+    @staticmethod
+    def _buscar_por_contacto(db: Database, campo: str, valores) -> Dict[str, 'Medico']:
+        """{valor normalizado: medico} para un campo de contacto ('email' o 'telefono')"""
+        valores = normalizar_contactos(campo, valores)
+        if not valores:
+            return {}
+        if BUSQUEDA_CONFIG['contactos_en_memoria']:
+            ids = obtener_indice_contactos(db, 'medicos').buscar(campo, valores)
+            medicos = Medico.buscar_por_ids(db, ids.values())
+            return {valor: medicos[id] for valor, id in ids.items() if id in medicos}
+        encontrados = {}
+        for fila in filas_por_contacto(db, 'medicos', campo, valores):
+            contacto = fila.pop('contacto')
+            encontrados[contacto] = Medico(**fila)
+        return encontrados
+    
+    @staticmethod
+    def buscar_por_email(db: Database, email: str) -> Optional['Medico']:
+        """Busca un medico por email (sin distinguir mayúsculas ni espacios alrededor)"""
+        return next(iter(Medico._buscar_por_contacto(db, 'email', [email]).values()), None)
+    
+    @staticmethod
+    def buscar_por_telefono(db: Database, telefono: str) -> Optional['Medico']:
+        """Busca un medico por teléfono (ignorando espacios, guiones, puntos y paréntesis)"""
+        return next(iter(Medico._buscar_por_contacto(db, 'telefono', [telefono]).values()), None)
+    
+    @staticmethod
+    def buscar_por_emails(db: Database, emails) -> Dict[str, 'Medico']:
+        """Resuelve muchos emails a la vez; retorna {email normalizado: medico}"""
+        return Medico._buscar_por_contacto(db, 'email', emails)
+    
+    @staticmethod
+    def buscar_por_telefonos(db: Database, telefonos) -> Dict[str, 'Medico']:
+        """Resuelve muchos teléfonos a la vez; retorna {teléfono normalizado: medico}"""
+        return Medico._buscar_por_contacto(db, 'telefono', telefonos)
     
     @staticmethod
     def eliminar(db: Database, id: int) -> bool:
         """Elimina un médico por ID"""
-        query = "DELETE FROM medicos WHERE id = %s"
-        return db.execute_query(query, (id,)) is not None
+        try:
+            with db.transaccion() as cursor:
+                # Sus citas se borran por CASCADE: se descuentan de los contadores en la misma transacción
+                deltas = descontar_citas(cursor, "medico_id = %s", (id,))
+                cursor.execute("DELETE FROM medicos WHERE id = %s", (id,))
+        except mysql.connector.Error as e:
+            print(f"❌ Error en la consulta: {e}")
+            return False
+        obtener_cache(db, 'medicos').invalidar(id)
+        obtener_indice(db, 'medicos').quitar(id)
+        obtener_indice_contactos(db, 'medicos').quitar(id)
+        obtener_contadores(db).aplicar(deltas)
+        obtener_agenda(db).invalidar(id)
+        obtener_proximas(db).invalidar()
+        return True
     
     @staticmethod
     def listar_todos(db):
@@ -0,0 +1,216 @@
+import mysql.connector
+from typing import List
+from models.database import Database
+from models.contadores import RECONSTRUIR
+
+# === PASOS IDEMPOTENTES ===
+# MySQL confirma implícitamente cada sentencia DDL, así que una migración que
+# falla a la mitad no se deshace: cada paso verifica el catálogo antes de
+# actuar para que volver a ejecutar la migración sea seguro.
+
+def crear_indice(tabla: str, nombre: str, columnas: str, unico: bool = False):
+    """Paso que crea un índice si todavía no existe"""
+    def paso(cursor):
+        cursor.execute(
+            """SELECT COUNT(*) AS total FROM information_schema.statistics
+               WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s""",
+            (tabla, nombre)
+        )
+        if cursor.fetchall()[0]['total'] == 0:
+            tipo = "UNIQUE INDEX" if unico else "INDEX"
+            cursor.execute(f"CREATE {tipo} {nombre} ON {tabla} ({columnas})")
+    return paso
+
+def agregar_columna(tabla: str, nombre: str, definicion: str):
+    """Paso que agrega una columna si todavía no existe"""
+    def paso(cursor):
+        cursor.execute(
+            """SELECT COUNT(*) AS total FROM information_schema.columns
+               WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s""",
+            (tabla, nombre)
+        )
+        if cursor.fetchall()[0]['total'] == 0:
+            cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {nombre} {definicion}")
+    return paso
+
+def informar_citas_duplicadas(cursor):
+    """Paso que lista las citas programadas que comparten médico y fecha_hora, sin modificarlas.
+
+    Versiones anteriores guardaban solo la fecha (todas las citas a las 00:00),
+    así que una base existente puede tener varias citas programadas del mismo
+    médico en el mismo instante. Esas filas quedan fuera del índice único (ver
+    la migración 2) y se informan para que la clínica las reprograme a mano.
+    """
+    cursor.execute(
+        """SELECT medico_id, fecha_hora, GROUP_CONCAT(id ORDER BY id) AS citas
+           FROM citas
+           WHERE estado = 'programada' AND medico_id IS NOT NULL AND fecha_hora IS NOT NULL
+           GROUP BY medico_id, fecha_hora
+           HAVING COUNT(*) > 1
+           ORDER BY medico_id, fecha_hora"""
+    )
+    duplicadas = cursor.fetchall()
+    if duplicadas:
+        print(f"⚠️ Hay {len(duplicadas)} horarios con más de una cita programada del mismo médico "
+              f"(no se modificaron; conviene reprogramarlas):")
+        for fila in duplicadas:
+            print(f"   • Médico {fila['medico_id']}, {fila['fecha_hora']}: citas {fila['citas']}")
+
+# === MIGRACIONES (versión, descripción, pasos) ===
+
+MIGRACIONES = [
+    (1, "Índices de citas para fecha, estado, médico y paciente", [
+        crear_indice("citas", "idx_citas_fecha_hora", "fecha_hora"),
+        crear_indice("citas", "idx_citas_estado_fecha", "estado, fecha_hora"),
+        crear_indice("citas", "idx_citas_medico_fecha", "medico_id, fecha_hora"),
+        crear_indice("citas", "idx_citas_paciente_fecha", "paciente_id, fecha_hora"),
+    ]),
+    (2, "Un médico no puede tener dos citas programadas a la misma hora", [
+        informar_citas_duplicadas,
+        # Las citas existentes quedan con horario_exclusivo = 0 y las nuevas con 1:
+        # el índice único solo alcanza a las reservas hechas desde esta migración,
+        # así las duplicadas heredadas no impiden crearlo ni se tocan
+        agregar_columna("citas", "horario_exclusivo", "TINYINT(1) NOT NULL DEFAULT 0 INVISIBLE"),
+        "ALTER TABLE citas ALTER COLUMN horario_exclusivo SET DEFAULT 1",
+        # Columna generada: NULL salvo en citas programadas nuevas, así el UNIQUE
+        # tampoco alcanza al historial
+        agregar_columna(
+            "citas", "fecha_hora_activa",
+            "DATETIME AS (IF(estado = 'programada' AND horario_exclusivo = 1, fecha_hora, NULL)) "
+            "STORED INVISIBLE"
+        ),
+        # Un intento fallido anterior pudo dejar la columna con una definición vieja
+        """ALTER TABLE citas MODIFY COLUMN fecha_hora_activa
+               DATETIME AS (IF(estado = 'programada' AND horario_exclusivo = 1, fecha_hora, NULL))
+               STORED INVISIBLE""",
+        crear_indice("citas", "uq_citas_medico_fecha_activa", "medico_id, fecha_hora_activa", unico=True),
+    ]),
+    (3, "Duración de cada cita en minutos", [
+        agregar_columna("citas", "duracion", "INT NOT NULL DEFAULT 60"),
+    ]),
+    (4, "Horarios semanales y feriados de los médicos", [
+        """CREATE TABLE IF NOT EXISTS horarios_medico (
+               medico_id INT NOT NULL,
+               dia_semana TINYINT NOT NULL,  -- 0 = lunes ... 6 = domingo
+               hora_inicio TIME NOT NULL,
+               hora_fin TIME NOT NULL,
+               duracion_turno INT NOT NULL DEFAULT 60,  -- minutos
+               PRIMARY KEY (medico_id, dia_semana),
+               FOREIGN KEY (medico_id) REFERENCES medicos(id) ON DELETE CASCADE
+           )""",
+        """CREATE TABLE IF NOT EXISTS feriados (
+               id INT AUTO_INCREMENT PRIMARY KEY,
+               fecha DATE NOT NULL,
+               medico_id INT NULL,  -- NULL = feriado de toda la clínica
+               descripcion VARCHAR(100),
+               INDEX idx_feriados_fecha (fecha),
+               FOREIGN KEY (medico_id) REFERENCES medicos(id) ON DELETE CASCADE
+           )""",
+    ]),
+    (5, "Índices por nombre para paginar pacientes y médicos por (nombre, id)", [
+        # InnoDB agrega la clave primaria a cada índice secundario: (nombre) ya ordena por (nombre, id)
+        crear_indice("pacientes", "idx_pacientes_nombre", "nombre"),
+        crear_indice("medicos", "idx_medicos_nombre", "nombre"),
+    ]),
+    (6, "Contadores de citas por médico, estado y día", [
+        """CREATE TABLE IF NOT EXISTS contadores_citas (
+               medico_id INT NOT NULL,      -- 0 = cita sin médico
+               estado VARCHAR(20) NOT NULL,
+               dia DATE NOT NULL,           -- 1000-01-01 = cita sin fecha
+               cantidad INT NOT NULL DEFAULT 0,
+               PRIMARY KEY (medico_id, estado, dia)
+           )""",
+        "DELETE FROM contadores_citas",
+        RECONSTRUIR,
+    ]),
+    (7, "Email y teléfono normalizados e indexados para búsquedas exactas", [
+        # Misma normalización que models.busqueda.normalizar_email / normalizar_telefono
+        *[agregar_columna(tabla, "email_normalizado",
+                          "VARCHAR(100) AS (LOWER(TRIM(email))) STORED INVISIBLE")
+          for tabla in ("pacientes", "medicos")],
+        *[agregar_columna(tabla, "telefono_normalizado",
+                          "VARCHAR(15) AS (REPLACE(REPLACE(REPLACE(REPLACE(REPLACE("
+                          "TRIM(telefono), ' ', ''), '-', ''), '(', ''), ')', ''), '.', '')) STORED INVISIBLE")
+          for tabla in ("pacientes", "medicos")],
+        crear_indice("pacientes", "idx_pacientes_email_normalizado", "email_normalizado"),
+        crear_indice("pacientes", "idx_pacientes_telefono_normalizado", "telefono_normalizado"),
+        crear_indice("medicos", "idx_medicos_email_normalizado", "email_normalizado"),
+        crear_indice("medicos", "idx_medicos_telefono_normalizado", "telefono_normalizado"),
+    ]),
+    (8, "Recordatorios de citas ya enviados", [
+        """CREATE TABLE IF NOT EXISTS recordatorios_enviados (
+               cita_id INT PRIMARY KEY,
+               fecha_hora DATETIME NOT NULL,  -- fecha_hora avisada (una cita reprogramada se vuelve a avisar)
+               enviado_en DATETIME DEFAULT CURRENT_TIMESTAMP,
+               INDEX idx_recordatorios_fecha_hora (fecha_hora),
+               FOREIGN KEY (cita_id) REFERENCES citas(id) ON DELETE CASCADE
+           )""",
+    ]),
+]
+
+# === EJECUCIÓN ===
+
+class ErrorMigracion(Exception):
+    """Una migración falló: el esquema quedó en la versión anterior y las siguientes no se aplicaron"""
+
+    def __init__(self, version: int, descripcion: str, causa: Exception):
+        super().__init__(
+            f"La migración {version} ({descripcion}) falló: {causa}. "
+            f"No se aplicó esa migración ni las siguientes; corrija el problema y vuelva a iniciar."
+        )
+        self.version = version
+        self.causa = causa
+
+
+def aplicar_migraciones(db: Database) -> List[int]:
+    """Aplica las migraciones pendientes en orden y retorna las versiones aplicadas.
+
+    Cada migración depende de las anteriores: si una falla se detiene ahí y
+    lanza ErrorMigracion, en lugar de seguir con un esquema incompleto.
+    """
+    aplicadas_ahora = []
+    try:
+        with db.transaccion() as cursor:
+            cursor.execute("""CREATE TABLE IF NOT EXISTS schema_migraciones (
+                                  version INT PRIMARY KEY,
+                                  descripcion VARCHAR(200) NOT NULL,
+                                  aplicada_en DATETIME DEFAULT CURRENT_TIMESTAMP
+                              )""")
+            cursor.execute("SELECT version FROM schema_migraciones")
+            aplicadas = {fila['version'] for fila in cursor.fetchall()}
+    except mysql.connector.Error as e:
+        raise ErrorMigracion(0, "tabla schema_migraciones", e) from e
+
+    for version, descripcion, pasos in MIGRACIONES:
+        if version in aplicadas:
+            continue
+        try:
+            with db.transaccion() as cursor:
+                for paso in pasos:
+                    if callable(paso):
+                        paso(cursor)
+                    else:
+                        cursor.execute(paso)
+                cursor.execute(
+                    "INSERT INTO schema_migraciones (version, descripcion) VALUES (%s, %s)",
+                    (version, descripcion)
+                )
+        except mysql.connector.Error as e:
+            raise ErrorMigracion(version, descripcion, e) from e
+        print(f"✅ Migración {version} aplicada: {descripcion}")
+        aplicadas_ahora.append(version)
+    return aplicadas_ahora
+
+
+if __name__ == "__main__":
+    # Uso: python -m models.migraciones
+    db = Database()
+    try:
+        versiones = aplicar_migraciones(db)
+        if not versiones:
+            print("📭 No hay migraciones pendientes")
+    except ErrorMigracion as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    finally:
+        db.close()
@@ -1,10 +1,21 @@
 import mysql.connector
-from typing import List, Optional
+from datetime import datetime
+from typing import Iterator, List, Optional, Dict, Tuple
 from models.database import Database
+from models.agenda import obtener_agenda
+from models.proximas import obtener_proximas
+from models.cache import obtener_cache
+from config.database_config import BUSQUEDA_CONFIG
+from models.busqueda import (obtener_indice, obtener_indice_contactos, normalizar_contactos,
+                             filas_por_contacto)
+from models.contadores import obtener_contadores, descontar_citas
 
 class Paciente:
     """Clase para representar un paciente"""
     
+    # Sin __dict__ por instancia: menos memoria en listados grandes
+    __slots__ = ('id', 'nombre', 'email', 'telefono', 'fecha_nacimiento')
+    
     def __init__(self, id: int = None, nombre: str = "", email: str = "", 
                  telefono: str = "", fecha_nacimiento: str = None):
         self.id = id
@@ -26,12 +37,20 @@ class Paciente:
                 result = db.execute_query(query, params)
                 if result:
                     self.id = result
+                    obtener_indice(db, 'pacientes').registrar(self.id, self.nombre)
+                    obtener_indice_contactos(db, 'pacientes').registrar(self.id, self.email, self.telefono)
                     return True
             else:
                 query = """UPDATE pacientes SET nombre=%s, email=%s, telefono=%s, 
                            fecha_nacimiento=%s WHERE id=%s"""
                 params = (self.nombre, self.email, self.telefono, self.fecha_nacimiento, self.id)
-                return db.execute_query(query, params) is not None
+                resultado = db.execute_query(query, params)
+                obtener_cache(db, 'pacientes').invalidar(self.id)
+                if resultado is None:
+                    return False
+                obtener_indice(db, 'pacientes').registrar(self.id, self.nombre)
+                obtener_indice_contactos(db, 'pacientes').registrar(self.id, self.email, self.telefono)
+                return True
             return False
         except mysql.connector.Error as e:
             if e.errno == 1062:  # MySQL error code for duplicate entry
@@ -40,6 +59,24 @@ class Paciente:
                 print(f"❌ Error de base de datos: {e}")
             return False
     
+    @classmethod
+    def guardar_lote(cls, db: Database, pacientes: List['Paciente'], tamano_lote: int = 500) -> List[int]:
+        """Inserta muchos pacientes nuevos en una sola transacción y retorna sus ids"""
+        nuevos = [p for p in pacientes if p.id is None]
+        query = """INSERT INTO pacientes (nombre, email, telefono, fecha_nacimiento) 
+                   VALUES (%s, %s, %s, %s)"""
+        params = [(p.nombre, p.email, p.telefono, p.fecha_nacimiento) for p in nuevos]
+        ids = db.execute_many(query, params, tamano_lote)
+        if not ids:
+            return []
+        indice = obtener_indice(db, 'pacientes')
+        contactos = obtener_indice_contactos(db, 'pacientes')
+        for paciente, nuevo_id in zip(nuevos, ids):
+            paciente.id = nuevo_id
+            indice.registrar(nuevo_id, paciente.nombre)
+            contactos.registrar(nuevo_id, paciente.email, paciente.telefono)
+        return ids
+    
     @staticmethod
     def obtener_todos(db: Database) -> List['Paciente']:
         """Obtiene todos los pacientes"""
@@ -47,15 +84,214 @@ class Paciente:
         resultados = db.execute_query(query, fetch=True)
         return [Paciente(**paciente) for paciente in resultados] if resultados else []
     
+    @staticmethod
+    def iter_todos(db: Database, tamano_lote: int = 1000) -> Iterator['Paciente']:
+        """Recorre todos los pacientes sin cargarlos todos en memoria"""
+        for fila in db.iter_query("SELECT * FROM pacientes ORDER BY nombre, id", tamano_lote=tamano_lote):
+            yield Paciente(**fila)
+    
+    @staticmethod
+    def obtener_pagina(db: Database, token: Optional[Tuple[str, int]] = None,
+                       cantidad: int = 100) -> Tuple[List['Paciente'], Optional[Tuple[str, int]]]:
+        """Obtiene una página de pacientes ordenados por nombre y el token (nombre, id) de la siguiente"""
+        if token is None:
+            query = "SELECT * FROM pacientes ORDER BY nombre, id LIMIT %s"
+            params = (cantidad,)
+        else:
+            # Paginación por clave: se continúa desde el último (nombre, id) sin usar OFFSET
+            query = """SELECT * FROM pacientes
+                       WHERE nombre > %s OR (nombre = %s AND id > %s)
+                       ORDER BY nombre, id LIMIT %s"""
+            params = (token[0], token[0], token[1], cantidad)
+        resultados = db.execute_query(query, params, fetch=True) or []
+        pacientes = [Paciente(**fila) for fila in resultados]
+        if len(pacientes) < cantidad:
+            return pacientes, None
+        return pacientes, (pacientes[-1].nombre, pacientes[-1].id)
+    
+    @staticmethod
+    def contar(db: Database) -> int:
+        """Cuenta los pacientes registrados"""
+        resultado = db.execute_query("SELECT COUNT(*) AS total FROM pacientes", fetch=True)
+        return resultado[0]['total'] if resultado else 0
+    
     @staticmethod
     def buscar_por_id(db: Database, id: int) -> Optional['Paciente']:
-        """Busca un paciente por ID"""
+        """Busca un paciente por ID (primero en la caché de pacientes)"""
+        cache = obtener_cache(db, 'pacientes')
+        paciente = cache.obtener(id)
+        if paciente is not None:
+            return paciente
         query = "SELECT * FROM pacientes WHERE id = %s"
         resultado = db.execute_query(query, (id,), fetch=True)
-        return Paciente(**resultado[0]) if resultado else None
+        if not resultado:
+            return None
+        paciente = Paciente(**resultado[0])
+        cache.guardar(id, paciente)
+        return paciente
+    
+    @staticmethod
+    def buscar_por_ids(db: Database, ids) -> Dict[int, 'Paciente']:
+        """Busca varios pacientes (los que no están en caché, con una sola consulta); retorna {id: paciente}"""
+        cache = obtener_cache(db, 'pacientes')
+        encontrados, ids = cache.obtener_varios({i for i in ids if i is not None})
+        if not ids:
+            return encontrados
+        marcadores = ", ".join(["%s"] * len(ids))
+        query = f"SELECT * FROM pacientes WHERE id IN ({marcadores})"
+        for fila in db.execute_query(query, tuple(ids), fetch=True) or []:
+            paciente = Paciente(**fila)
+            cache.guardar(paciente.id, paciente)
+            encontrados[paciente.id] = paciente
+        return encontrados
+    
+    @staticmethod
+    def buscar_por_nombre(db: Database, texto: str, limite: int = 50) -> List['Paciente']:
+        """Busca pacientes por nombre (parcial, sin distinguir acentos ni mayúsculas), mejores primero"""
+        ids = obtener_indice(db, 'pacientes').buscar(texto, limite)
+        encontrados = Paciente.buscar_por_ids(db, ids)
+        return [encontrados[id] for id in ids if id in encontrados]
+    
+    @staticmethod
+    def _buscar_por_contacto(db: Database, campo: str, valores) -> Dict[str, 'Paciente']:
+        """{valor normalizado: paciente} para un campo de contacto ('email' o 'telefono')"""
+        valores = normalizar_contactos(campo, valores)
+        if not valores:
+            return {}
+        if BUSQUEDA_CONFIG['contactos_en_memoria']:
+            ids = obtener_indice_contactos(db, 'pacientes').buscar(campo, valores)
+            pacientes = Paciente.buscar_por_ids(db, ids.values())
+            return {valor: pacientes[id] for valor, id in ids.items() if id in pacientes}
+        encontrados = {}
+        for fila in filas_por_contacto(db, 'pacientes', campo, valores):
+            contacto = fila.pop('contacto')
+            encontrados[contacto] = Paciente(**fila)
+        return encontrados
+    
+    @staticmethod
+    def buscar_por_email(db: Database, email: str) -> Optional['Paciente']:
+        """Busca un paciente por email (sin distinguir mayúsculas ni espacios alrededor)"""
+        return next(iter(Paciente._buscar_por_contacto(db, 'email', [email]).values()), None)
+    
+    @staticmethod
+    def buscar_por_telefono(db: Database, telefono: str) -> Optional['Paciente']:
+        """Busca un paciente por teléfono (ignorando espacios, guiones, puntos y paréntesis)"""
+        return next(iter(Paciente._buscar_por_contacto(db, 'telefono', [telefono]).values()), None)
+    
+    @staticmethod
+    def buscar_por_emails(db: Database, emails) -> Dict[str, 'Paciente']:
+        """Resuelve muchos emails a la vez; retorna {email normalizado: paciente}"""
+        return Paciente._buscar_por_contacto(db, 'email', emails)
+    
+    @staticmethod
+    def buscar_por_telefonos(db: Database, telefonos) -> Dict[str, 'Paciente']:
+        """Resuelve muchos teléfonos a la vez; retorna {teléfono normalizado: paciente}"""
+        return Paciente._buscar_por_contacto(db, 'telefono', telefonos)
+    
+    @staticmethod
+    def por_actividad() -> 'ConsultaPacientes':
+        """Crea una consulta de pacientes según su actividad (citas y visitas)"""
+        return ConsultaPacientes()
     
     @staticmethod
     def eliminar(db: Database, id: int) -> bool:
         """Elimina un paciente por ID"""
-        query = "DELETE FROM pacientes WHERE id = %s"
-        return db.execute_query(query, (id,)) is not None
\ No newline at end of file
+        try:
+            with db.transaccion() as cursor:
+                # Sus citas se borran por CASCADE: se descuentan de los contadores en la misma transacción
+                deltas = descontar_citas(cursor, "paciente_id = %s", (id,))
+                cursor.execute("DELETE FROM pacientes WHERE id = %s", (id,))
+        except mysql.connector.Error as e:
+            print(f"❌ Error en la consulta: {e}")
+            return False
+        obtener_cache(db, 'pacientes').invalidar(id)
+        obtener_indice(db, 'pacientes').quitar(id)
+        obtener_indice_contactos(db, 'pacientes').quitar(id)
+        obtener_contadores(db).aplicar(deltas)
+        # Las agendas de médicos deben recargarse
+        obtener_agenda(db).invalidar()
+        obtener_proximas(db).invalidar()
+        return True
+
+
+class ConsultaPacientes:
+    """Pacientes filtrados por su actividad; cada criterio es una subconsulta correlacionada.
+
+    Las condiciones usan EXISTS / NOT EXISTS sobre citas (índice paciente_id,
+    fecha_hora), así MySQL resuelve cada paciente sin traer sus citas.
+    Una visita es una cita completada.
+    """
+    
+    def __init__(self):
+        self._condiciones = []
+        self._params = []
+    
+    def _agregar(self, condicion: str, *params) -> 'ConsultaPacientes':
+        self._condiciones.append(condicion)
+        self._params.extend(params)
+        return self
+    
+    def sin_citas_en_estado(self, estado: str) -> 'ConsultaPacientes':
+        """Pacientes sin ninguna cita en el estado indicado (anti-join)"""
+        return self._agregar(
+            "NOT EXISTS (SELECT 1 FROM citas c WHERE c.paciente_id = p.id AND c.estado = %s)", estado
+        )
+    
+    def ultima_visita_antes(self, fecha: datetime, incluir_sin_visitas: bool = False) -> 'ConsultaPacientes':
+        """Pacientes cuya última visita fue antes de la fecha (para campañas de recordatorio)"""
+        self._agregar(
+            """NOT EXISTS (SELECT 1 FROM citas c WHERE c.paciente_id = p.id
+                          AND c.estado = 'completada' AND c.fecha_hora >= %s)""", fecha
+        )
+        if not incluir_sin_visitas:
+            self._agregar("EXISTS (SELECT 1 FROM citas c WHERE c.paciente_id = p.id AND c.estado = 'completada')")
+        return self
+    
+    def ultima_visita_despues(self, fecha: datetime) -> 'ConsultaPacientes':
+        """Pacientes con al menos una visita desde la fecha"""
+        return self._agregar(
+            """EXISTS (SELECT 1 FROM citas c WHERE c.paciente_id = p.id
+                      AND c.estado = 'completada' AND c.fecha_hora >= %s)""", fecha
+        )
+    
+    def visitas_entre(self, desde: datetime, hasta: datetime, minimo: int = None,
+                      maximo: int = None) -> 'ConsultaPacientes':
+        """Pacientes con entre `minimo` y `maximo` visitas en [desde, hasta)"""
+        conteo = """(SELECT COUNT(*) FROM citas c WHERE c.paciente_id = p.id
+                     AND c.estado = 'completada' AND c.fecha_hora >= %s AND c.fecha_hora < %s)"""
+        if minimo is not None:
+            self._agregar(f"{conteo} >= %s", desde, hasta, minimo)
+        if maximo is not None:
+            self._agregar(f"{conteo} <= %s", desde, hasta, maximo)
+        return self
+    
+    def _where(self, extra: List[str] = None) -> str:
+        condiciones = self._condiciones + (extra or [])
+        return (" WHERE " + " AND ".join(condiciones)) if condiciones else ""
+    
+    def contar(self, db: Database) -> int:
+        """Cuenta los pacientes que cumplen los criterios"""
+        query = "SELECT COUNT(*) AS total FROM pacientes p" + self._where()
+        resultado = db.execute_query(query, tuple(self._params), fetch=True)
+        return resultado[0]['total'] if resultado else 0
+    
+    def obtener(self, db: Database) -> List[Paciente]:
+        """Todos los pacientes que cumplen los criterios, ordenados por nombre"""
+        query = "SELECT p.* FROM pacientes p" + self._where() + " ORDER BY p.nombre, p.id"
+        resultados = db.execute_query(query, tuple(self._params), fetch=True)
+        return [Paciente(**fila) for fila in resultados] if resultados else []
+    
+    def obtener_pagina(self, db: Database, token: Optional[Tuple[str, int]] = None,
+                       cantidad: int = 100) -> Tuple[List[Paciente], Optional[Tuple[str, int]]]:
+        """Una página ordenada por (nombre, id) y el token de la siguiente (None si no hay más)"""
+        extra, params = [], list(self._params)
+        if token is not None:
+            extra.append("(p.nombre > %s OR (p.nombre = %s AND p.id > %s))")
+            params.extend((token[0], token[0], token[1]))
+        query = "SELECT p.* FROM pacientes p" + self._where(extra) + " ORDER BY p.nombre, p.id LIMIT %s"
+        params.append(cantidad)
+        resultados = db.execute_query(query, tuple(params), fetch=True) or []
+        pacientes = [Paciente(**fila) for fila in resultados]
+        if len(pacientes) < cantidad:
+            return pacientes, None
+        return pacientes, (pacientes[-1].nombre, pacientes[-1].id)
@@ -0,0 +1,134 @@
+import threading
+import weakref
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import mysql.connector
+from models.database import Database
+from models.agenda import a_datetime
+
+Proxima = Tuple[datetime, int, Optional[int], Optional[int]]  # (fecha_hora, cita_id, paciente_id, medico_id)
+
+
+class IndiceProximas:
+    """Citas programadas desde ahora en adelante, ordenadas por fecha_hora.
+
+    Se carga con una consulta por rango (fecha_hora >= ahora) y después se
+    mantiene desde Cita.guardar, Cita.eliminar y los borrados en cascada, así
+    "las próximas N", "las de esta ventana" y "las que ya vencieron" son
+    búsquedas con bisect que nunca leen citas pasadas. Garantiza tener todas
+    las citas programadas con fecha_hora >= `desde`; `extraer_vencidas` corre
+    ese límite hacia adelante. Si la carga falla el índice queda sin cargar,
+    las consultas no devuelven citas y la siguiente vuelve a intentarlo.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._lock = threading.RLock()
+        self._entradas: Optional[List[Proxima]] = None
+        self._por_cita: Dict[int, Proxima] = {}
+        self.desde: Optional[datetime] = None
+
+    def _cargar(self) -> bool:
+        """Carga el índice si hace falta; retorna False si la lectura falló"""
+        with self._lock:
+            if self._entradas is not None:
+                return True
+            desde = datetime.now()
+            query = """SELECT id, paciente_id, medico_id, fecha_hora FROM citas
+                       WHERE estado = 'programada' AND fecha_hora >= %s
+                       ORDER BY fecha_hora, id"""
+            try:
+                entradas = [
+                    (a_datetime(fila['fecha_hora']), fila['id'], fila['paciente_id'], fila['medico_id'])
+                    for fila in self.db.iter_query(query, (desde,))
+                ]
+            except mysql.connector.Error:
+                return False
+            entradas.sort()
+            self._entradas = entradas
+            self._por_cita = {entrada[1]: entrada for entrada in entradas}
+            self.desde = desde
+            return True
+
+    def _quitar(self, cita_id: int):
+        entrada = self._por_cita.pop(cita_id, None)
+        if entrada is None:
+            return
+        posicion = bisect_left(self._entradas, entrada)
+        if posicion < len(self._entradas) and self._entradas[posicion] == entrada:
+            del self._entradas[posicion]
+
+    # === MANTENIMIENTO ===
+
+    def registrar(self, cita):
+        """Refleja el estado actual de una cita guardada (si el índice ya está cargado)"""
+        with self._lock:
+            if self._entradas is None:
+                return
+            self._quitar(cita.id)
+            fecha_hora = a_datetime(cita.fecha_hora)
+            if cita.estado != "programada" or fecha_hora is None or fecha_hora < self.desde:
+                return
+            entrada = (fecha_hora, cita.id, cita.paciente_id, cita.medico_id)
+            insort(self._entradas, entrada)
+            self._por_cita[cita.id] = entrada
+
+    def quitar(self, cita_id: int):
+        """Elimina una cita del índice"""
+        with self._lock:
+            if self._entradas is not None:
+                self._quitar(cita_id)
+
+    def invalidar(self):
+        """Descarta el índice para recargarlo en la próxima consulta"""
+        with self._lock:
+            self._entradas = None
+            self._por_cita = {}
+
+    # === CONSULTAS ===
+
+    def proximas(self, cantidad: int, desde: datetime = None) -> List[Proxima]:
+        """Las `cantidad` citas programadas siguientes a `desde` (por defecto, ahora)"""
+        with self._lock:
+            if not self._cargar():
+                return []
+            inicio = bisect_left(self._entradas, (desde or datetime.now(),))
+            return self._entradas[inicio:inicio + cantidad]
+
+    def en_ventana(self, inicio: datetime, fin: datetime) -> List[Proxima]:
+        """Citas programadas con fecha_hora en [inicio, fin)"""
+        with self._lock:
+            if not self._cargar():
+                return []
+            desde = bisect_left(self._entradas, (inicio,))
+            hasta = bisect_left(self._entradas, (fin,))
+            return self._entradas[desde:hasta]
+
+    def extraer_vencidas(self, hasta: datetime = None) -> List[Proxima]:
+        """Quita y retorna las citas con fecha_hora anterior a `hasta` (por defecto, ahora)"""
+        hasta = hasta or datetime.now()
+        with self._lock:
+            if not self._cargar() or hasta <= self.desde:
+                return []
+            corte = bisect_left(self._entradas, (hasta,))
+            vencidas = self._entradas[:corte]
+            del self._entradas[:corte]
+            for entrada in vencidas:
+                del self._por_cita[entrada[1]]
+            self.desde = hasta
+            return vencidas
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entradas) if self._cargar() else 0
+
+
+_indices_por_db = weakref.WeakKeyDictionary()
+
+def obtener_proximas(db: Database) -> IndiceProximas:
+    """Índice de próximas citas compartido por todos los servicios que usan la misma base"""
+    indice = _indices_por_db.get(db)
+    if indice is None:
+        indice = _indices_por_db.setdefault(db, IndiceProximas(db))
+    return indice
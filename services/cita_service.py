@@ -1,9 +1,15 @@
-from typing import List, Dict, Optional
+import heapq
+from itertools import islice
+from typing import Iterator, List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 from models.database import Database
-from models.cita import Cita
+from models.cita import Cita, ConsultaCitas
 from models.paciente import Paciente
 from models.medico import Medico
+from models.agenda import obtener_agenda, DURACION_PREDETERMINADA
+from models.calendario import obtener_calendario
+from models.contadores import obtener_contadores
+from models.proximas import obtener_proximas
 
 class CitaService:
     """Servicio para operaciones de citas con programación funcional"""
@@ -47,6 +53,54 @@ class CitaService:
             print(f"❌ Error al crear cita: {e}")
             return None
     
+    def crear_citas_lote(self, datos_citas: List[Dict], tamano_lote: int = 500) -> List[Cita]:
+        """Crea muchas citas en una sola transacción (p. ej. la carga de un día).
+
+        Si alguna cita programada se cruza con otra del médico (existente o del
+        mismo lote) no se crea ninguna.
+        """
+        if not datos_citas:
+            return []
+        
+        # Verificar pacientes y médicos con una consulta por entidad
+        ids_pacientes = {d['paciente_id'] for d in datos_citas}
+        ids_medicos = {d['medico_id'] for d in datos_citas}
+        pacientes_existentes = self._ids_existentes('pacientes', ids_pacientes)
+        medicos_existentes = self._ids_existentes('medicos', ids_medicos)
+        
+        if ids_pacientes - pacientes_existentes:
+            print(f"❌ Pacientes no encontrados: {sorted(ids_pacientes - pacientes_existentes)}")
+            return []
+        if ids_medicos - medicos_existentes:
+            print(f"❌ Médicos no encontrados: {sorted(ids_medicos - medicos_existentes)}")
+            return []
+        
+        citas = [
+            Cita(
+                paciente_id=d['paciente_id'],
+                medico_id=d['medico_id'],
+                fecha_hora=d['fecha_hora'],
+                motivo=d.get('motivo', ''),
+                estado=d.get('estado', 'programada')
+            )
+            for d in datos_citas
+        ]
+        
+        if Cita.guardar_lote(self.db, citas, tamano_lote):
+            print(f"✅ {len(citas)} citas creadas exitosamente")
+            return citas
+        print("❌ Error al crear las citas")
+        return []
+    
+    def _ids_existentes(self, tabla: str, ids: set) -> set:
+        """Retorna cuáles de los ids existen en la tabla indicada"""
+        if not ids:
+            return set()
+        marcadores = ", ".join(["%s"] * len(ids))
+        query = f"SELECT id FROM {tabla} WHERE id IN ({marcadores})"
+        resultados = self.db.execute_query(query, tuple(ids), fetch=True)
+        return {fila['id'] for fila in resultados} if resultados else set()
+    
     def obtener_cita_por_id(self, cita_id: int) -> Optional[Cita]:
         """Obtiene una cita por su ID"""
         return Cita.buscar_por_id(self.db, cita_id)
@@ -55,6 +109,24 @@ class CitaService:
         """Obtiene todas las citas"""
         return Cita.obtener_todas(self.db)
     
+    def iter_citas(self) -> Iterator[Cita]:
+        """Recorre todas las citas de a una, sin cargarlas todas en memoria"""
+        return Cita.iter_todas(self.db)
+    
+    def cargar_detalles(self, citas: List[Cita]) -> List[Cita]:
+        """Completa paciente y médico de las citas con una consulta por entidad como máximo"""
+        with self.db.limite_consultas(2):
+            return Cita.cargar_detalles_lote(self.db, citas)
+    
+    def obtener_pagina_citas(self, token: Optional[Tuple[datetime, int]],
+                             cantidad: int = 200) -> Tuple[List[Cita], Optional[Tuple[datetime, int]]]:
+        """Obtiene una página de citas (más recientes primero) y el token de la siguiente"""
+        return Cita.obtener_pagina(self.db, token, cantidad)
+    
+    def contar_total_citas(self) -> int:
+        """Cuenta el total de citas"""
+        return Cita.consulta().contar(self.db)
+    
     def actualizar_cita(self, cita_id: int, **kwargs) -> bool:
         """Actualiza una cita existente"""
         cita = Cita.buscar_por_id(self.db, cita_id)
@@ -77,34 +149,22 @@ class CitaService:
     # === PROGRAMACIÓN FUNCIONAL ===
     
     def filtrar_citas_por_estado(self, estado: str) -> List[Cita]:
-        """Filtra citas por estado usando filter()"""
-        todas_citas = Cita.obtener_todas(self.db)
-        return list(filter(lambda cita: cita.estado == estado, todas_citas))
+        """Filtra citas por estado (filtro resuelto en SQL)"""
+        return Cita.consulta().estado(estado).obtener(self.db)
     
     def filtrar_citas_por_medico(self, medico_id: int) -> List[Cita]:
-        """Filtra citas por médico usando filter()"""
-        todas_citas = Cita.obtener_todas(self.db)
-        return list(filter(lambda cita: cita.medico_id == medico_id, todas_citas))
+        """Filtra citas por médico (filtro resuelto en SQL)"""
+        return Cita.consulta().medico(medico_id).obtener(self.db)
     
     def filtrar_citas_por_paciente(self, paciente_id: int) -> List[Cita]:
-        """Filtra citas por paciente usando filter()"""
-        todas_citas = Cita.obtener_todas(self.db)
-        return list(filter(lambda cita: cita.paciente_id == paciente_id, todas_citas))
+        """Filtra citas por paciente (filtro resuelto en SQL)"""
+        return Cita.consulta().paciente(paciente_id).obtener(self.db)
     
     def filtrar_citas_por_fecha(self, fecha: str) -> List[Cita]:
         """Filtra citas por fecha específica"""
         try:
-            todas_citas = Cita.obtener_todas(self.db)
             fecha_target = datetime.strptime(fecha, "%Y-%m-%d").date()
-            
-            return list(filter(
-                lambda cita: (
-                    cita.fecha_hora and 
-                    isinstance(cita.fecha_hora, datetime) and
-                    cita.fecha_hora.date() == fecha_target
-                ),
-                todas_citas
-            ))
+            return Cita.consulta().en_fecha(fecha_target).obtener(self.db)
         except ValueError:
             print("❌ Formato de fecha inválido. Use YYYY-MM-DD")
             return []
@@ -112,21 +172,50 @@ class CitaService:
     def filtrar_citas_por_rango_fechas(self, fecha_inicio: str, fecha_fin: str) -> List[Cita]:
         """Filtra citas por rango de fechas"""
         try:
-            todas_citas = Cita.obtener_todas(self.db)
-            fecha_inicio_dt = datetime.strptime(fecha_inicio, "%Y-%m-%d")
-            fecha_fin_dt = datetime.strptime(fecha_fin + " 23:59:59", "%Y-%m-%d %H:%M:%S")
-            
-            return list(filter(
-                lambda cita: (
-                    cita.fecha_hora and
-                    fecha_inicio_dt <= cita.fecha_hora <= fecha_fin_dt
-                ),
-                todas_citas
-            ))
+            fecha_inicio_dt = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
+            fecha_fin_dt = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
+            return Cita.consulta().entre_fechas(fecha_inicio_dt, fecha_fin_dt).obtener(self.db)
         except ValueError:
             print("❌ Formato de fecha inválido. Use YYYY-MM-DD")
             return []
     
+    def _consulta_filtrada(self, estado: str = None, medico_id: int = None, paciente_id: int = None,
+                           fecha: str = None, fecha_inicio: str = None, fecha_fin: str = None) -> ConsultaCitas:
+        """Consulta con los filtros indicados (fechas YYYY-MM-DD); lanza ValueError si una fecha es inválida"""
+        consulta = Cita.consulta()
+        if estado:
+            consulta.estado(estado)
+        if medico_id:
+            consulta.medico(medico_id)
+        if paciente_id:
+            consulta.paciente(paciente_id)
+        if fecha:
+            consulta.en_fecha(datetime.strptime(fecha, "%Y-%m-%d").date())
+        if fecha_inicio and fecha_fin:
+            consulta.entre_fechas(datetime.strptime(fecha_inicio, "%Y-%m-%d").date(),
+                                  datetime.strptime(fecha_fin, "%Y-%m-%d").date())
+        return consulta
+    
+    def contar_citas_filtradas(self, **filtros) -> int:
+        """Cuenta las citas que cumplen los filtros (los mismos de obtener_pagina_filtrada)"""
+        try:
+            return self._consulta_filtrada(**filtros).contar(self.db)
+        except ValueError:
+            print("❌ Formato de fecha inválido. Use YYYY-MM-DD")
+            return 0
+    
+    def obtener_pagina_filtrada(self, token: Optional[Tuple[datetime, int]], cantidad: int = 200,
+                                **filtros) -> Tuple[List[Cita], Optional[Tuple[datetime, int]]]:
+        """Una página de las citas filtradas (más recientes primero) y el token de la siguiente.
+
+        Filtros: estado, medico_id, paciente_id, fecha o fecha_inicio/fecha_fin (YYYY-MM-DD).
+        """
+        try:
+            return self._consulta_filtrada(**filtros).despues_de(token).obtener_pagina(self.db, cantidad)
+        except ValueError:
+            print("❌ Formato de fecha inválido. Use YYYY-MM-DD")
+            return [], None
+    
     # === OPERACIONES DE ESTADO ===
     
     def cancelar_cita(self, cita_id: int) -> bool:
@@ -146,69 +235,109 @@ class CitaService:
     # === CÁLCULOS Y ESTADÍSTICAS ===
     
     def contar_citas_por_estado(self) -> Dict[str, int]:
-        """Cuenta citas por estado usando programación funcional"""
-        todas_citas = Cita.obtener_todas(self.db)
-        
-        # Usar map para extraer estados y reducir para contar
-        estados = list(map(lambda c: c.estado, todas_citas))
-        conteo = {}
-        
-        for estado in estados:
-            conteo[estado] = conteo.get(estado, 0) + 1
-        
-        return conteo
+        """Cuenta citas por estado (de los contadores mantenidos)"""
+        return obtener_contadores(self.db).por_estado()
     
     def calcular_porcentaje_ocupacion(self, medico_id: int, fecha_inicio: str, fecha_fin: str) -> float:
-        """Calcula porcentaje de ocupación de un médico"""
+        """Calcula porcentaje de ocupación de un médico según su horario laboral"""
         try:
-            citas_medico = self.filtrar_citas_por_medico(medico_id)
-            fecha_inicio_dt = datetime.strptime(fecha_inicio, "%Y-%m-%d")
-            fecha_fin_dt = datetime.strptime(fecha_fin, "%Y-%m-%d")
-            
-            # Filtrar citas en el rango de fechas
-            citas_en_rango = list(filter(
-                lambda c: (
-                    c.fecha_hora and
-                    fecha_inicio_dt <= c.fecha_hora.date() <= fecha_fin_dt.date()
-                ),
-                citas_medico
-            ))
+            fecha_inicio_dt = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
+            fecha_fin_dt = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
             
-            # Calcular horas ocupadas (suponiendo 1 hora por cita)
-            horas_ocupadas = len(citas_en_rango)
+            # Citas del médico en el rango (COUNT en SQL) frente a los turnos de su calendario
+            citas_en_rango = Cita.consulta().medico(medico_id).entre_fechas(fecha_inicio_dt, fecha_fin_dt).contar(self.db)
+            capacidad = int(obtener_calendario(self.db).capacidad([medico_id], fecha_inicio_dt, fecha_fin_dt)[0])
             
-            # Calcular días laborales en el rango
-            dias_totales = (fecha_fin_dt - fecha_inicio_dt).days + 1
-            dias_laborales = dias_totales * 5 / 7  # Aprox 5 días laborales por semana
-            horas_totales = dias_laborales * 8  # 8 horas por día
-            
-            return (horas_ocupadas / horas_totales * 100) if horas_totales > 0 else 0
+            return (citas_en_rango / capacidad * 100) if capacidad > 0 else 0
             
         except ValueError as e:
             print(f"❌ Error en formato de fecha: {e}")
             return 0.0
     
-    def verificar_disponibilidad_medico(self, medico_id: int, fecha_hora: str) -> bool:
-        """Verifica si un médico está disponible en una fecha/hora específica"""
+    def verificar_disponibilidad_medico(self, medico_id: int, fecha_hora: str,
+                                        duracion: int = DURACION_PREDETERMINADA) -> bool:
+        """Verifica si un médico está libre durante [fecha_hora, fecha_hora + duración)"""
         try:
-            citas_medico = self.filtrar_citas_por_medico(medico_id)
             fecha_consulta = datetime.strptime(fecha_hora, "%Y-%m-%d %H:%M")
-            
-            # Buscar conflictos de horario
-            conflictos = list(filter(
-                lambda c: (
-                    c.fecha_hora and 
-                    c.fecha_hora == fecha_consulta and 
-                    c.estado != "cancelada"
-                ),
-                citas_medico
-            ))
-            
-            return len(conflictos) == 0
+            return obtener_agenda(self.db).esta_libre(medico_id, fecha_consulta, duracion)
         except ValueError:
             print("❌ Formato de fecha/hora inválido")
             return False
     
+    def obtener_citas_solapadas(self, medico_id: int, inicio: str, fin: str) -> List[Dict]:
+        """Citas activas del médico que se cruzan con el rango (YYYY-MM-DD HH:MM)"""
+        try:
+            inicio_dt = datetime.strptime(inicio, "%Y-%m-%d %H:%M")
+            fin_dt = datetime.strptime(fin, "%Y-%m-%d %H:%M")
+            return obtener_agenda(self.db).citas_solapadas(medico_id, inicio_dt, fin_dt)
+        except ValueError:
+            print("❌ Formato de fecha/hora inválido")
+            return []
+    
+    def obtener_huecos_libres(self, medico_id: int, fecha: str) -> List[tuple]:
+        """Tramos libres del médico en un día dentro de su jornada laboral"""
+        try:
+            dia = datetime.strptime(fecha, "%Y-%m-%d").date()
+        except ValueError:
+            print("❌ Formato de fecha inválido. Use YYYY-MM-DD")
+            return []
+        jornada = obtener_calendario(self.db).jornada(medico_id, dia)
+        if jornada is None:
+            return []
+        inicio_dt, fin_dt, _ = jornada
+        return obtener_agenda(self.db).huecos_libres(medico_id, inicio_dt, fin_dt)
+    
+    def buscar_proximos_horarios(self, especialidad: str, fecha_inicio: str, fecha_fin: str,
+                                 duracion: int = None, cantidad: int = 5) -> List[Dict]:
+        """Busca los primeros horarios libres entre todos los médicos de una especialidad.
+
+        Cada médico ofrece turnos según su calendario laboral; `duracion` (minutos)
+        indica cuánto debe durar la cita y por defecto es el turno del médico.
+        """
+        try:
+            dia = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
+            ultimo_dia = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
+        except ValueError:
+            print("❌ Formato de fecha inválido. Use YYYY-MM-DD")
+            return []
+        
+        medicos = Medico.buscar_por_especialidad(self.db, especialidad)
+        if not medicos or cantidad <= 0:
+            return []
+        
+        agenda = obtener_agenda(self.db)
+        calendario = obtener_calendario(self.db)
+        ahora = datetime.now().replace(second=0, microsecond=0)
+        
+        def horarios_del_dia(medico, dia):
+            """Genera en orden los horarios libres de un médico en un día"""
+            jornada = calendario.jornada(medico.id, dia)
+            if jornada is None:
+                return
+            inicio_jornada, fin_jornada, duracion_turno = jornada
+            paso = timedelta(minutes=duracion_turno)
+            largo = timedelta(minutes=duracion or duracion_turno)
+            # Turnos alineados al inicio de la jornada, desde el primero que no haya pasado
+            inicio = inicio_jornada
+            if ahora > inicio:
+                inicio += paso * -(-(ahora - inicio) // paso)
+            for libre_inicio, libre_fin in agenda.huecos_libres(medico.id, inicio, fin_jornada):
+                while inicio < libre_inicio:
+                    inicio += paso
+                while inicio + largo <= libre_fin:
+                    yield (inicio, medico.id, medico, inicio + largo)
+                    inicio += paso
+        
+        horarios = []
+        while dia <= ultimo_dia and len(horarios) < cantidad:
+            # Mezcla ordenada de los horarios de todos los médicos: se detiene al completar
+            candidatos = heapq.merge(*(horarios_del_dia(m, dia) for m in medicos))
+            for inicio, _, medico, fin in islice(candidatos, cantidad - len(horarios)):
+                horarios.append({'medico': medico, 'inicio': inicio, 'fin': fin})
+            dia += timedelta(days=1)
+        
+        return horarios
+    
     def obtener_citas_pendientes(self) -> List[Cita]:
         """Obtiene todas las citas programadas (pendientes)"""
         return self.filtrar_citas_por_estado("programada")
@@ -216,17 +345,27 @@ class CitaService:
     def obtener_proximas_citas(self, dias: int = 7) -> List[Cita]:
         """Obtiene citas programadas para los próximos días"""
         try:
-            todas_citas = self.obtener_citas_pendientes()
             fecha_actual = datetime.now()
             fecha_limite = fecha_actual + timedelta(days=dias)
             
-            return list(filter(
-                lambda cita: (
-                    cita.fecha_hora and
-                    fecha_actual <= cita.fecha_hora <= fecha_limite
-                ),
-                todas_citas
-            ))
+            # Ventana resuelta en el índice de próximas citas; solo se leen esas filas por id
+            ventana = obtener_proximas(self.db).en_ventana(fecha_actual, fecha_limite + timedelta(seconds=1))
+            return self._citas_por_id([cita_id for _, cita_id, _, _ in ventana])
         except Exception as e:
             print(f"❌ Error al obtener próximas citas: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    def obtener_siguientes_citas(self, cantidad: int = 10) -> List[Cita]:
+        """Obtiene las próximas `cantidad` citas programadas a partir de ahora"""
+        siguientes = obtener_proximas(self.db).proximas(cantidad)
+        return self._citas_por_id([cita_id for _, cita_id, _, _ in siguientes])
+    
+    def _citas_por_id(self, ids: List[int]) -> List[Cita]:
+        """Citas programadas con esos ids, en orden de fecha (sin recorrer el historial)"""
+        if not ids:
+            return []
+        return (Cita.consulta()
+                .ids(ids)
+                .estado("programada")
+                .ordenar_por_fecha(descendente=False)
+                .obtener(self.db))
\ No newline at end of file
@@ -1,7 +1,9 @@
-from typing import List, Optional, Dict
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Dict, Tuple
 from models.database import Database
 from models.medico import Medico
 from models.cita import Cita
+from models.estadisticas import medicos_mas_ocupados, disponibilidad_medicos
 
 class MedicoService:
     """Servicio para operaciones de médicos"""
@@ -40,6 +42,15 @@ class MedicoService:
         """Obtiene todos los médicos"""
         return Medico.obtener_todos(self.db)
     
+    def iter_medicos(self) -> Iterator[Medico]:
+        """Recorre todos los medicos de a uno, sin cargarlos todos en memoria"""
+        return Medico.iter_todos(self.db)
+    
+    def obtener_pagina_medicos(self, token: Optional[Tuple[str, int]],
+                                 cantidad: int = 200) -> Tuple[List[Medico], Optional[Tuple[str, int]]]:
+        """Obtiene una página de medicos y el token de la siguiente (None si no hay más)"""
+        return Medico.obtener_pagina(self.db, token, cantidad)
+    
     def actualizar_medico(self, medico_id: int, **kwargs) -> bool:
         """Actualiza un médico existente"""
         medico = Medico.buscar_por_id(self.db, medico_id)
@@ -61,13 +72,9 @@ class MedicoService:
     
     # === BÚSQUEDAS Y FILTROS ===
     
-    def buscar_medicos_por_nombre(self, nombre: str) -> List[Medico]:
-        """Busca médicos por nombre (búsqueda parcial)"""
-        todos_medicos = Medico.obtener_todos(self.db)
-        return list(filter(
-            lambda m: nombre.lower() in m.nombre.lower(),
-            todos_medicos
-        ))
+    def buscar_medicos_por_nombre(self, nombre: str, limite: int = 50) -> List[Medico]:
+        """Busca médicos por nombre (búsqueda parcial con índice en memoria)"""
+        return Medico.buscar_por_nombre(self.db, nombre, limite)
     
     def buscar_medicos_por_especialidad(self, especialidad: str) -> List[Medico]:
         """Busca médicos por especialidad"""
@@ -75,27 +82,25 @@ class MedicoService:
     
     def buscar_medico_por_email(self, email: str) -> Optional[Medico]:
         """Busca un médico por email exacto"""
-        todos_medicos = Medico.obtener_todos(self.db)
-        resultados = list(filter(
-            lambda m: m.email and m.email.lower() == email.lower(),
-            todos_medicos
-        ))
-        return resultados[0] if resultados else None
+        return Medico.buscar_por_email(self.db, email)
     
     def buscar_medico_por_telefono(self, telefono: str) -> Optional[Medico]:
         """Busca un médico por teléfono exacto"""
-        todos_medicos = Medico.obtener_todos(self.db)
-        resultados = list(filter(
-            lambda m: m.telefono and m.telefono == telefono,
-            todos_medicos
-        ))
-        return resultados[0] if resultados else None
+        return Medico.buscar_por_telefono(self.db, telefono)
+    
+    def buscar_medicos_por_emails(self, emails: List[str]) -> Dict[str, Medico]:
+        """Resuelve muchos emails a la vez (importaciones, detección de duplicados)"""
+        return Medico.buscar_por_emails(self.db, emails)
+    
+    def buscar_medicos_por_telefonos(self, telefonos: List[str]) -> Dict[str, Medico]:
+        """Resuelve muchos teléfonos a la vez (importaciones, detección de duplicados)"""
+        return Medico.buscar_por_telefonos(self.db, telefonos)
     
     # === ESTADÍSTICAS E INFORMES ===
     
     def contar_total_medicos(self) -> int:
         """Cuenta el total de médicos"""
-        return len(Medico.obtener_todos(self.db))
+        return Medico.contar(self.db)
     
     def obtener_especialidades_disponibles(self) -> List[str]:
         """Obtiene lista de especialidades únicas"""
@@ -105,54 +110,30 @@ class MedicoService:
         especialidades_unicas = list(set(filter(lambda e: e is not None, especialidades)))
         return sorted(especialidades_unicas)
     
-    def obtener_medicos_mas_ocupados(self, limite: int = 5) -> List[Dict]:
-        """Obtiene los médicos con más citas programadas"""
-        from services.cita_service import CitaService
-        cita_service = CitaService(self.db)
-        
-        todos_medicos = Medico.obtener_todos(self.db)
-        citas_pendientes = cita_service.obtener_citas_pendientes()
-        
-        # Contar citas por médico
-        conteo_citas = {}
-        for cita in citas_pendientes:
-            medico_id = cita.medico_id
-            conteo_citas[medico_id] = conteo_citas.get(medico_id, 0) + 1
-        
-        # Crear lista de médicos con su conteo de citas
-        medicos_con_conteo = []
-        for medico in todos_medicos:
-            conteo = conteo_citas.get(medico.id, 0)
-            medicos_con_conteo.append({
-                'medico': medico,
-                'citas_pendientes': conteo
-            })
-        
-        # Ordenar por número de citas (descendente) y tomar los primeros
-        medicos_con_conteo.sort(key=lambda x: x['citas_pendientes'], reverse=True)
-        return medicos_con_conteo[:limite]
+    def obtener_medicos_mas_ocupados(self, limite: int = 5, estado: Optional[str] = "programada",
+                                     fecha_inicio: str = None, fecha_fin: str = None,
+                                     especialidad: str = None) -> List[Dict]:
+        """Obtiene los `limite` médicos con más citas (programadas por defecto).
+
+        Opcionalmente solo citas entre dos días (YYYY-MM-DD, ambos incluidos) y
+        médicos de una especialidad; `estado=None` cuenta todas las citas.
+        """
+        try:
+            desde = datetime.strptime(fecha_inicio, "%Y-%m-%d") if fecha_inicio else None
+            hasta = datetime.strptime(fecha_fin, "%Y-%m-%d") + timedelta(days=1) if fecha_fin else None
+        except ValueError:
+            print("❌ Formato de fecha inválido. Use YYYY-MM-DD")
+            return []
+        return medicos_mas_ocupados(self.db, limite, estado, desde, hasta, especialidad)
     
     def obtener_disponibilidad_medico(self, medico_id: int) -> Dict:
         """Obtiene información de disponibilidad de un médico"""
-        from services.cita_service import CitaService
-        cita_service = CitaService(self.db)
-        
-        medico = Medico.buscar_por_id(self.db, medico_id)
-        if not medico:
-            return {}
-        
-        citas_medico = cita_service.filtrar_citas_por_medico(medico_id)
-        citas_pendientes = list(filter(lambda c: c.estado == "programada", citas_medico))
-        citas_completadas = list(filter(lambda c: c.estado == "completada", citas_medico))
-        citas_canceladas = list(filter(lambda c: c.estado == "cancelada", citas_medico))
-        
-        return {
-            'medico': medico,
-            'total_citas': len(citas_medico),
-            'citas_pendientes': len(citas_pendientes),
-            'citas_completadas': len(citas_completadas),
-            'citas_canceladas': len(citas_canceladas)
-        }
+        # El médico y sus conteos por estado llegan en la misma fila
+        return disponibilidad_medicos(self.db, [medico_id]).get(medico_id, {})
+    
+    def obtener_disponibilidad_medicos(self, medico_ids: List[int] = None) -> Dict[int, Dict]:
+        """Disponibilidad de varios médicos (todos si no se indican) con una consulta: {medico_id: disponibilidad}"""
+        return disponibilidad_medicos(self.db, medico_ids)
     
     # === PROGRAMACIÓN FUNCIONAL ===
     
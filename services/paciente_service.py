@@ -1,4 +1,5 @@
-from typing import List, Optional, Dict
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Dict, Tuple
 from models.database import Database
 from models.paciente import Paciente
 from models.cita import Cita
@@ -40,6 +41,15 @@ class PacienteService:
         """Obtiene todos los pacientes"""
         return Paciente.obtener_todos(self.db)
     
+    def iter_pacientes(self) -> Iterator[Paciente]:
+        """Recorre todos los pacientes de a uno, sin cargarlos todos en memoria"""
+        return Paciente.iter_todos(self.db)
+    
+    def obtener_pagina_pacientes(self, token: Optional[Tuple[str, int]],
+                                 cantidad: int = 200) -> Tuple[List[Paciente], Optional[Tuple[str, int]]]:
+        """Obtiene una página de pacientes y el token de la siguiente (None si no hay más)"""
+        return Paciente.obtener_pagina(self.db, token, cantidad)
+    
     def actualizar_paciente(self, paciente_id: int, **kwargs) -> bool:
         """Actualiza un paciente existente"""
         paciente = Paciente.buscar_por_id(self.db, paciente_id)
@@ -61,74 +71,106 @@ class PacienteService:
     
     # === BÚSQUEDAS Y FILTROS ===
     
-    def buscar_pacientes_por_nombre(self, nombre: str) -> List[Paciente]:
-        """Busca pacientes por nombre (búsqueda parcial)"""
-        todos_pacientes = Paciente.obtener_todos(self.db)
-        return list(filter(
-            lambda p: nombre.lower() in p.nombre.lower(),
-            todos_pacientes
-        ))
+    def buscar_pacientes_por_nombre(self, nombre: str, limite: int = 50) -> List[Paciente]:
+        """Busca pacientes por nombre (búsqueda parcial con índice en memoria)"""
+        return Paciente.buscar_por_nombre(self.db, nombre, limite)
     
     def buscar_paciente_por_email(self, email: str) -> Optional[Paciente]:
         """Busca un paciente por email exacto"""
-        todos_pacientes = Paciente.obtener_todos(self.db)
-        resultados = list(filter(
-            lambda p: p.email and p.email.lower() == email.lower(),
-            todos_pacientes
-        ))
-        return resultados[0] if resultados else None
+        return Paciente.buscar_por_email(self.db, email)
     
     def buscar_paciente_por_telefono(self, telefono: str) -> Optional[Paciente]:
         """Busca un paciente por teléfono exacto"""
-        todos_pacientes = Paciente.obtener_todos(self.db)
-        resultados = list(filter(
-            lambda p: p.telefono and p.telefono == telefono,
-            todos_pacientes
-        ))
-        return resultados[0] if resultados else None
+        return Paciente.buscar_por_telefono(self.db, telefono)
+    
+    def buscar_pacientes_por_emails(self, emails: List[str]) -> Dict[str, Paciente]:
+        """Resuelve muchos emails a la vez (importaciones, detección de duplicados)"""
+        return Paciente.buscar_por_emails(self.db, emails)
+    
+    def buscar_pacientes_por_telefonos(self, telefonos: List[str]) -> Dict[str, Paciente]:
+        """Resuelve muchos teléfonos a la vez (importaciones, detección de duplicados)"""
+        return Paciente.buscar_por_telefonos(self.db, telefonos)
     
     # === ESTADÍSTICAS E INFORMES ===
     
     def contar_total_pacientes(self) -> int:
         """Cuenta el total de pacientes"""
-        return len(Paciente.obtener_todos(self.db))
+        return Paciente.contar(self.db)
     
     def obtener_pacientes_sin_citas(self) -> List[Paciente]:
         """Obtiene pacientes que no tienen citas programadas"""
-        from services.cita_service import CitaService
-        cita_service = CitaService(self.db)
-        
-        todos_pacientes = Paciente.obtener_todos(self.db)
-        citas_pendientes = cita_service.obtener_citas_pendientes()
-        
-        # Obtener IDs de pacientes con citas pendientes
-        ids_con_citas = set(map(lambda c: c.paciente_id, citas_pendientes))
-        
-        # Filtrar pacientes que no tienen citas pendientes
-        return list(filter(
-            lambda p: p.id not in ids_con_citas,
-            todos_pacientes
-        ))
+        # Anti-join en SQL: NOT EXISTS sobre las citas programadas de cada paciente
+        return Paciente.por_actividad().sin_citas_en_estado("programada").obtener(self.db)
+    
+    def obtener_pacientes_por_actividad(self, token: Optional[Tuple[str, int]] = None, cantidad: int = 100,
+                                        ultima_visita_antes: str = None, ultima_visita_despues: str = None,
+                                        visitas_desde: str = None, visitas_hasta: str = None,
+                                        minimo_visitas: int = None, maximo_visitas: int = None,
+                                        sin_citas_programadas: bool = False
+                                        ) -> Tuple[List[Paciente], Optional[Tuple[str, int]]]:
+        """Pacientes según su actividad, paginados (campañas de recordatorio).
+
+        Las fechas son YYYY-MM-DD; el rango de visitas incluye ambos días.
+        Retorna (pacientes, token de la siguiente página o None). Lanza
+        ValueError si el filtro de cantidad de visitas está incompleto: hacen
+        falta visitas_desde, visitas_hasta y al menos uno de minimo_visitas o
+        maximo_visitas.
+        """
+        con_rango = visitas_desde is not None or visitas_hasta is not None
+        con_cantidad = minimo_visitas is not None or maximo_visitas is not None
+        if (con_rango or con_cantidad) and not (visitas_desde and visitas_hasta and con_cantidad):
+            raise ValueError("El filtro de visitas requiere visitas_desde, visitas_hasta y "
+                             "minimo_visitas o maximo_visitas")
+        try:
+            consulta = Paciente.por_actividad()
+            if sin_citas_programadas:
+                consulta.sin_citas_en_estado("programada")
+            if ultima_visita_antes:
+                consulta.ultima_visita_antes(datetime.strptime(ultima_visita_antes, "%Y-%m-%d"))
+            if ultima_visita_despues:
+                consulta.ultima_visita_despues(datetime.strptime(ultima_visita_despues, "%Y-%m-%d"))
+            if con_cantidad:
+                desde = datetime.strptime(visitas_desde, "%Y-%m-%d")
+                hasta = datetime.strptime(visitas_hasta, "%Y-%m-%d") + timedelta(days=1)
+                consulta.visitas_entre(desde, hasta, minimo_visitas, maximo_visitas)
+        except ValueError:
+            print("❌ Formato de fecha inválido. Use YYYY-MM-DD")
+            return [], None
+        return consulta.obtener_pagina(self.db, token, cantidad)
+    
+    @staticmethod
+    def _fila_historial(c: Cita) -> Dict:
+        """Cita en el formato legible del historial"""
+        return {
+            'id': c.id,
+            'fecha_hora': c.fecha_hora.strftime("%Y-%m-%d %H:%M") if c.fecha_hora else 'N/A',
+            'medico': c.medico.nombre if c.medico else 'N/A',
+            'especialidad': c.medico.especialidad if c.medico else 'N/A',
+            'estado': c.estado,
+            'motivo': c.motivo
+        }
     
     def obtener_historial_citas_paciente(self, paciente_id: int) -> List[Dict]:
-        """Obtiene el historial completo de citas de un paciente"""
-        from services.cita_service import CitaService
-        cita_service = CitaService(self.db)
-        
-        citas_paciente = cita_service.filtrar_citas_por_paciente(paciente_id)
-        
-        # Usar map para transformar las citas en un formato más legible
-        return list(map(
-            lambda c: {
-                'id': c.id,
-                'fecha_hora': c.fecha_hora.strftime("%Y-%m-%d %H:%M") if c.fecha_hora else 'N/A',
-                'medico': c.medico.nombre if c.medico else 'N/A',
-                'especialidad': c.medico.especialidad if c.medico else 'N/A',
-                'estado': c.estado,
-                'motivo': c.motivo
-            },
-            citas_paciente
-        ))
+        """Obtiene el historial completo de citas de un paciente (más recientes primero)"""
+        citas = Cita.consulta().paciente(paciente_id).obtener(self.db)
+        return [self._fila_historial(c) for c in citas]
+    
+    def obtener_historial_paginado(self, paciente_id: int, cantidad: int = 100
+                                   ) -> Tuple[List[Dict], Optional[Tuple], Optional[Dict]]:
+        """Primera página del historial de un paciente junto con su resumen (una sola consulta).
+
+        Retorna (citas, token de la siguiente página, resumen); el resumen trae
+        total_citas, visitas, ultima_visita y medicos. Las páginas siguientes se
+        piden con obtener_pagina_historial.
+        """
+        citas, siguiente, resumen = Cita.historial_paciente(self.db, paciente_id, cantidad=cantidad)
+        return [self._fila_historial(c) for c in citas], siguiente, resumen
+    
+    def obtener_pagina_historial(self, paciente_id: int, token: Optional[Tuple] = None,
+                                 cantidad: int = 100) -> Tuple[List[Dict], Optional[Tuple]]:
+        """Una página del historial (más recientes primero) y el token de la siguiente"""
+        citas, siguiente, _ = Cita.historial_paciente(self.db, paciente_id, token, cantidad, con_resumen=False)
+        return [self._fila_historial(c) for c in citas], siguiente
     
     def obtener_pacientes_recientes(self, dias: int = 30) -> List[Paciente]:
         """Obtiene pacientes registrados en los últimos días"""
@@ -0,0 +1,133 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from config.database_config import RECORDATORIOS_CONFIG
+from models.database import Database
+from models.agenda import a_datetime
+from models.paciente import Paciente
+from models.medico import Medico
+from models.proximas import obtener_proximas
+
+class RecordatorioService:
+    """Despachador de recordatorios de citas.
+
+    En cada revisión toma del índice de próximas citas solo las que empiezan
+    dentro de la anticipación configurada (sin leer citas pasadas), envía las
+    que todavía no se avisaron y descarta del índice las que ya comenzaron.
+    `enviar(recordatorio)` recibe un dict con cita_id, fecha_hora, paciente y
+    medico; si retorna False el aviso se reintenta en la próxima revisión.
+
+    Los avisos enviados se anotan en la tabla recordatorios_enviados, así un
+    reinicio de la aplicación no vuelve a avisar las mismas citas.
+    """
+
+    def __init__(self, db: Database, enviar: Callable[[Dict], bool] = None,
+                 anticipacion_horas: float = RECORDATORIOS_CONFIG['anticipacion_horas'],
+                 intervalo: float = RECORDATORIOS_CONFIG['intervalo']):
+        self.db = db
+        self.enviar = enviar or self._imprimir
+        self.anticipacion = timedelta(hours=anticipacion_horas)
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    # === REGISTRO DE AVISOS ===
+
+    def _ya_enviados(self, ids: List[int]) -> Optional[Dict[int, datetime]]:
+        """{cita_id: fecha_hora avisada} de las citas indicadas, o None si no se pudo leer"""
+        marcadores = ", ".join(["%s"] * len(ids))
+        filas = self.db.execute_query(
+            f"SELECT cita_id, fecha_hora FROM recordatorios_enviados WHERE cita_id IN ({marcadores})",
+            tuple(ids), fetch=True
+        )
+        if filas is None:
+            return None
+        return {fila['cita_id']: a_datetime(fila['fecha_hora']) for fila in filas}
+
+    def _marcar_enviado(self, cita_id: int, fecha_hora: datetime) -> bool:
+        query = """INSERT INTO recordatorios_enviados (cita_id, fecha_hora) VALUES (%s, %s)
+                   ON DUPLICATE KEY UPDATE fecha_hora = VALUES(fecha_hora), enviado_en = CURRENT_TIMESTAMP"""
+        return self.db.execute_query(query, (cita_id, fecha_hora)) is not None
+
+    # === DESPACHO ===
+
+    def pendientes(self, ahora: datetime = None) -> List[Dict]:
+        """Recordatorios que corresponde enviar: citas dentro de la anticipación aún no avisadas"""
+        ahora = ahora or datetime.now()
+        ventana = obtener_proximas(self.db).en_ventana(ahora, ahora + self.anticipacion)
+        if not ventana:
+            return []
+        enviados = self._ya_enviados([cita_id for _, cita_id, _, _ in ventana])
+        if enviados is None:
+            return []  # Sin saber qué se avisó, mejor esperar que avisar dos veces
+        # Una cita reprogramada cambia de fecha_hora y se vuelve a avisar
+        nuevas = [entrada for entrada in ventana if enviados.get(entrada[1]) != entrada[0]]
+        if not nuevas:
+            return []
+        pacientes = Paciente.buscar_por_ids(self.db, (paciente_id for _, _, paciente_id, _ in nuevas))
+        medicos = Medico.buscar_por_ids(self.db, (medico_id for _, _, _, medico_id in nuevas))
+        return [
+            {
+                'cita_id': cita_id,
+                'fecha_hora': fecha_hora,
+                'paciente': pacientes.get(paciente_id),
+                'medico': medicos.get(medico_id)
+            }
+            for fecha_hora, cita_id, paciente_id, medico_id in nuevas
+        ]
+
+    def despachar(self, ahora: datetime = None) -> int:
+        """Envía los recordatorios pendientes y retorna cuántos se enviaron"""
+        ahora = ahora or datetime.now()
+        with self._lock:
+            enviados = 0
+            for recordatorio in self.pendientes(ahora):
+                try:
+                    if self.enviar(recordatorio) is False:
+                        continue
+                except Exception as e:
+                    print(f"❌ Error al enviar recordatorio de la cita {recordatorio['cita_id']}: {e}")
+                    continue
+                if not self._marcar_enviado(recordatorio['cita_id'], recordatorio['fecha_hora']):
+                    print(f"⚠️ No se pudo registrar el recordatorio de la cita {recordatorio['cita_id']}; "
+                          f"podría enviarse de nuevo")
+                enviados += 1
+
+            # Las citas que ya empezaron salen del índice y del registro de avisos
+            obtener_proximas(self.db).extraer_vencidas(ahora)
+            self.db.execute_query("DELETE FROM recordatorios_enviados WHERE fecha_hora < %s", (ahora,))
+            return enviados
+
+    @staticmethod
+    def _imprimir(recordatorio: Dict) -> bool:
+        paciente = recordatorio['paciente'].nombre if recordatorio['paciente'] else 'N/A'
+        medico = recordatorio['medico'].nombre if recordatorio['medico'] else 'N/A'
+        fecha = recordatorio['fecha_hora'].strftime("%Y-%m-%d %H:%M")
+        print(f"🔔 Recordatorio: {paciente} tiene cita con {medico} el {fecha}")
+        return True
+
+    # === EJECUCIÓN EN SEGUNDO PLANO ===
+
+    def iniciar(self):
+        """Revisa los recordatorios cada `intervalo` segundos en un hilo aparte"""
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ciclo, name="recordatorios", daemon=True)
+        self._hilo.start()
+
+    def _ciclo(self):
+        while not self._detener.is_set():
+            try:
+                self.despachar()
+            except Exception as e:
+                print(f"❌ Error en el despachador de recordatorios: {e}")
+            self._detener.wait(self.intervalo)
+
+    def detener(self):
+        """Detiene el hilo de recordatorios"""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+            self._hilo = None
@@ -1,4 +1,6 @@
-from typing import List, Dict, Any
+import csv
+import os
+from typing import List, Dict, Any, Tuple
 import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
@@ -6,10 +8,14 @@ from models.database import Database
 from models.cita import Cita
 from models.paciente import Paciente
 from models.medico import Medico
+from models.calendario import obtener_calendario
+from models.estadisticas import obtener_resumen
 from services.cita_service import CitaService
 from services.paciente_service import PacienteService
 from services.medico_service import MedicoService
 
+COLUMNAS_REPORTE = ['ID_Cita', 'Fecha_Hora', 'Paciente', 'Médico', 'Especialidad', 'Estado', 'Motivo']
+
 class ReportesService:
     """Servicio para generar reportes y gráficos con pandas y matplotlib"""
     
@@ -19,34 +25,39 @@ class ReportesService:
         self.paciente_service = PacienteService(db)
         self.medico_service = MedicoService(db)
     
+    @staticmethod
+    def _fila_reporte(cita: Cita) -> Tuple:
+        """Valores de una cita en el orden de COLUMNAS_REPORTE"""
+        return (
+            cita.id,
+            cita.fecha_hora,
+            cita.paciente.nombre if cita.paciente else 'N/A',
+            cita.medico.nombre if cita.medico else 'N/A',
+            cita.medico.especialidad if cita.medico else 'N/A',
+            cita.estado,
+            cita.motivo
+        )
+    
     def generar_reporte_citas_general(self) -> pd.DataFrame:
-        """Genera un reporte general de todas las citas"""
-        citas = Cita.obtener_todas(self.db)
+        """Genera un reporte general de todas las citas (si la lectura falla lanza mysql.connector.Error)"""
+        # Las citas llegan del servidor por lotes y pasan directo al DataFrame,
+        # sin armar antes una lista de diccionarios y otra de objetos
+        with self.db.limite_consultas(1):
+            df = pd.DataFrame.from_records(
+                (self._fila_reporte(cita) for cita in Cita.iter_todas(self.db)),
+                columns=COLUMNAS_REPORTE
+            )
         
-        if not citas:
+        if df.empty:
             print("📭 No hay citas para generar reporte")
             return pd.DataFrame()
         
-        # Preparar datos para el DataFrame
-        datos = []
-        for cita in citas:
-            cita.cargar_detalles(self.db)
-            datos.append({
-                'ID_Cita': cita.id,
-                'Fecha_Hora': cita.fecha_hora,
-                'Paciente': cita.paciente.nombre if cita.paciente else 'N/A',
-                'Médico': cita.medico.nombre if cita.medico else 'N/A',
-                'Especialidad': cita.medico.especialidad if cita.medico else 'N/A',
-                'Estado': cita.estado,
-                'Motivo': cita.motivo
-            })
-        
-        df = pd.DataFrame(datos)
         return df
     
-    def generar_reporte_citas_por_medico(self, mostrar_grafico: bool = True):
-        """Genera reporte de citas por médico con gráficos"""
-        df = self.generar_reporte_citas_general()
+    def generar_reporte_citas_por_medico(self, mostrar_grafico: bool = True, df: pd.DataFrame = None):
+        """Genera reporte de citas por médico con gráficos (acepta el reporte general ya calculado)"""
+        if df is None:
+            df = self.generar_reporte_citas_general()
         
         if df.empty:
             return
@@ -72,9 +83,10 @@ class ReportesService:
             plt.tight_layout()
             plt.show()
     
-    def generar_reporte_citas_por_estado(self, mostrar_grafico: bool = True):
-        """Genera reporte de citas por estado con gráficos"""
-        df = self.generar_reporte_citas_general()
+    def generar_reporte_citas_por_estado(self, mostrar_grafico: bool = True, df: pd.DataFrame = None):
+        """Genera reporte de citas por estado con gráficos (acepta el reporte general ya calculado)"""
+        if df is None:
+            df = self.generar_reporte_citas_general()
         
         if df.empty:
             return
@@ -108,9 +120,10 @@ class ReportesService:
             plt.tight_layout()
             plt.show()
     
-    def generar_reporte_citas_por_especialidad(self, mostrar_grafico: bool = True):
-        """Genera reporte de citas por especialidad médica"""
-        df = self.generar_reporte_citas_general()
+    def generar_reporte_citas_por_especialidad(self, mostrar_grafico: bool = True, df: pd.DataFrame = None):
+        """Genera reporte de citas por especialidad médica (acepta el reporte general ya calculado)"""
+        if df is None:
+            df = self.generar_reporte_citas_general()
         
         if df.empty:
             return
@@ -141,7 +154,8 @@ class ReportesService:
             plt.tight_layout()
             plt.show()
     
-    def calcular_porcentaje_ocupacion_todos(self, fecha_inicio, fecha_fin, mostrar_grafico=True):
+    def calcular_porcentaje_ocupacion_todos(self, fecha_inicio, fecha_fin, mostrar_grafico=True) -> pd.DataFrame:
+        """Calcula la ocupación de todos los médicos con una sola consulta agregada"""
         print("\n" + "="*60)
         print("📊 PORCENTAJE DE OCUPACIÓN POR MÉDICO EN EL ULTIMO MES")
         print("="*60)
@@ -152,57 +166,50 @@ class ReportesService:
         fecha_inicio_dt = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
         fecha_fin_dt = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
 
-        # 1️⃣ Obtener todos los médicos
-        medicos = Medico.listar_todos(self.db)
-
-        resultados = []  # para gráfico
-
-        for medico in medicos:
-            citas = Cita.obtener_por_medico(self.db, medico.id)
-
-            # Filtrar citas por rango
-            citas_en_rango = [
-                c for c in citas 
-                if fecha_inicio_dt <= c.fecha_hora.date() <= fecha_fin_dt
-            ]
-
-            total_citas = len(citas_en_rango)
-            capacidad_maxima = 30
+        # 1️⃣ Conteo de citas por médico en el rango (GROUP BY en SQL)
+        df = pd.DataFrame(
+            Cita.contar_por_medico(self.db, fecha_inicio_dt, fecha_fin_dt),
+            columns=["medico_id", "medico", "citas"]
+        )
+        if df.empty:
+            print("📭 No hay médicos registrados")
+            return df
 
-            porcentaje = (total_citas / capacidad_maxima) * 100 if capacidad_maxima else 0
+        # 2️⃣ Capacidad y porcentaje calculados por columnas
+        df["citas"] = df["citas"].astype(int)
+        df["capacidad"] = obtener_calendario(self.db).capacidad(df["medico_id"], fecha_inicio_dt, fecha_fin_dt)
+        df["porcentaje"] = (df["citas"] / df["capacidad"] * 100).where(df["capacidad"] > 0, 0.0)
 
-            print(f"👨‍⚕️ Médico: {medico.nombre} ({medico.id})")
-            print(f"   📝 Total de citas: {total_citas}")
-            print(f"   📈 Ocupación: {porcentaje:.2f}%")
+        for fila in df.itertuples(index=False):
+            print(f"👨‍⚕️ Médico: {fila.medico} ({fila.medico_id})")
+            print(f"   📝 Total de citas: {fila.citas}")
+            print(f"   📈 Ocupación: {fila.porcentaje:.2f}%")
             print("-"*60)
 
-            # Guardamos para el gráfico
-            resultados.append({
-                "medico": medico.nombre,
-                "porcentaje": porcentaje
-            })
-
-        # 2️⃣ Mostrar gráfico si se pidió
-        if mostrar_grafico and resultados:
-            df = pd.DataFrame(resultados)
-
-            plt.figure(figsize=(12, 6))
-            plt.bar(df["medico"], df["porcentaje"], color="lightgreen", edgecolor="black")
-            plt.title("Porcentaje de Ocupación por Médico", fontsize=16, fontweight='bold')
-            plt.xlabel("Médico", fontsize=12)
-            plt.ylabel("Porcentaje de Ocupación (%)", fontsize=12)
-            plt.xticks(rotation=45, ha='right')
-            plt.grid(axis='y', alpha=0.3)
-            plt.tight_layout()
-            plt.show()
+        # 3️⃣ Mostrar gráfico si se pidió
+        if mostrar_grafico:
+            self.graficar_ocupacion(df)
 
-        return resultados
+        return df
 
+    def graficar_ocupacion(self, df: pd.DataFrame):
+        """Gráfico de barras de la ocupación por médico (debe llamarse desde el hilo de la interfaz)"""
+        if df.empty:
+            return
+        plt.figure(figsize=(12, 6))
+        plt.bar(df["medico"], df["porcentaje"], color="lightgreen", edgecolor="black")
+        plt.title("Porcentaje de Ocupación por Médico", fontsize=16, fontweight='bold')
+        plt.xlabel("Médico", fontsize=12)
+        plt.ylabel("Porcentaje de Ocupación (%)", fontsize=12)
+        plt.xticks(rotation=45, ha='right')
+        plt.grid(axis='y', alpha=0.3)
+        plt.tight_layout()
+        plt.show()
 
-    
-    def generar_reporte_tendencias_mensuales(self):
-        """Genera reporte de tendencias mensuales de citas"""
-        df = self.generar_reporte_citas_general()
+    def generar_reporte_tendencias_mensuales(self, df: pd.DataFrame = None):
+        """Genera reporte de tendencias mensuales de citas (acepta el reporte general ya calculado)"""
+        if df is None:
+            df = self.generar_reporte_citas_general()
         
         if df.empty:
             return
@@ -242,25 +249,32 @@ class ReportesService:
         self.generar_reporte_citas_por_especialidad(mostrar_grafico=True)
         
         # 4. Reporte de ocupación
-        self.calcular_porcentaje_ocupacion(medico_id=1, fecha_inicio=(datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d"), fecha_fin=datetime.now().strftime("%Y-%m-%d"))
+        self.calcular_porcentaje_ocupacion_todos(
+            fecha_inicio=(datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d"),
+            fecha_fin=datetime.now().strftime("%Y-%m-%d")
+        )
         
         # 5. Estadísticas adicionales
         self.mostrar_estadisticas_generales()
     
-    def mostrar_estadisticas_generales(self):
+    def obtener_estadisticas_generales(self) -> Dict[str, Any]:
+        """Calcula las estadísticas generales del sistema (sin imprimir ni graficar)"""
+        # Todas las cifras salen de agregados SQL en una sola consulta
+        return obtener_resumen(self.db, top_medicos=3)
+    
+    def mostrar_estadisticas_generales(self, estadisticas: Dict[str, Any] = None):
         """Muestra estadísticas generales del sistema"""
-        total_pacientes = self.paciente_service.contar_total_pacientes()
-        total_medicos = self.medico_service.contar_total_medicos()
-        total_citas = len(Cita.obtener_todas(self.db))
-        conteo_estados = self.cita_service.contar_citas_por_estado()
+        if estadisticas is None:
+            estadisticas = self.obtener_estadisticas_generales()
+        conteo_estados = estadisticas['conteo_estados']
         
         print("\n" + "="*50)
         print("📈 ESTADÍSTICAS GENERALES DEL SISTEMA")
         print("="*50)
-        print(f"👥 Total de pacientes: {total_pacientes}")
-        print(f"🩺 Total de médicos: {total_medicos}")
-        print(f"📅 Total de citas: {total_citas}")
-        print(f"🎯 Especialidades disponibles: {len(self.medico_service.obtener_especialidades_disponibles())}")
+        print(f"👥 Total de pacientes: {estadisticas['total_pacientes']}")
+        print(f"🩺 Total de médicos: {estadisticas['total_medicos']}")
+        print(f"📅 Total de citas: {estadisticas['total_citas']}")
+        print(f"🎯 Especialidades disponibles: {estadisticas['total_especialidades']}")
         
         if conteo_estados:
             print("\n📊 Distribución de citas:")
@@ -268,7 +282,7 @@ class ReportesService:
                 print(f"   • {estado.capitalize()}: {cantidad}")
         
         # Médicos más ocupados
-        medicos_ocupados = self.medico_service.obtener_medicos_mas_ocupados(limite=3)
+        medicos_ocupados = estadisticas['medicos_ocupados']
         if medicos_ocupados:
             print(f"\n🏆 Top 3 médicos más ocupados:")
             for i, item in enumerate(medicos_ocupados, 1):
@@ -290,11 +304,12 @@ class ReportesService:
             plt.tight_layout()
             plt.show()
 
-    def reporte_medicos_mas_ocupados(self):
+    def reporte_medicos_mas_ocupados(self, medicos_ocupados: List[Dict] = None):
         """Muestra los 3 médicos con más citas programadas y genera un gráfico de barras"""
 
         # Obtener datos
-        medicos_ocupados = self.medico_service.obtener_medicos_mas_ocupados(limite=3)
+        if medicos_ocupados is None:
+            medicos_ocupados = self.medico_service.obtener_medicos_mas_ocupados(limite=3)
 
         print("\n" + "="*60)
         print("🏆 REPORTE: MÉDICOS MÁS OCUPADOS (Solo citas programadas)")
@@ -333,6 +348,27 @@ class ReportesService:
         plt.tight_layout()
         plt.show()
     
+    def exportar_citas_csv(self, nombre_archivo: str = "reporte_citas.csv") -> int:
+        """Exporta todas las citas a CSV escribiendo cada fila a medida que llega (memoria constante)"""
+        try:
+            total = 0
+            with open(nombre_archivo, "w", newline="", encoding="utf-8") as archivo:
+                escritor = csv.writer(archivo)
+                escritor.writerow(COLUMNAS_REPORTE)
+                for cita in Cita.iter_todas(self.db):
+                    escritor.writerow(self._fila_reporte(cita))
+                    total += 1
+            
+            print(f"✅ {total} citas exportadas a: {nombre_archivo}")
+            return total
+            
+        except Exception as e:
+            print(f"❌ Error al exportar citas: {e}")
+            # Un CSV cortado a la mitad parecería una exportación completa
+            if os.path.exists(nombre_archivo):
+                os.remove(nombre_archivo)
+            raise e  # 🚨 Esto permite que la UI muestre el messagebox
+    
     def exportar_reporte_excel(self, nombre_archivo: str = "reporte_citas.xlsx"):
         """Exporta el reporte completo a Excel"""
         try:
@@ -0,0 +1,242 @@
+import threading
+import unittest
+from datetime import datetime, timedelta
+import mysql.connector
+from models.database import Database
+from models.cita import Cita
+from models.busqueda import IndiceNombres
+
+CANTIDAD_CITAS = 10000
+
+
+class CursorFalso:
+    """Cursor que responde según la tabla consultada y registra cada sentencia"""
+
+    def __init__(self, base):
+        self.base = base
+        self._filas = []
+        self.lastrowid = None
+
+    def execute(self, query, params=()):
+        self.base.sentencias.append(query)
+        if "innodb_autoinc_lock_mode" in query:
+            self._filas = [{'paso': self.base.paso_autoincremento, 'modo': self.base.modo_autoincremento}]
+        elif "FOR UPDATE" in query:
+            self._filas = [{'id': id} for id in self.base.solapadas]
+        elif query.lstrip().startswith("INSERT"):
+            self.lastrowid = self.base.generar_ids(1)[0]
+        elif "FROM citas c" in query:
+            self._filas = list(self.base.citas)
+        elif "FROM pacientes WHERE id IN" in query:
+            self._filas = [self.base.paciente(id) for id in params]
+        elif "FROM medicos WHERE id IN" in query:
+            self._filas = [self.base.medico(id) for id in params]
+        else:
+            self._filas = []
+
+    def executemany(self, query, lista_params):
+        self.base.sentencias.append(query)
+        self.lastrowid = self.base.generar_ids(len(lista_params))[0]
+
+    def fetchone(self):
+        return self._filas.pop(0) if self._filas else None
+
+    def fetchall(self):
+        filas, self._filas = self._filas, []
+        return filas
+
+    def fetchmany(self, cantidad):
+        if self.base.fallar_lectura:
+            raise mysql.connector.Error("conexión perdida")
+        filas, self._filas = self._filas[:cantidad], self._filas[cantidad:]
+        return filas
+
+    def close(self):
+        pass
+
+
+class ConexionFalsa:
+    unread_result = False
+
+    def __init__(self, base):
+        self.base = base
+
+    def cursor(self, dictionary=True, buffered=True):
+        return CursorFalso(self.base)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class BaseFalsa:
+    """Pool en memoria con CANTIDAD_CITAS citas repartidas entre 50 pacientes y 20 médicos"""
+
+    def __init__(self):
+        self.sentencias = []
+        self.paso_autoincremento = 1
+        self.modo_autoincremento = 1
+        self._ultimo_id = 0
+        self.solapadas = []
+        self.fallar_lectura = False
+        inicio = datetime(2024, 1, 1, 8, 0)
+        self.citas = [
+            {
+                'id': i, 'paciente_id': i % 50 + 1, 'medico_id': i % 20 + 1,
+                'fecha_hora': inicio + timedelta(minutes=30 * i), 'estado': 'programada',
+                'motivo': 'Control', 'duracion': 30,
+                'paciente_nombre': f"Paciente {i % 50 + 1}", 'medico_nombre': f"Médico {i % 20 + 1}",
+                'medico_especialidad': 'General'
+            }
+            for i in range(1, CANTIDAD_CITAS + 1)
+        ]
+
+    def generar_ids(self, cantidad):
+        """Ids de un INSERT; en modo intercalado otra sesión toma un id entre cada fila"""
+        salto = 2 if self.modo_autoincremento == 2 else 1
+        ids = [self._ultimo_id + self.paso_autoincremento * salto * (i + 1) for i in range(cantidad)]
+        self._ultimo_id = ids[-1]
+        return ids
+
+    @staticmethod
+    def paciente(id):
+        return {'id': id, 'nombre': f"Paciente {id}", 'email': f"p{id}@gmail.com",
+                'telefono': "900000000", 'fecha_nacimiento': None}
+
+    @staticmethod
+    def medico(id):
+        return {'id': id, 'nombre': f"Médico {id}", 'especialidad': 'General',
+                'telefono': "900000000", 'email': f"m{id}@gmail.com"}
+
+    def obtener(self):
+        return ConexionFalsa(self)
+
+    def devolver(self, conexion):
+        pass
+
+
+def base_de_prueba() -> Database:
+    """Database conectada a la base falsa (sin servidor MySQL)"""
+    db = Database.__new__(Database)
+    db.pool = BaseFalsa()
+    db._local = threading.local()
+    return db
+
+
+class TestCantidadConsultas(unittest.TestCase):
+    """Listar miles de citas con sus relaciones cuesta una cantidad fija de consultas"""
+
+    def test_obtener_todas_usa_una_consulta(self):
+        db = base_de_prueba()
+        with db.limite_consultas(1, estricto=True):
+            citas = Cita.obtener_todas(db)
+        self.assertEqual(len(citas), CANTIDAD_CITAS)
+        self.assertEqual(citas[0].paciente.nombre, "Paciente 2")
+
+    def test_iter_todas_usa_una_consulta(self):
+        db = base_de_prueba()
+        with db.limite_consultas(1, estricto=True):
+            total = sum(1 for _ in Cita.iter_todas(db, tamano_lote=500))
+        self.assertEqual(total, CANTIDAD_CITAS)
+
+    def test_iter_todas_lanza_si_la_lectura_falla(self):
+        db = base_de_prueba()
+        db.pool.fallar_lectura = True
+        with self.assertRaises(mysql.connector.Error):
+            list(Cita.iter_todas(db))
+
+    def test_cargar_detalles_lote_usa_una_consulta_por_entidad(self):
+        db = base_de_prueba()
+        citas = [Cita(id=fila['id'], paciente_id=fila['paciente_id'], medico_id=fila['medico_id'])
+                 for fila in db.pool.citas]
+        with db.limite_consultas(2, estricto=True):
+            Cita.cargar_detalles_lote(db, citas)
+        self.assertTrue(all(c.paciente is not None and c.medico is not None for c in citas))
+
+    def test_limite_estricto_falla_al_excederse(self):
+        db = base_de_prueba()
+        with self.assertRaises(AssertionError):
+            with db.limite_consultas(1, estricto=True):
+                for cita in Cita.obtener_todas(db)[:3]:
+                    cita.paciente = None
+                    cita.cargar_detalles(db)
+
+    def test_limite_sin_estricto_solo_avisa(self):
+        db = base_de_prueba()
+        with db.limite_consultas(0):
+            Cita.obtener_todas(db)
+        self.assertEqual(db.consultas_ejecutadas, 1)
+
+
+class TestPaginacionPorClave(unittest.TestCase):
+    """El token (fecha_hora, id) deja las citas sin fecha al final en ambos sentidos"""
+
+    def test_token_con_fecha_incluye_las_citas_sin_fecha(self):
+        fecha = datetime(2024, 1, 1, 8, 0)
+        query, params = Cita.consulta().despues_de((fecha, 5)).compilar()
+        self.assertIn("OR c.fecha_hora IS NULL", query)
+        self.assertEqual(params, (fecha, fecha, 5))
+
+    def test_token_sin_fecha_solo_recorre_las_citas_sin_fecha(self):
+        query, params = Cita.consulta().ordenar_por_fecha(descendente=False).despues_de((None, 5)).compilar()
+        self.assertIn("(c.fecha_hora IS NULL AND c.id > %s)", query)
+        self.assertIn("ORDER BY c.fecha_hora IS NULL, c.fecha_hora ASC, c.id ASC", query)
+        self.assertEqual(params, (5,))
+
+
+class TestCargaDeIndices(unittest.TestCase):
+    """Un índice cuya carga falla no queda marcado como cargado"""
+
+    def test_indice_de_nombres_reintenta_tras_un_fallo(self):
+        db = base_de_prueba()
+        indice = IndiceNombres(db, 'pacientes')
+        db.pool.fallar_lectura = True
+        self.assertEqual(indice.buscar("Paciente"), [])
+        self.assertFalse(indice._cargado)
+        db.pool.fallar_lectura = False
+        indice.buscar("Paciente")
+        self.assertTrue(indice._cargado)
+
+
+class TestEjecucionPorLotes(unittest.TestCase):
+    """execute_many retorna los ids reales de las filas insertadas"""
+
+    QUERY = "INSERT INTO pacientes (nombre) VALUES (%s)"
+
+    def test_ids_consecutivos_respetan_el_paso(self):
+        db = base_de_prueba()
+        db.pool.paso_autoincremento = 2
+        ids = db.execute_many(self.QUERY, [("a",), ("b",), ("c",)], tamano_lote=2)
+        self.assertEqual(ids, [2, 4, 6])
+
+    def test_modo_intercalado_inserta_de_a_una(self):
+        db = base_de_prueba()
+        db.pool.modo_autoincremento = 2
+        ids = db.execute_many(self.QUERY, [("a",), ("b",), ("c",)])
+        self.assertEqual(ids, [2, 4, 6])
+        self.assertEqual(db.pool.sentencias.count(self.QUERY), 3)
+
+    def test_al_final_recibe_los_ids(self):
+        db = base_de_prueba()
+        recibidos = []
+        ids = db.execute_many(self.QUERY, [("a",), ("b",)], al_final=lambda cursor, ids: recibidos.extend(ids))
+        self.assertEqual(recibidos, ids)
+
+
+class TestLoteDeCitas(unittest.TestCase):
+    """guardar_lote verifica los cruces de horario antes del commit"""
+
+    def test_un_cruce_rechaza_todo_el_lote(self):
+        db = base_de_prueba()
+        db.pool.solapadas = [7]
+        citas = [Cita(paciente_id=1, medico_id=1, fecha_hora=datetime(2024, 1, 1, 9, 0)),
+                 Cita(paciente_id=2, medico_id=1, fecha_hora=datetime(2024, 1, 1, 9, 30))]
+        self.assertEqual(Cita.guardar_lote(db, citas), [])
+        self.assertTrue(all(cita.id is None for cita in citas))
+        self.assertFalse(any("contadores_citas" in sentencia for sentencia in db.pool.sentencias))
+
+
+if __name__ == "__main__":
+    unittest.main()
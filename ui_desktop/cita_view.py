@@ -2,9 +2,12 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from tkcalendar import DateEntry
 from datetime import datetime
+from ui_desktop.tareas import EjecutorTareas
+from ui_desktop.tabla_virtual import TablaVirtual, FuentePaginada
 
 class CitaView(tk.Toplevel):
     """Ventana gráfica para gestionar citas"""
+    HORAS = [f"{hora:02d}:{minuto:02d}" for hora in range(7, 20) for minuto in (0, 30)]
 
     def __init__(self, parent, servicios):
         super().__init__(parent)
@@ -24,17 +27,11 @@ class CitaView(tk.Toplevel):
         form_frame = ttk.LabelFrame(self, text="Registrar Cita", padding=10)
         form_frame.pack(fill="x", padx=20, pady=10)
 
-        # Obtener pacientes y médicos
-        pacientes_lista = self.paciente_service.obtener_todos_pacientes()
-        medicos_lista = self.medico_service.obtener_todos_medicos()
-
-        # Diccionarios: nombre -> id
-        self.pacientes_dict = {p.nombre: p.id for p in pacientes_lista}
-        self.medicos_dict = {m.nombre: m.id for m in medicos_lista}
-
-        # Listas de nombres (para combobox)
-        pacientes = list(self.pacientes_dict.keys())
-        medicos = list(self.medicos_dict.keys())
+        # Diccionarios: nombre -> id (se llenan en segundo plano, ver cargar_opciones)
+        self.pacientes_dict = {}
+        self.medicos_dict = {}
+        pacientes = []
+        medicos = []
 
         # Campos del formulario
         ttk.Label(form_frame, text="Paciente:").grid(row=0, column=0, sticky="w", padx=5, pady=5)
@@ -49,6 +46,12 @@ class CitaView(tk.Toplevel):
         self.fecha_entry = DateEntry(form_frame, width=42, date_pattern="yyyy-mm-dd", mindate=datetime.today())
         self.fecha_entry.grid(row=2, column=1, pady=5)
 
+        # Hora del turno: sin ella todas las citas quedarían a las 00:00 y chocarían entre sí
+        ttk.Label(form_frame, text="Hora:").grid(row=2, column=2, sticky="w", padx=5, pady=5)
+        self.hora_cb = ttk.Combobox(form_frame, values=self.HORAS, state="readonly", width=8)
+        self.hora_cb.set("08:00")
+        self.hora_cb.grid(row=2, column=3, pady=5)
+
         ttk.Label(form_frame, text="Motivo de la cita:").grid(row=3, column=0, sticky="w", padx=5, pady=5)
         self.motivo_entry = ttk.Entry(form_frame, width=42)
         self.motivo_entry.grid(row=3, column=1, pady=5)
@@ -138,15 +141,32 @@ class CitaView(tk.Toplevel):
         tabla_frame = ttk.LabelFrame(self, text="Citas Registradas", padding=10)
         tabla_frame.pack(fill="both", expand=True, padx=20, pady=10)
 
-        columnas = ("id", "paciente", "medico", "fecha", "motivo", "estado")
-        self.tabla = ttk.Treeview(tabla_frame, columns=columnas, show="headings", height=12)
-
-        for col, width in zip(columnas, [60, 180, 180, 100, 100, 100]):
-            self.tabla.heading(col, text=col.capitalize())
-            self.tabla.column(col, width=width, anchor="center" if col in ["id","fecha","estado"] else "w")
-
+        # === Estado de las consultas en segundo plano ===
+        self.estado_tareas = ttk.Label(tabla_frame, text="")
+        self.tareas = EjecutorTareas(self, self.estado_tareas)
+
+        # Tabla virtualizada: solo se dibujan las filas visibles.
+        # Paciente y médico vienen del JOIN: sin consultas por fila
+        self.tabla = TablaVirtual(
+            tabla_frame,
+            columnas=("Id", "Paciente", "Medico", "Fecha", "Motivo", "Estado"),
+            anchos=[60, 180, 180, 100, 100, 100],
+            anclas={"Id": "center", "Fecha": "center", "Estado": "center"},
+            alto=12,
+            formatear=lambda c: (
+                c.id,
+                c.paciente.nombre if c.paciente else "N/A",
+                c.medico.nombre if c.medico else "N/A",
+                c.fecha_hora,
+                c.motivo,
+                c.estado
+            ),
+            tareas=self.tareas
+        )
         self.tabla.pack(fill="both", expand=True)
+        self.estado_tareas.pack()
 
+        self.cargar_opciones()
         self.cargar_citas()
 
     # === FUNCIONES ===
@@ -154,11 +174,12 @@ class CitaView(tk.Toplevel):
         try:
             paciente_nombre = self.paciente_cb.get()
             medico_nombre = self.medico_cb.get()
-            fecha_str = self.fecha_entry.get_date().strftime("%Y-%m-%d")
+            hora = self.hora_cb.get()
+            fecha_str = f'{self.fecha_entry.get_date().strftime("%Y-%m-%d")} {hora}'
             motivo = self.motivo_entry.get().strip()
 
             # Validaciones
-            if not paciente_nombre or not medico_nombre or not fecha_str or not motivo:
+            if not paciente_nombre or not medico_nombre or not hora or not motivo:
                 messagebox.showwarning("Atención", "Complete todos los campos.")
                 return
 
@@ -173,62 +194,61 @@ class CitaView(tk.Toplevel):
                 return
 
             # Registrar cita
-            self.cita_service.crear_cita(paciente_id, medico_id, fecha_str, motivo)
-            messagebox.showinfo("Éxito", "✅ Cita registrada correctamente.")
-            self.cargar_citas()
+            def terminado(cita):
+                if not cita:
+                    messagebox.showerror("Error", "❌ No se pudo registrar la cita. "
+                                                  "Verifique que el médico esté libre en ese horario.")
+                    return
+                messagebox.showinfo("Éxito", "✅ Cita registrada correctamente.")
+                self.cargar_citas()
+
+                # Limpiar campos
+                self.paciente_cb.set("")
+                self.medico_cb.set("")
+                self.motivo_entry.delete(0, tk.END)
 
-            # Limpiar campos
-            self.paciente_cb.set("")
-            self.medico_cb.set("")
-            self.motivo_entry.delete(0, tk.END)
+            self.tareas.ejecutar(self.cita_service.crear_cita, paciente_id, medico_id, fecha_str, motivo,
+                                 al_terminar=terminado)
 
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
+    def cargar_opciones(self):
+        """Carga en segundo plano los pacientes y médicos de los combobox"""
+        def obtener():
+            return (self.paciente_service.obtener_todos_pacientes(),
+                    self.medico_service.obtener_todos_medicos())
+
+        def terminado(resultado):
+            pacientes_lista, medicos_lista = resultado
+            self.pacientes_dict = {p.nombre: p.id for p in pacientes_lista}
+            self.medicos_dict = {m.nombre: m.id for m in medicos_lista}
+            pacientes = list(self.pacientes_dict.keys())
+            medicos = list(self.medicos_dict.keys())
+            self.paciente_cb.config(values=pacientes)
+            self.filtro_paciente_cb.config(values=pacientes)
+            self.medico_cb.config(values=medicos)
+            self.filtro_medico_cb.config(values=medicos)
+
+        self.tareas.ejecutar(obtener, al_terminar=terminado, clave="opciones")
+
     def cargar_citas(self):
-        for fila in self.tabla.get_children():
-            self.tabla.delete(fila)
-
-        citas = self.cita_service.obtener_todas_citas()
-        for c in citas:
-            medico = self.medico_service.obtener_medico_por_id(c.medico_id)
-            paciente = self.paciente_service.obtener_paciente_por_id(c.paciente_id)
-            self.tabla.insert(
-                "",
-                "end",
-                values=(c.id, paciente.nombre, medico.nombre, c.fecha_hora, c.motivo, c.estado)
-            )
+        # Solo se cuenta el total; las páginas se piden al servicio a medida que se desplaza la tabla
+        def terminado(total):
+            self.tabla.set_fuente(FuentePaginada(self.cita_service.obtener_pagina_citas, total))
 
-    def obtener_cita_seleccionada(self):
-        seleccion = self.tabla.selection()
-        if not seleccion:
-            return None
-        valores = self.tabla.item(seleccion[0], "values")
-        return int(valores[0])
+        self.tareas.ejecutar(self.cita_service.contar_total_citas, al_terminar=terminado, clave="tabla")
 
-    def cancelar_cita_ui(self):
-        cita_id = self.obtener_cita_seleccionada()
-        if not cita_id:
-            messagebox.showwarning("Atención", "Seleccione una cita.")
-            return
-        if messagebox.askyesno("Confirmar", "¿Estás seguro de cancelar esta cita?"):
-            if self.cita_service.cancelar_cita(cita_id):
-                messagebox.showinfo("Éxito", "La cita fue cancelada.")
-                self.cargar_citas()
-            else:
-                messagebox.showerror("Error", "No se pudo cancelar la cita.")
+    def buscar_filtradas(self, **filtros):
+        """Muestra las citas filtradas de a páginas, igual que el listado completo"""
+        def pagina(token, cantidad):
+            return self.cita_service.obtener_pagina_filtrada(token, cantidad, **filtros)
 
-    def marcar_completada(self):
-        cita_id = self.obtener_cita_seleccionada()
-        if not cita_id:
-            messagebox.showwarning("Atención", "Seleccione una cita.")
-            return
-        if messagebox.askyesno("Confirmar", "¿Marcar la cita como completada?"):
-            if self.cita_service.completar_cita(cita_id):
-                messagebox.showinfo("Éxito", "La cita fue marcada como completada.")
-                self.cargar_citas()
-            else:
-                messagebox.showerror("Error", "No se pudo actualizar el estado.")
+        def terminado(total):
+            self.tabla.set_fuente(FuentePaginada(pagina, total))
+
+        self.tareas.ejecutar(self.cita_service.contar_citas_filtradas, al_terminar=terminado,
+                             clave="tabla", **filtros)
 
     def buscar_por_estado(self):
         estado = self.estado_cb.get()
@@ -236,8 +256,7 @@ class CitaView(tk.Toplevel):
             messagebox.showwarning("Atención", "Seleccione un estado.")
             return
 
-        citas = self.cita_service.filtrar_citas_por_estado(estado)
-        self.mostrar_citas(citas)
+        self.buscar_filtradas(estado=estado)
 
     def buscar_por_medico(self):
         nombre = self.filtro_medico_cb.get()
@@ -245,9 +264,7 @@ class CitaView(tk.Toplevel):
             messagebox.showwarning("Atención", "Seleccione un médico.")
             return
 
-        medico_id = self.medicos_dict[nombre]
-        citas = self.cita_service.filtrar_citas_por_medico(medico_id)
-        self.mostrar_citas(citas)
+        self.buscar_filtradas(medico_id=self.medicos_dict[nombre])
 
     def buscar_por_paciente(self):
         nombre = self.filtro_paciente_cb.get()
@@ -255,9 +272,7 @@ class CitaView(tk.Toplevel):
             messagebox.showwarning("Atención", "Seleccione un paciente.")
             return
 
-        paciente_id = self.pacientes_dict[nombre]
-        citas = self.cita_service.filtrar_citas_por_paciente(paciente_id)
-        self.mostrar_citas(citas)
+        self.buscar_filtradas(paciente_id=self.pacientes_dict[nombre])
     
     def buscar_por_fecha(self):
         fecha = self.filtro_fecha_entry.get().strip()
@@ -265,8 +280,7 @@ class CitaView(tk.Toplevel):
             messagebox.showwarning("Atención", "Ingrese una fecha.")
             return
 
-        citas = self.cita_service.filtrar_citas_por_fecha(fecha)
-        self.mostrar_citas(citas)
+        self.buscar_filtradas(fecha=fecha)
 
     def buscar_por_rango(self):
         inicio = self.fecha_inicio_entry.get().strip()
@@ -276,40 +290,11 @@ class CitaView(tk.Toplevel):
             messagebox.showwarning("Atención", "Ingrese ambas fechas.")
             return
 
-        citas = self.cita_service.filtrar_citas_por_rango_fechas(inicio, fin)
-        self.mostrar_citas(citas)
-
-    
-
-    def mostrar_citas(self, citas):
-        # Limpia la tabla
-        for fila in self.tabla.get_children():
-            self.tabla.delete(fila)
-
-        for c in citas:
-            medico = self.medico_service.obtener_medico_por_id(c.medico_id)
-            paciente = self.paciente_service.obtener_paciente_por_id(c.paciente_id)
-
-            self.tabla.insert(
-                "",
-                "end",
-                values=(
-                    c.id,
-                    paciente,
-                    medico,
-                    c.fecha_hora,
-                    c.motivo,
-                    c.estado
-                )
-            )
+        self.buscar_filtradas(fecha_inicio=inicio, fecha_fin=fin)
 
     def obtener_cita_seleccionada(self):
-        seleccion = self.tabla.selection()
-        if not seleccion:
-            return None
-
-        valores = self.tabla.item(seleccion[0], "values")
-        return int(valores[0])  # El primer valor es el ID
+        cita = self.tabla.registro_seleccionado()
+        return cita.id if cita is not None else None
 
 
     def cancelar_cita_ui(self):
@@ -327,11 +312,14 @@ class CitaView(tk.Toplevel):
         if not confirmado:
             return
 
-        if self.cita_service.cancelar_cita(cita_id):
-            messagebox.showinfo("Éxito", "La cita fue cancelada.")
-            self.cargar_citas()
-        else:
-            messagebox.showerror("Error", "No se pudo cancelar la cita.")
+        def terminado(cancelada):
+            if cancelada:
+                messagebox.showinfo("Éxito", "La cita fue cancelada.")
+                self.cargar_citas()
+            else:
+                messagebox.showerror("Error", "No se pudo cancelar la cita.")
+
+        self.tareas.ejecutar(self.cita_service.cancelar_cita, cita_id, al_terminar=terminado)
 
     def marcar_completada(self):
         cita_id = self.obtener_cita_seleccionada()
@@ -348,11 +336,14 @@ class CitaView(tk.Toplevel):
         if not confirmado:
             return
 
-        if self.cita_service.completar_cita(cita_id):
-            messagebox.showinfo("Éxito", "La cita fue marcada como completada.")
-            self.cargar_citas()
-        else:
-            messagebox.showerror("Error", "No se pudo actualizar el estado.")
+        def terminado(completada):
+            if completada:
+                messagebox.showinfo("Éxito", "La cita fue marcada como completada.")
+                self.cargar_citas()
+            else:
+                messagebox.showerror("Error", "No se pudo actualizar el estado.")
+
+        self.tareas.ejecutar(self.cita_service.completar_cita, cita_id, al_terminar=terminado)
 
     def quitar_filtros(self):
         # Limpiar campos de filtros
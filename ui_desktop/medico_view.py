@@ -1,5 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+from ui_desktop.tareas import EjecutorTareas
+from ui_desktop.tabla_virtual import TablaVirtual, FuentePaginada
 
 class MedicoView(tk.Toplevel):
     """Ventana gráfica para gestionar médicos con Tkinter"""
@@ -74,13 +76,22 @@ class MedicoView(tk.Toplevel):
         ttk.Button(search_frame, text="Mostrar Todos", command=self.cargar_medicos).grid(row=0, column=5, padx=10, pady=5)
 
         # === Tabla ===
-        self.tabla = ttk.Treeview(self, columns=("ID", "Nombre", "Especialidad", "Teléfono", "Email"), show="headings")
-        for col in ("ID", "Nombre", "Especialidad", "Teléfono", "Email"):
-            self.tabla.heading(col, text=col)
-            self.tabla.column(col, width=150 if col != "ID" else 60)
-
+        # === Estado de las consultas en segundo plano ===
+        self.estado_tareas = ttk.Label(self, text="")
+        self.tareas = EjecutorTareas(self, self.estado_tareas)
+
+        # Tabla virtualizada: solo se dibujan las filas visibles
+        self.tabla = TablaVirtual(
+            self,
+            columnas=("ID", "Nombre", "Especialidad", "Teléfono", "Email"),
+            anchos=[60, 150, 150, 150, 150],
+            formatear=lambda m: (m.id, m.nombre, m.especialidad or "N/A",
+                                 m.telefono or "N/A", m.email or "N/A"),
+            tareas=self.tareas
+        )
         self.tabla.pack(fill="both", expand=True, padx=20, pady=10)
-        self.tabla.bind("<<TreeviewSelect>>", self.seleccionar_medico)
+        self.tabla.al_seleccionar(self.seleccionar_medico)
+        self.estado_tareas.pack(pady=(0, 5))
 
         self.cargar_medicos()
 
@@ -108,16 +119,16 @@ class MedicoView(tk.Toplevel):
             messagebox.showwarning("Atención", "El teléfono debe comenzar con 9 y tener 9 dígitos.")
             return
 
-        try:
-            medico = self.medico_service.crear_medico(nombre, especialidad, telefono, email)
+        def terminado(medico):
             if medico:
                 messagebox.showinfo("Éxito", "Médico registrado correctamente.")
                 self.cargar_medicos()
                 self.limpiar_campos()
             else:
                 messagebox.showerror("Error", "No se pudo registrar el médico.")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+
+        self.tareas.ejecutar(self.medico_service.crear_medico, nombre, especialidad, telefono, email,
+                             al_terminar=terminado)
 
     def actualizar_medico(self):
         if not hasattr(self, "id_seleccionado"):
@@ -142,29 +153,30 @@ class MedicoView(tk.Toplevel):
             messagebox.showwarning("Atención", "El teléfono debe comenzar con 9 y tener 9 dígitos.")
             return
 
-        try:
-            actualizado = self.medico_service.actualizar_medico(self.id_seleccionado, **campos)
+        def terminado(actualizado):
             if actualizado:
                 messagebox.showinfo("Éxito", "Médico actualizado correctamente.")
                 self.cargar_medicos()
                 self.limpiar_campos()
             else:
                 messagebox.showerror("Error", "No se pudo actualizar el médico.")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+
+        self.tareas.ejecutar(self.medico_service.actualizar_medico, self.id_seleccionado, **campos,
+                             al_terminar=terminado)
 
     def eliminar_medico(self):
         if not hasattr(self, "id_seleccionado"):
             messagebox.showwarning("Atención", "Seleccione un médico de la lista.")
             return
         if messagebox.askyesno("Confirmar", "¿Seguro que desea eliminar este médico?"):
-            try:
-                if self.medico_service.eliminar_medico(self.id_seleccionado):
+            def terminado(eliminado):
+                if eliminado:
                     messagebox.showinfo("Éxito", "Médico eliminado.")
                     self.cargar_medicos()
                     self.limpiar_campos()
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+
+            self.tareas.ejecutar(self.medico_service.eliminar_medico, self.id_seleccionado,
+                                 al_terminar=terminado)
 
     # === Búsqueda ===
     def buscar_medico(self):
@@ -174,58 +186,49 @@ class MedicoView(tk.Toplevel):
             messagebox.showwarning("Atención", "Ingrese un valor para buscar.")
             return
 
-        try:
-            resultados = []
+        def buscar():
+            # Se ejecuta en segundo plano
             if tipo == "Nombre":
-                resultados = self.medico_service.buscar_medicos_por_nombre(valor)
-            elif tipo == "Especialidad":
-                resultados = self.medico_service.buscar_medicos_por_especialidad(valor)
-            elif tipo == "Gmail":
+                return self.medico_service.buscar_medicos_por_nombre(valor)
+            if tipo == "Especialidad":
+                return self.medico_service.buscar_medicos_por_especialidad(valor)
+            medico = None
+            if tipo == "Gmail":
                 medico = self.medico_service.buscar_medico_por_email(valor)
-                if medico:
-                    resultados = [medico]
             elif tipo == "Teléfono":
                 medico = self.medico_service.buscar_medico_por_telefono(valor)
-                if medico:
-                    resultados = [medico]
-
-            # Limpiar tabla
-            for item in self.tabla.get_children():
-                self.tabla.delete(item)
+            return [medico] if medico else []
 
+        def terminado(resultados):
+            self.mostrar_medicos(resultados)
             if not resultados:
-                self.tabla.insert("", "end", values=("", "⚠️ No se encontraron médicos.", "", "", ""))
-                return
+                messagebox.showinfo("Sin resultados", "⚠️ No se encontraron médicos.")
 
-            for m in resultados:
-                self.tabla.insert("", "end", values=(m.id, m.nombre, m.especialidad or "N/A",
-                                                     m.telefono or "N/A", m.email or "N/A"))
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        self.tareas.ejecutar(buscar, al_terminar=terminado, clave="tabla")
 
     def seleccionar_medico(self, event):
-        seleccion = self.tabla.focus()
-        if not seleccion:
-            return
-        valores = self.tabla.item(seleccion, "values")
-        if valores:
-            self.id_seleccionado = int(valores[0])
+        medico = self.tabla.registro_seleccionado()  # None si la fila aún se está cargando
+        if medico is not None:
+            self.id_seleccionado = medico.id
             self.nombre.delete(0, tk.END)
             self.telefono.delete(0, tk.END)
             self.email.delete(0, tk.END)
             
-            self.nombre.insert(0, valores[1])
-            self.especialidad.set(valores[2])
-            self.telefono.insert(0, valores[3])
-            self.email.insert(0, valores[4])
+            self.nombre.insert(0, medico.nombre)
+            self.especialidad.set(medico.especialidad or "")
+            self.telefono.insert(0, medico.telefono or "")
+            self.email.insert(0, medico.email or "")
 
     def cargar_medicos(self):
-        for item in self.tabla.get_children():
-            self.tabla.delete(item)
-        medicos = self.medico_service.obtener_todos_medicos()
-        for m in medicos:
-            self.tabla.insert("", "end", values=(m.id, m.nombre, m.especialidad or "N/A",
-                                                 m.telefono or "N/A", m.email or "N/A"))
+        # Solo se cuenta el total; las páginas se piden al servicio a medida que se desplaza la tabla
+        def terminado(total):
+            self.tabla.set_fuente(FuentePaginada(self.medico_service.obtener_pagina_medicos, total))
+
+        self.tareas.ejecutar(self.medico_service.contar_total_medicos,
+                             al_terminar=terminado, clave="tabla")
+
+    def mostrar_medicos(self, medicos):
+        self.tabla.mostrar(medicos)
 
     def limpiar_campos(self):
         self.nombre.delete(0, tk.END)
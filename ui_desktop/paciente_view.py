@@ -2,9 +2,13 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
 from tkcalendar import DateEntry  # Importamos el selector de fechas
+from ui_desktop.tareas import EjecutorTareas
+from ui_desktop.tabla_virtual import TablaVirtual, FuentePaginada
 
 class PacienteView(tk.Toplevel):
     """Ventana gráfica para gestionar pacientes con Tkinter"""
+    TAMANO_PAGINA_HISTORIAL = 100
+
     def __init__(self, parent, paciente_service):
         super().__init__(parent)
         self.title("Gestión de Pacientes")
@@ -62,14 +66,22 @@ class PacienteView(tk.Toplevel):
         ttk.Button(search_frame, text="Buscar", command=self.buscar_paciente).grid(row=0, column=4, padx=5)
         ttk.Button(search_frame, text="Mostrar Todos", command=self.cargar_pacientes).grid(row=0, column=5, padx=5)
 
-        # === Tabla de pacientes ===
-        self.tabla = ttk.Treeview(self, columns=("ID", "Nombre", "Email", "Teléfono", "Fecha Nacimiento"), show="headings")
-        for col in ("ID", "Nombre", "Email", "Teléfono", "Fecha Nacimiento"):
-            self.tabla.heading(col, text=col)
-            self.tabla.column(col, width=150 if col != "ID" else 60)
-
+        # === Estado de las consultas en segundo plano ===
+        self.estado_tareas = ttk.Label(self, text="")
+        self.tareas = EjecutorTareas(self, self.estado_tareas)
+
+        # === Tabla de pacientes (solo se dibujan las filas visibles) ===
+        self.tabla = TablaVirtual(
+            self,
+            columnas=("ID", "Nombre", "Email", "Teléfono", "Fecha Nacimiento"),
+            anchos=[60, 150, 150, 150, 150],
+            formatear=lambda p: (p.id, p.nombre, p.email or "N/A",
+                                 p.telefono or "N/A", p.fecha_nacimiento or "N/A"),
+            tareas=self.tareas
+        )
         self.tabla.pack(fill="both", expand=True, padx=20, pady=10)
-        self.tabla.bind("<<TreeviewSelect>>", self.seleccionar_paciente)
+        self.tabla.al_seleccionar(self.seleccionar_paciente)
+        self.estado_tareas.pack(pady=(0, 5))
 
         self.cargar_pacientes()
 
@@ -100,16 +112,16 @@ class PacienteView(tk.Toplevel):
             return
 
         # === CREAR PACIENTE ===
-        try:
-            paciente = self.paciente_service.crear_paciente(nombre, email, telefono, fecha_nac)
+        def terminado(paciente):
             if paciente:
                 messagebox.showinfo("Éxito", "Paciente registrado correctamente.")
                 self.cargar_pacientes()
                 self.limpiar_campos()
             else:
                 messagebox.showerror("Error", "No se pudo registrar el paciente.")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+
+        self.tareas.ejecutar(self.paciente_service.crear_paciente, nombre, email, telefono, fecha_nac,
+                             al_terminar=terminado)
 
     def actualizar_paciente(self):
         if not hasattr(self, "id_seleccionado"):
@@ -134,29 +146,30 @@ class PacienteView(tk.Toplevel):
             messagebox.showwarning("Atención", "El teléfono debe comenzar con 9 y tener 9 dígitos.")
             return
 
-        try:
-            actualizado = self.paciente_service.actualizar_paciente(self.id_seleccionado, **campos)
+        def terminado(actualizado):
             if actualizado:
                 messagebox.showinfo("Éxito", "Paciente actualizado correctamente.")
                 self.cargar_pacientes()
                 self.limpiar_campos()
             else:
                 messagebox.showerror("Error", "No se pudo actualizar el paciente.")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+
+        self.tareas.ejecutar(self.paciente_service.actualizar_paciente, self.id_seleccionado, **campos,
+                             al_terminar=terminado)
 
     def eliminar_paciente(self):
         if not hasattr(self, "id_seleccionado"):
             messagebox.showwarning("Atención", "Seleccione un paciente de la lista.")
             return
         if messagebox.askyesno("Confirmar", "¿Seguro que desea eliminar este paciente?"):
-            try:
-                if self.paciente_service.eliminar_paciente(self.id_seleccionado):
+            def terminado(eliminado):
+                if eliminado:
                     messagebox.showinfo("Éxito", "Paciente eliminado.")
                     self.cargar_pacientes()
                     self.limpiar_campos()
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+
+            self.tareas.ejecutar(self.paciente_service.eliminar_paciente, self.id_seleccionado,
+                                 al_terminar=terminado)
 
     def buscar_paciente(self):
         tipo = self.tipo_busqueda.get()
@@ -165,39 +178,39 @@ class PacienteView(tk.Toplevel):
             messagebox.showwarning("Atención", "Ingrese un valor de búsqueda.")
             return
 
-        try:
-            resultados = []
+        def buscar():
+            # Se ejecuta en segundo plano
             if tipo == "Nombre":
-                resultados = self.paciente_service.buscar_pacientes_por_nombre(valor)
-            elif tipo == "Email":
+                return self.paciente_service.buscar_pacientes_por_nombre(valor)
+            paciente = None
+            if tipo == "Email":
                 paciente = self.paciente_service.buscar_paciente_por_email(valor)
-                if paciente:
-                    resultados = [paciente]
             elif tipo == "Teléfono":
                 paciente = self.paciente_service.buscar_paciente_por_telefono(valor)
-                if paciente:
-                    resultados = [paciente]
+            return [paciente] if paciente else []
 
-            # Mostrar resultados
-            for item in self.tabla.get_children():
-                self.tabla.delete(item)
+        def terminado(resultados):
+            self.mostrar_pacientes(resultados)
             if not resultados:
                 messagebox.showinfo("Sin resultados", "No se encontraron pacientes con ese criterio.")
-                return
-            for p in resultados:
-                self.tabla.insert("", "end", values=(p.id, p.nombre, p.email or "N/A",
-                                                     p.telefono or "N/A", p.fecha_nacimiento or "N/A"))
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+
+        self.tareas.ejecutar(buscar, al_terminar=terminado, clave="tabla")
 
     def ver_historial_citas(self):
         if not hasattr(self, "id_seleccionado"):
             messagebox.showwarning("Atención", "Seleccione un paciente.")
             return
 
+        paciente_id = self.id_seleccionado
+        self.tareas.ejecutar(self.paciente_service.obtener_historial_paginado, paciente_id,
+                             self.TAMANO_PAGINA_HISTORIAL,
+                             al_terminar=lambda resultado: self.mostrar_historial_citas(paciente_id, resultado),
+                             clave="historial")
+
+    def mostrar_historial_citas(self, paciente_id, resultado):
         try:
-            historial = self.paciente_service.obtener_historial_citas_paciente(self.id_seleccionado)
-            if not historial:
+            citas, siguiente, resumen = resultado
+            if not resumen or not resumen['total_citas']:
                 messagebox.showinfo("Sin datos", "El paciente no tiene citas registradas.")
                 return
 
@@ -205,42 +218,52 @@ class PacienteView(tk.Toplevel):
             ventana.title("Historial de Citas")
             ventana.geometry("600x400")
 
-            tree = ttk.Treeview(ventana, columns=("Fecha", "Médico", "Especialidad", "Estado", "Motivo"), show="headings")
-            for col in ("Fecha", "Médico", "Especialidad", "Estado", "Motivo"):
-                tree.heading(col, text=col)
-                tree.column(col, width=120)
-
-            for c in historial:
-                tree.insert("", "end", values=(c["fecha_hora"], c["medico"], c["especialidad"], c["estado"], c["motivo"]))
-
-            tree.pack(fill="both", expand=True, padx=10, pady=10)
+            ultima = resumen['ultima_visita'].strftime("%Y-%m-%d") if resumen['ultima_visita'] else "N/A"
+            texto = (f"Citas: {resumen['total_citas']}   Visitas: {resumen['visitas']}   "
+                     f"Última visita: {ultima}\nMédicos: {', '.join(resumen['medicos']) or 'N/A'}")
+            ttk.Label(ventana, text=texto, justify="left", wraplength=570).pack(anchor="w", padx=10, pady=(10, 0))
+
+            # La primera página ya llegó con el resumen; las demás se piden al desplazarse
+            tareas = EjecutorTareas(ventana)
+            tabla = TablaVirtual(
+                ventana,
+                columnas=("Fecha", "Médico", "Especialidad", "Estado", "Motivo"),
+                anchos=[120] * 5,
+                formatear=lambda c: (c["fecha_hora"], c["medico"], c["especialidad"], c["estado"], c["motivo"]),
+                tareas=tareas
+            )
+            tabla.pack(fill="both", expand=True, padx=10, pady=10)
+            tabla.set_fuente(FuentePaginada(
+                lambda token, cantidad: self.paciente_service.obtener_pagina_historial(paciente_id, token, cantidad),
+                resumen['total_citas'], self.TAMANO_PAGINA_HISTORIAL, primera_pagina=(citas, siguiente)
+            ))
 
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
     def seleccionar_paciente(self, event):
-        seleccion = self.tabla.focus()
-        if not seleccion:
-            return
-        valores = self.tabla.item(seleccion, "values")
-        if valores:
-            self.id_seleccionado = int(valores[0])
+        paciente = self.tabla.registro_seleccionado()  # None si la fila aún se está cargando
+        if paciente is not None:
+            self.id_seleccionado = paciente.id
             self.nombre.delete(0, tk.END)
             self.email.delete(0, tk.END)
             self.telefono.delete(0, tk.END)
-            self.fecha_nacimiento.set_date(valores[4])  # Asignar fecha al DateEntry
+            self.fecha_nacimiento.set_date(paciente.fecha_nacimiento or datetime.today())  # Asignar fecha al DateEntry
 
-            self.nombre.insert(0, valores[1])
-            self.email.insert(0, valores[2])
-            self.telefono.insert(0, valores[3])
+            self.nombre.insert(0, paciente.nombre)
+            self.email.insert(0, paciente.email or "")
+            self.telefono.insert(0, paciente.telefono or "")
 
     def cargar_pacientes(self):
-        for item in self.tabla.get_children():
-            self.tabla.delete(item)
-        pacientes = self.paciente_service.obtener_todos_pacientes()
-        for p in pacientes:
-            self.tabla.insert("", "end", values=(p.id, p.nombre, p.email or "N/A",
-                                                 p.telefono or "N/A", p.fecha_nacimiento or "N/A"))
+        # Solo se cuenta el total; las páginas se piden al servicio a medida que se desplaza la tabla
+        def terminado(total):
+            self.tabla.set_fuente(FuentePaginada(self.paciente_service.obtener_pagina_pacientes, total))
+
+        self.tareas.ejecutar(self.paciente_service.contar_total_pacientes,
+                             al_terminar=terminado, clave="tabla")
+
+    def mostrar_pacientes(self, pacientes):
+        self.tabla.mostrar(pacientes)
 
     def limpiar_campos(self):
         self.nombre.delete(0, tk.END)
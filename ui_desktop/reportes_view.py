@@ -2,6 +2,8 @@ from datetime import datetime, timedelta
 import tkinter as tk
 from tkinter import ttk, messagebox
 from services.reportes_service import ReportesService
+from ui_desktop.tareas import EjecutorTareas
+from ui_desktop.tabla_virtual import TablaVirtual, FuenteDataFrame
 
 class ReporteView(tk.Toplevel):
 
@@ -68,6 +70,16 @@ class ReporteView(tk.Toplevel):
         )
         btn_exportar.pack(fill="x", pady=5)
 
+        ttk.Button(
+            frame, text="📄 Exportar Citas a CSV",
+            command=self.exportar_csv
+        ).pack(fill="x", pady=5)
+
+        # Las consultas y cálculos corren en segundo plano; los gráficos se dibujan en el hilo de Tk
+        self.estado_tareas = ttk.Label(self, text="")
+        self.estado_tareas.pack()
+        self.tareas = EjecutorTareas(self, self.estado_tareas)
+
         ttk.Button(
             self, text="❌ Cerrar", command=self.destroy
         ).pack(pady=10)
@@ -80,66 +92,116 @@ class ReporteView(tk.Toplevel):
         ventana.title(titulo)
         ventana.geometry("900x500")
 
-        tree = ttk.Treeview(ventana, show="headings")
-        tree.pack(fill="both", expand=True)
-
-        # columnas
-        tree["columns"] = list(df.columns)
-
-        for col in df.columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=150)
-
-        # filas
-        for _, fila in df.iterrows():
-            tree.insert("", "end", values=list(fila))
+        # Solo se convierten a filas las que están a la vista
+        tabla = TablaVirtual(ventana, columnas=list(df.columns), alto=20)
+        tabla.pack(fill="both", expand=True)
+        tabla.set_fuente(FuenteDataFrame(df))
 
         ttk.Button(ventana, text="Cerrar", command=ventana.destroy).pack(pady=10)
     # =======================
     #     CONTROLADORES
     # =======================
 
+    def _con_reporte_general(self, al_terminar):
+        """Calcula el reporte general en segundo plano y se lo pasa a al_terminar"""
+        self.tareas.ejecutar(self.reportes_service.generar_reporte_citas_general,
+                             al_terminar=al_terminar, clave="reporte")
+
     def reporte_general(self):
-        df = self.reportes_service.generar_reporte_citas_general()
-        if df.empty:
-            messagebox.showwarning("Sin datos", "No existen citas registradas.")
-            return
-        self.mostrar_dataframe(df, "Reporte General de Citas")
+        def terminado(df):
+            if df.empty:
+                messagebox.showwarning("Sin datos", "No existen citas registradas.")
+                return
+            self.mostrar_dataframe(df, "Reporte General de Citas")
+
+        self._con_reporte_general(terminado)
 
     def reporte_por_medico(self):
-        self.reportes_service.generar_reporte_citas_por_medico(mostrar_grafico=True)
+        self._con_reporte_general(
+            lambda df: self.reportes_service.generar_reporte_citas_por_medico(mostrar_grafico=True, df=df)
+        )
 
     def reporte_por_estado(self):
-        self.reportes_service.generar_reporte_citas_por_estado(mostrar_grafico=True)
+        self._con_reporte_general(
+            lambda df: self.reportes_service.generar_reporte_citas_por_estado(mostrar_grafico=True, df=df)
+        )
 
     def reporte_por_especialidad(self):
-        self.reportes_service.generar_reporte_citas_por_especialidad(mostrar_grafico=True)
+        self._con_reporte_general(
+            lambda df: self.reportes_service.generar_reporte_citas_por_especialidad(mostrar_grafico=True, df=df)
+        )
 
     def reporte_ocupacion(self):
         fecha_inicio = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
         fecha_fin = datetime.now().strftime("%Y-%m-%d")
 
-        self.reportes_service.calcular_porcentaje_ocupacion_todos(
+        self.tareas.ejecutar(
+            self.reportes_service.calcular_porcentaje_ocupacion_todos,
             fecha_inicio,
-            fecha_fin
+            fecha_fin,
+            mostrar_grafico=False,
+            al_terminar=self.reportes_service.graficar_ocupacion,
+            clave="reporte"
         )
 
     def reporte_tendencias(self):
-        self.reportes_service.generar_reporte_tendencias_mensuales()
+        self._con_reporte_general(
+            lambda df: self.reportes_service.generar_reporte_tendencias_mensuales(df=df)
+        )
 
     def estadisticas_generales(self):
-        self.reportes_service.mostrar_estadisticas_generales()
+        self.tareas.ejecutar(self.reportes_service.obtener_estadisticas_generales,
+                             al_terminar=self.reportes_service.mostrar_estadisticas_generales,
+                             clave="reporte")
 
     def reporte_completo(self):
-        self.reportes_service.generar_reporte_completo()
+        fecha_inicio = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+        fecha_fin = datetime.now().strftime("%Y-%m-%d")
+
+        def calcular():
+            # Se ejecuta en segundo plano: solo datos, sin gráficos
+            return (
+                self.reportes_service.generar_reporte_citas_general(),
+                self.reportes_service.calcular_porcentaje_ocupacion_todos(fecha_inicio, fecha_fin,
+                                                                          mostrar_grafico=False),
+                self.reportes_service.obtener_estadisticas_generales()
+            )
+
+        def terminado(resultado):
+            df, df_ocupacion, estadisticas = resultado
+            self.reportes_service.generar_reporte_citas_por_estado(mostrar_grafico=True, df=df)
+            self.reportes_service.generar_reporte_citas_por_medico(mostrar_grafico=True, df=df)
+            self.reportes_service.generar_reporte_citas_por_especialidad(mostrar_grafico=True, df=df)
+            self.reportes_service.graficar_ocupacion(df_ocupacion)
+            self.reportes_service.mostrar_estadisticas_generales(estadisticas)
+
+        self.tareas.ejecutar(calcular, al_terminar=terminado, clave="reporte")
     
     def medicos_mas_ocupados(self):
-        self.reportes_service.reporte_medicos_mas_ocupados()
+        self.tareas.ejecutar(self.reportes_service.medico_service.obtener_medicos_mas_ocupados, limite=3,
+                             al_terminar=self.reportes_service.reporte_medicos_mas_ocupados,
+                             clave="reporte")
 
     def exportar_excel(self):
-        try:
-            nombre = "reporte_citas.xlsx"
-            self.reportes_service.exportar_reporte_excel(nombre)
-            messagebox.showinfo("Exportado", f"Archivo generado:\n{nombre}")
-        except Exception as e:
+        nombre = "reporte_citas.xlsx"
+
+        def fallido(e):
+            messagebox.showerror("Error", f"No se pudo exportar el archivo:\n{e}")
+
+        self.tareas.ejecutar(
+            self.reportes_service.exportar_reporte_excel, nombre,
+            al_terminar=lambda _: messagebox.showinfo("Exportado", f"Archivo generado:\n{nombre}"),
+            al_fallar=fallido
+        )
+
+    def exportar_csv(self):
+        nombre = "reporte_citas.csv"
+
+        def fallido(e):
             messagebox.showerror("Error", f"No se pudo exportar el archivo:\n{e}")
+
+        self.tareas.ejecutar(
+            self.reportes_service.exportar_citas_csv, nombre,
+            al_terminar=lambda total: messagebox.showinfo("Exportado", f"{total} citas exportadas a:\n{nombre}"),
+            al_fallar=fallido
+        )
@@ -0,0 +1,256 @@
+import threading
+from collections import OrderedDict
+from tkinter import ttk
+
+class FuenteLista:
+    """Fuente de filas en memoria (resultados de búsqueda ya cargados)"""
+
+    def __init__(self, registros):
+        self.registros = registros
+
+    def total(self) -> int:
+        return len(self.registros)
+
+    def obtener(self, inicio: int, cantidad: int) -> list:
+        return list(self.registros[inicio:inicio + cantidad])
+
+    def paginas_faltantes(self, inicio: int, cantidad: int) -> list:
+        return []
+
+
+class FuenteDataFrame(FuenteLista):
+    """Fuente sobre un DataFrame: solo convierte a tuplas las filas visibles"""
+
+    def obtener(self, inicio: int, cantidad: int) -> list:
+        return list(self.registros.iloc[inicio:inicio + cantidad].itertuples(index=False, name=None))
+
+
+class FuentePaginada:
+    """Fuente que trae las filas por páginas desde la capa de servicios.
+
+    `cargar_pagina(token, cantidad)` debe devolver (registros, siguiente_token);
+    el token de la primera página es None. Solo las últimas `max_paginas`
+    páginas usadas quedan en memoria (LRU); de las demás se conserva únicamente
+    el token para volver a pedirlas. Para llegar a una página lejana se
+    recorren las intermedias desde el token conocido más cercano, sin
+    guardarlas. Si la primera página ya se trajo, `primera_pagina=(registros,
+    siguiente)` evita volver a pedirla.
+    """
+
+    def __init__(self, cargar_pagina, total: int, tamano_pagina: int = 200, primera_pagina=None,
+                 max_paginas: int = 10):
+        self.cargar_pagina = cargar_pagina
+        self._total = total
+        self.tamano_pagina = tamano_pagina
+        self.max_paginas = max_paginas
+        self._paginas = OrderedDict()
+        self._tokens = {0: None}
+        self._lock = threading.Lock()  # una carga a la vez
+        self._lock_paginas = threading.Lock()  # acceso breve a páginas y tokens desde la UI
+        if primera_pagina is not None:
+            registros, siguiente = primera_pagina
+            self._guardar(0, registros, siguiente)
+
+    def _guardar(self, numero: int, registros, siguiente):
+        with self._lock_paginas:
+            self._paginas[numero] = registros
+            self._paginas.move_to_end(numero)
+            self._tokens[numero + 1] = siguiente
+            while len(self._paginas) > self.max_paginas:
+                self._paginas.popitem(last=False)
+
+    def total(self) -> int:
+        return self._total
+
+    def obtener(self, inicio: int, cantidad: int) -> list:
+        """Filas disponibles del rango; None en las que todavía no se cargaron"""
+        filas = []
+        with self._lock_paginas:
+            for posicion in range(inicio, min(inicio + cantidad, self._total)):
+                numero = posicion // self.tamano_pagina
+                pagina = self._paginas.get(numero)
+                if pagina is not None:
+                    self._paginas.move_to_end(numero)
+                indice = posicion % self.tamano_pagina
+                filas.append(pagina[indice] if pagina is not None and indice < len(pagina) else None)
+        return filas
+
+    def paginas_faltantes(self, inicio: int, cantidad: int) -> list:
+        if self._total == 0:
+            return []
+        primera = inicio // self.tamano_pagina
+        ultima = (min(inicio + cantidad, self._total) - 1) // self.tamano_pagina
+        with self._lock_paginas:
+            return [n for n in range(primera, ultima + 1) if n not in self._paginas]
+
+    def cargar(self, numero: int):
+        """Carga una página (se ejecuta en segundo plano)"""
+        with self._lock:
+            with self._lock_paginas:
+                if numero in self._paginas:
+                    return
+                conocida = max(n for n in self._tokens if n <= numero)
+                token = self._tokens[conocida]
+            for n in range(conocida, numero + 1):
+                registros, siguiente = self.cargar_pagina(token, self.tamano_pagina)
+                if n == numero:
+                    self._guardar(n, registros, siguiente)
+                else:
+                    # Página intermedia: solo se recuerda el token para seguir avanzando
+                    with self._lock_paginas:
+                        self._tokens[n + 1] = siguiente
+                token = siguiente
+                if siguiente is None:
+                    # Se llegó al final antes de lo esperado (se borraron filas): ajustar el total
+                    self._total = n * self.tamano_pagina + len(registros)
+                    break
+
+
+class TablaVirtual(ttk.Frame):
+    """Treeview virtualizado: solo existen en pantalla las filas visibles.
+
+    Las filas del widget se reutilizan al desplazarse (se cambian sus valores)
+    y `formatear` convierte cada registro en la tupla de valores a mostrar.
+    """
+
+    def __init__(self, padre, columnas, anchos=None, alto: int = 12, formatear=None,
+                 tareas=None, anclas=None):
+        super().__init__(padre)
+        self.alto = alto
+        self.formatear = formatear or (lambda registro: registro)
+        self.tareas = tareas
+        self._fuente = FuenteLista([])
+        self._inicio = 0
+        self._registros_visibles = []
+
+        self.tree = ttk.Treeview(self, columns=columnas, show="headings", height=alto,
+                                 selectmode="browse")
+        anchos = anchos or [150] * len(columnas)
+        anclas = anclas or {}
+        for col, ancho in zip(columnas, anchos):
+            self.tree.heading(col, text=col if isinstance(col, str) else str(col))
+            self.tree.column(col, width=ancho, anchor=anclas.get(col, "w"))
+
+        self.barra = ttk.Scrollbar(self, orient="vertical", command=self._desplazar_barra)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.barra.pack(side="right", fill="y")
+
+        self._items = [self.tree.insert("", "end", values=()) for _ in range(alto)]
+        for item in self._items:
+            self.tree.detach(item)
+
+        for evento in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(evento, self._rueda)
+        self.tree.bind("<Down>", lambda e: self._teclado(1))
+        self.tree.bind("<Up>", lambda e: self._teclado(-1))
+        self.tree.bind("<Next>", lambda e: self.desplazar(self.alto))
+        self.tree.bind("<Prior>", lambda e: self.desplazar(-self.alto))
+
+    # === DATOS ===
+
+    def set_fuente(self, fuente):
+        """Reemplaza los datos mostrados y vuelve al inicio"""
+        self._fuente = fuente
+        self._inicio = 0
+        self.tree.selection_set(())
+        self._refrescar()
+
+    def mostrar(self, registros):
+        """Atajo para mostrar una lista ya cargada"""
+        self.set_fuente(FuenteLista(registros))
+
+    def fila_seleccionada(self):
+        """Valores mostrados en la fila seleccionada, o None (también si la fila todavía se está cargando)"""
+        if self.registro_seleccionado() is None:
+            return None
+        return self.tree.item(self.tree.selection()[0], "values") or None
+
+    def registro_seleccionado(self):
+        """Registro (sin formatear) de la fila seleccionada, o None si no hay o aún se está cargando"""
+        seleccion = self.tree.selection()
+        if not seleccion or seleccion[0] not in self._items:
+            return None
+        posicion = self._items.index(seleccion[0])
+        return self._registros_visibles[posicion] if posicion < len(self._registros_visibles) else None
+
+    def al_seleccionar(self, callback):
+        self.tree.bind("<<TreeviewSelect>>", callback)
+
+    # === DESPLAZAMIENTO ===
+
+    def desplazar(self, filas: int):
+        maximo = max(self._fuente.total() - self.alto, 0)
+        nuevo = min(max(self._inicio + filas, 0), maximo)
+        if nuevo != self._inicio:
+            self._inicio = nuevo
+            self.tree.selection_set(())
+            self._refrescar()
+        return "break"
+
+    def _desplazar_barra(self, accion, cantidad, unidad=None):
+        if accion == "moveto":
+            total = self._fuente.total()
+            self.desplazar(int(float(cantidad) * total) - self._inicio)
+        elif accion == "scroll":
+            pasos = int(cantidad)
+            self.desplazar(pasos * (self.alto if unidad == "pages" else 1))
+
+    def _rueda(self, evento):
+        if evento.num == 4 or evento.delta > 0:
+            return self.desplazar(-3)
+        return self.desplazar(3)
+
+    def _teclado(self, direccion: int):
+        """Flechas: al llegar al borde de lo visible se desplaza la ventana"""
+        seleccion = self.tree.selection()
+        if seleccion and seleccion[0] in self._items:
+            posicion = self._items.index(seleccion[0])
+            visibles = len(self.tree.get_children())
+            if (direccion > 0 and posicion == visibles - 1) or (direccion < 0 and posicion == 0):
+                self.desplazar(direccion)
+                self.tree.selection_set(self._items[posicion])
+                self.tree.focus(self._items[posicion])
+                return "break"
+        return None
+
+    # === DIBUJO ===
+
+    def _refrescar(self):
+        """Vuelve a llenar solo las filas visibles"""
+        fuente = self._fuente
+        total = fuente.total()
+        registros = fuente.obtener(self._inicio, self.alto)
+        self._registros_visibles = registros
+
+        for posicion, item in enumerate(self._items):
+            if posicion < len(registros):
+                registro = registros[posicion]
+                valores = self.formatear(registro) if registro is not None else ("…",)
+                self.tree.item(item, values=valores)
+                self.tree.move(item, "", posicion)
+            else:
+                self.tree.detach(item)
+
+        if total:
+            self.barra.set(self._inicio / total, min((self._inicio + self.alto) / total, 1.0))
+        else:
+            self.barra.set(0, 1)
+
+        faltantes = fuente.paginas_faltantes(self._inicio, self.alto)
+        if faltantes:
+            self._cargar_paginas(fuente, faltantes)
+
+    def _cargar_paginas(self, fuente, paginas):
+        def cargar():
+            for numero in paginas:
+                fuente.cargar(numero)
+
+        def terminado(_):
+            if fuente is self._fuente:
+                self._refrescar()
+
+        if self.tareas is not None:
+            self.tareas.ejecutar(cargar, al_terminar=terminado, clave=f"paginas_{id(self)}")
+        else:
+            cargar()
+            terminado(None)
@@ -0,0 +1,116 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _obtener_pool(max_hilos: int = 4) -> ThreadPoolExecutor:
+    """Pool de hilos compartido por todas las ventanas"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="tarea_ui")
+        return _pool
+
+
+class EjecutorTareas:
+    """Ejecuta llamadas a los servicios fuera del hilo de Tk y entrega los resultados en él.
+
+    Los resultados se encolan desde los hilos de trabajo y la ventana los drena con
+    `after`, así los callbacks (y los messagebox) siempre corren en el hilo principal.
+    Las tareas con la misma `clave` se reemplazan: si llega una nueva, el resultado
+    de la anterior se descarta.
+    """
+
+    def __init__(self, ventana, etiqueta=None, intervalo_ms: int = 50):
+        self.ventana = ventana
+        self.etiqueta = etiqueta
+        self.intervalo_ms = intervalo_ms
+        self._resultados = queue.Queue()
+        self._generaciones = {}
+        self._futuros = {}
+        self._pendientes = 0
+        self._activo = True
+        self.ventana.after(self.intervalo_ms, self._drenar)
+
+    @property
+    def ocupado(self) -> bool:
+        return self._pendientes > 0
+
+    def ejecutar(self, funcion, *args, al_terminar=None, al_fallar=None, clave: str = None, **kwargs):
+        """Lanza funcion(*args, **kwargs) en segundo plano"""
+        generacion = None
+        if clave is not None:
+            generacion = self._generaciones.get(clave, 0) + 1
+            self._generaciones[clave] = generacion
+            anterior = self._futuros.pop(clave, None)
+            if anterior is not None and anterior.cancel():
+                self._pendientes -= 1
+
+        futuro = _obtener_pool().submit(
+            self._correr, funcion, args, kwargs, clave, generacion, al_terminar, al_fallar
+        )
+        if clave is not None:
+            self._futuros[clave] = futuro
+        self._pendientes += 1
+        self._actualizar_indicador()
+        return futuro
+
+    def _correr(self, funcion, args, kwargs, clave, generacion, al_terminar, al_fallar):
+        """Se ejecuta en un hilo de trabajo"""
+        try:
+            resultado = funcion(*args, **kwargs)
+            self._resultados.put((clave, generacion, al_terminar, resultado, None, al_fallar))
+        except Exception as e:
+            self._resultados.put((clave, generacion, al_terminar, None, e, al_fallar))
+
+    def _drenar(self):
+        """Entrega en el hilo de Tk los resultados disponibles"""
+        if not self._activo:
+            return
+        try:
+            if not self.ventana.winfo_exists():
+                self.cerrar()
+                return
+        except Exception:
+            self.cerrar()
+            return
+
+        while True:
+            try:
+                clave, generacion, al_terminar, resultado, error, al_fallar = self._resultados.get_nowait()
+            except queue.Empty:
+                break
+            self._pendientes -= 1
+            if clave is not None:
+                if self._generaciones.get(clave) != generacion:
+                    continue  # Resultado obsoleto: ya se pidió uno más nuevo
+                self._futuros.pop(clave, None)
+            if error is not None:
+                if al_fallar:
+                    al_fallar(error)
+                else:
+                    messagebox.showerror("Error", str(error), parent=self.ventana)
+            elif al_terminar:
+                al_terminar(resultado)
+
+        self._actualizar_indicador()
+        self.ventana.after(self.intervalo_ms, self._drenar)
+
+    def _actualizar_indicador(self):
+        """Cursor de espera y texto de estado mientras haya tareas en curso"""
+        try:
+            self.ventana.config(cursor="watch" if self.ocupado else "")
+            if self.etiqueta is not None:
+                self.etiqueta.config(text="⏳ Procesando..." if self.ocupado else "")
+        except Exception:
+            pass
+
+    def cerrar(self):
+        """Deja de entregar resultados y cancela lo que aún no empezó"""
+        self._activo = False
+        for futuro in self._futuros.values():
+            futuro.cancel()
+        self._futuros.clear()